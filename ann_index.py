@@ -0,0 +1,301 @@
+import numpy as np
+import instrumentation
+from vector_store import check_vocabulary, select_top_k
+
+
+# the number of k-means clusters is about the square root of the catalog size, unless it is given
+IVF_PROBES = 8
+IVF_ITERATIONS = 10
+IVF_TRAINING_SAMPLE = 100000
+IVF_BLOCK_SIZE = 4096
+
+
+class IVFIndex:
+    """
+    This class is an approximate nearest neighbour index over a vector store (inverted file index).
+
+    The movie vectors are grouped into clusters with k-means, each cluster keeps the list of its rows.
+    A search scores the user vector against the cluster centroids first, and then scores only the movies
+    in the best `probes` clusters. More probes give better recall, fewer probes give lower latency.
+
+    The index can be used everywhere a vector store is expected, everything except search
+    is passed on to the vector store.
+
+    Variables:
+    vector_store: the indexed movie vectors
+    centroids: a 2D array of the normalized cluster centroids
+    list_offsets: an array where the rows of cluster i are list_rows[list_offsets[i]:list_offsets[i + 1]]
+    list_rows: the rows of the vector store, grouped by cluster
+    probes: the number of clusters that are scored in a search
+    """
+
+    def __init__(self, vector_store, centroids, list_offsets, list_rows, probes=IVF_PROBES):
+        """
+        The constructor for the IVFIndex class.
+
+        Parameters:
+            vector_store (VectorStore): the indexed movie vectors
+            centroids (np.array): normalized cluster centroids, one per row
+            list_offsets (np.array): offsets of the clusters in list_rows
+            list_rows (np.array): rows of the vector store, grouped by cluster
+            probes (int): number of clusters that are scored in a search
+        """
+        self.vector_store = vector_store
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.list_offsets = np.asarray(list_offsets, dtype=np.int64)
+        self.list_rows = np.asarray(list_rows, dtype=np.int64)
+        self.probes = probes
+
+    def __len__(self):
+        return len(self.vector_store)
+
+    def __getattr__(self, name):
+        # everything that is not about searching is answered by the vector store
+        if name == "vector_store":
+            raise AttributeError(name)
+
+        return getattr(self.vector_store, name)
+
+    @property
+    def lists(self):
+        """
+        The number of clusters.
+        """
+        return len(self.centroids)
+
+    def candidates(self, uservector, k, available=None, probes=None):
+        """
+        A function to find the rows of the clusters closest to the user vector.
+        If the probed clusters do not hold k available movies, more clusters are probed.
+
+        Parameters:
+            uservector (np.array): user vector
+            k (int): number of movies that are to be found
+            available (np.array): boolean mask of the rows that can be returned, all rows if not given
+            probes (int): number of clusters to score, the index setting if not given
+
+        Returns:
+            rows (np.array): candidate rows
+        """
+        if probes is None:
+            probes = self.probes
+
+        centroid_scores = self.centroids @ np.asarray(uservector, dtype=np.float32)
+        order = np.argsort(-centroid_scores, kind="stable")
+
+        candidates = []
+        found = 0
+
+        for probed, cluster in enumerate(order):
+            if probed >= probes and found >= k:
+                break
+
+            rows = self.list_rows[self.list_offsets[cluster]:self.list_offsets[cluster + 1]]
+            if available is not None:
+                rows = rows[available[rows]]
+
+            candidates.append(rows)
+            found += len(rows)
+
+        if not candidates:
+            return self.list_rows[:0]
+
+        return np.concatenate(candidates)
+
+    def search(self, uservector, k, available=None, probes=None):
+        """
+        A function to find approximately the k movies most similar to the user vector.
+
+        Parameters:
+            uservector (np.array): user vector
+            k (int): number of movies to find
+            available (np.array): boolean mask of the rows that can be returned, all rows if not given
+            probes (int): number of clusters to score, the index setting if not given
+
+        Returns:
+            rows (np.array): rows of the best movies in ranked order
+            similarity (np.array): cosine similarity of those movies
+        """
+        with instrumentation.stage("probe"):
+            rows = np.sort(self.candidates(uservector, k, available, probes))
+
+        with instrumentation.stage("score"):
+            scores = self.vector_store.row_scores(rows, uservector)
+        instrumentation.count("rows scored", len(rows))
+
+        with instrumentation.stage("select"):
+            picked, similarity = select_top_k(scores, k)
+
+        return rows[picked], similarity
+
+    def update(self, keep):
+        """
+        A function to follow the rows of the vector store after movies were removed and added, in place.
+        The removed rows leave their lists and the new rows, which come after the kept rows,
+        join the list of their closest centroid. The centroids are not trained again,
+        rebuild the index with libraries/build_index.py once the catalog has changed a lot.
+
+        Parameters:
+            keep (np.array): boolean mask of the rows of the vector store before the update that are kept
+
+        Returns:
+            None
+        """
+        new_rows = np.cumsum(keep) - 1
+        clusters = np.repeat(np.arange(self.lists), np.diff(self.list_offsets))
+
+        kept = keep[self.list_rows]
+        list_rows = new_rows[self.list_rows[kept]]
+        list_offsets = np.zeros(self.lists + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(clusters[kept], minlength=self.lists))
+
+        # every new row goes to the end of its list
+        added_rows = np.arange(int(keep.sum()), len(self.vector_store))
+        added_clusters = _assign(self.vector_store, added_rows, self.centroids)
+
+        self.list_rows = np.insert(list_rows, list_offsets[added_clusters + 1], added_rows)
+        list_offsets[1:] += np.cumsum(np.bincount(added_clusters, minlength=self.lists))
+        self.list_offsets = list_offsets
+
+        return None
+
+
+def _assign(vector_store, rows, centroids, block_size=IVF_BLOCK_SIZE):
+    """
+    A function to assign movie vectors to the closest centroid, block by block.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        rows (np.array): rows of the movie vectors that are to be assigned
+        centroids (np.array): normalized cluster centroids, one per row
+        block_size (int): number of movie vectors assigned at once
+
+    Returns:
+        clusters (np.array): the closest cluster of each row
+    """
+    clusters = np.zeros(len(rows), dtype=np.int64)
+
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        dot_products = vector_store.row_dot_products(block, centroids.T)
+        clusters[start:start + block_size] = np.argmax(dot_products, axis=1)
+
+    return clusters
+
+
+def build_ivf_index(vector_store, lists=None, probes=IVF_PROBES, iterations=IVF_ITERATIONS,
+                    training_sample=IVF_TRAINING_SAMPLE, seed=0):
+    """
+    A function to build an IVF index with spherical k-means.
+
+    The centroids are trained on a random sample of the movie vectors, then every movie is assigned
+    to the closest centroid. Everything is done in blocks, so memory stays bounded for large catalogs.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        lists (int): number of clusters, about the square root of the catalog size if not given
+        probes (int): number of clusters that are scored in a search
+        iterations (int): number of k-means iterations
+        training_sample (int): number of movie vectors the centroids are trained on
+        seed (int): seed of the random generator
+
+    Returns:
+        ivf_index (IVFIndex): the built index
+    """
+    rng = np.random.default_rng(seed)
+    count = len(vector_store)
+
+    if lists is None:
+        lists = int(np.sqrt(count))
+    lists = max(1, min(lists, count))
+
+    sample = np.sort(rng.choice(count, size=min(training_sample, count), replace=False))
+    centroids = _normalize_rows(
+        vector_store.vectors(vector_store.ids[rng.choice(sample, size=lists, replace=False)]))
+
+    for _ in range(iterations):
+        clusters = _assign(vector_store, sample, centroids)
+
+        # the new centroid is the normalized sum of its members
+        sums = np.zeros_like(centroids, dtype=float)
+        for start in range(0, len(sample), IVF_BLOCK_SIZE):
+            block = sample[start:start + IVF_BLOCK_SIZE]
+            np.add.at(sums, clusters[start:start + IVF_BLOCK_SIZE],
+                      vector_store.vectors(vector_store.ids[block]))
+
+        # empty clusters get a random movie vector as a new centroid
+        empty = np.flatnonzero(~sums.any(axis=1))
+        if len(empty):
+            sums[empty] = vector_store.vectors(
+                vector_store.ids[rng.choice(sample, size=len(empty))])
+
+        centroids = _normalize_rows(sums)
+
+    clusters = _assign(vector_store, np.arange(count), centroids)
+    list_rows = np.argsort(clusters, kind="stable")
+    list_offsets = np.zeros(lists + 1, dtype=np.int64)
+    list_offsets[1:] = np.cumsum(np.bincount(clusters, minlength=lists))
+
+    return IVFIndex(vector_store, centroids, list_offsets, list_rows, probes)
+
+
+def _normalize_rows(matrix):
+    """
+    A function to normalize every row of a matrix, zero rows stay zero.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    normalized = np.zeros(matrix.shape, dtype=np.float32)
+    np.divide(matrix, norms, out=normalized, where=norms != 0)
+
+    return normalized
+
+
+def save_ivf_index(path, ivf_index, vocabulary=""):
+    """
+    A function to save an IVF index to a numpy file. The movie vectors themselves are not saved.
+
+    Parameters:
+        path (str): path to the file
+        ivf_index (IVFIndex): the index
+        vocabulary (str): fingerprint of the vocabulary of the movie vectors, see vocabulary_fingerprint
+
+    Returns:
+        None
+    """
+    with open(path, "wb") as index_file:
+        np.savez(index_file, ids=ivf_index.vector_store.ids.astype(np.int32),
+                 centroids=ivf_index.centroids, list_offsets=ivf_index.list_offsets,
+                 list_rows=ivf_index.list_rows, probes=ivf_index.probes, vocabulary=vocabulary)
+
+    return None
+
+
+def load_ivf_index(path, vector_store, probes=None, vocabulary=""):
+    """
+    A function to load an IVF index over the given vector store from a numpy file.
+
+    Parameters:
+        path (str): path to the file
+        vector_store (VectorStore): the movie vectors the index was built for
+        probes (int): number of clusters that are scored in a search, the saved setting if not given
+        vocabulary (str): fingerprint of the vocabulary in use, a ValueError is raised if the index has another one
+
+    Returns:
+        ivf_index (IVFIndex): the index
+    """
+    with np.load(path) as index_file:
+        # indexes saved before the fingerprints were kept have none
+        check_vocabulary(path, str(index_file["vocabulary"]) if "vocabulary" in index_file else "", vocabulary)
+
+        if not np.array_equal(index_file["ids"], vector_store.ids):
+            raise ValueError(f"{path} was built for different movie vectors")
+
+        if index_file["centroids"].shape[1] != vector_store.dimension:
+            raise ValueError(f"{path} was built for vectors of dimension {index_file['centroids'].shape[1]}, "
+                             f"not {vector_store.dimension}, build the index again with libraries/build_index.py")
+
+        if probes is None:
+            probes = int(index_file["probes"])
+
+        return IVFIndex(vector_store, index_file["centroids"], index_file["list_offsets"],
+                        index_file["list_rows"], probes)
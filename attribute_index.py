@@ -0,0 +1,218 @@
+import operator
+import re
+import numpy as np
+
+
+# numeric columns of the movie data that can be filtered with comparisons
+NUMERIC_COLUMNS = ("year", "imdb", "duration")
+# category columns of the movie data that are indexed with one bitmap for each value
+BITMAP_COLUMNS = ("genre", "director")
+
+COMPARISONS = {"=": operator.eq, "<": operator.lt, "<=": operator.le,
+               ">": operator.gt, ">=": operator.ge}
+
+_CONDITION = re.compile(r"^\s*(\w+)\s*(<=|>=|=|<|>)\s*(.+?)\s*$")
+
+
+class AttributeIndex:
+    """
+    This class holds the attributes of every movie as column arrays, aligned with the rows of a vector store.
+    Genres and directors are indexed with one bitmap per value, so a filter is answered
+    with a few operations over whole columns instead of a loop over the movies.
+
+    Bitmaps are packed with np.packbits (one bit per row), filters are combined on the packed bits.
+
+    Variables:
+    ids: an array of movie ids, one for each row
+    columns: numeric column arrays by name ("year", "imdb", "duration"), rows without data hold -1
+    bitmaps: packed bitmaps by column name and value, e.g. bitmaps["genre"]["Sci-Fi"]
+    """
+
+    def __init__(self, ids, columns, bitmaps):
+        """
+        The constructor for the AttributeIndex class.
+
+        Parameters:
+            ids (np.array): movie ids, one for each row
+            columns (dict): numeric column arrays by name
+            bitmaps (dict): packed bitmaps by column name and value
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.columns = columns
+        self.bitmaps = bitmaps
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mask(self, conditions):
+        """
+        A function to find the rows that satisfy all of the conditions.
+
+        Parameters:
+            conditions (list): (column, comparison, value) conditions, e.g. ("imdb", ">=", 7.0),
+                               bitmap columns only support "=" and the value may list several values: "Drama|Comedy"
+
+        Returns:
+            mask (np.array): boolean mask of the rows that satisfy the conditions
+        """
+        packed = np.full((len(self) + 7) // 8, 0xFF, dtype=np.uint8)
+
+        for column, comparison, value in conditions:
+            packed &= self._condition_bits(column, comparison, value)
+
+        return np.unpackbits(packed, count=len(self)).astype(bool)
+
+    def _condition_bits(self, column, comparison, value):
+        """
+        A function to get the packed bits of the rows that satisfy one condition.
+        """
+        if column in self.bitmaps:
+            if comparison != "=":
+                raise ValueError(f"{column} can only be compared with '='")
+
+            # several values separated by "|" match any of them
+            bits = np.zeros((len(self) + 7) // 8, dtype=np.uint8)
+            for single_value in str(value).split("|"):
+                bitmap = self.bitmaps[column].get(single_value.strip())
+                if bitmap is not None:
+                    bits |= bitmap
+
+            return bits
+
+        if column in self.columns:
+            if comparison not in COMPARISONS:
+                raise ValueError(f"unknown comparison {comparison!r}")
+
+            values = self.columns[column]
+            matches = COMPARISONS[comparison](values, float(value)) & (values >= 0)
+
+            return np.packbits(matches)
+
+        raise ValueError(f"unknown column {column!r}")
+
+    def values(self, column):
+        """
+        A function to get the values of a bitmap column that have a bitmap.
+
+        Parameters:
+            column (str): "genre" or "director"
+
+        Returns:
+            values (list): the sorted values
+        """
+        return sorted(self.bitmaps[column])
+
+    def update(self, keep, added):
+        """
+        A function to remove rows and append the rows of another attribute index, in place.
+        Values without any row left lose their bitmap.
+
+        Parameters:
+            keep (np.array): boolean mask of the rows that are kept
+            added (AttributeIndex): index of the rows that are appended after the kept rows, e.g. of new movies
+
+        Returns:
+            None
+        """
+        kept = int(keep.sum())
+
+        for column in self.columns:
+            self.columns[column] = np.concatenate((self.columns[column][keep], added.columns[column]))
+
+        for column, bitmaps in self.bitmaps.items():
+            added_bitmaps = added.bitmaps[column]
+            for value in set(bitmaps) | set(added_bitmaps):
+                bits = np.zeros(kept + len(added), dtype=bool)
+                if value in bitmaps:
+                    bits[:kept] = np.unpackbits(bitmaps[value], count=len(self)).astype(bool)[keep]
+                if value in added_bitmaps:
+                    bits[kept:] = np.unpackbits(added_bitmaps[value], count=len(added))
+
+                if bits.any():
+                    bitmaps[value] = np.packbits(bits)
+                else:
+                    del bitmaps[value]
+
+        self.ids = np.concatenate((self.ids[keep], added.ids))
+
+        return None
+
+
+def parse_filter(expression):
+    """
+    A function to turn a filter expression into conditions for AttributeIndex.mask.
+    The conditions are separated by commas, e.g. "genre=Sci-Fi, year>2000, imdb>=7, duration<130".
+
+    Parameters:
+        expression (str): the filter expression
+
+    Returns:
+        conditions (list): (column, comparison, value) conditions
+    """
+    conditions = []
+    expression = expression.replace("≥", ">=").replace("≤", "<=")
+
+    for part in expression.split(","):
+        if not part.strip():
+            continue
+
+        match = _CONDITION.match(part)
+        if match is None:
+            raise ValueError(f"can not parse the condition {part.strip()!r}")
+
+        column, comparison, value = match.groups()
+        conditions.append((column.lower(), comparison, value))
+
+    return conditions
+
+
+def build_attribute_index(movie_data, ids=None):
+    """
+    A function to build the attribute index from the columns of the movie data.
+
+    Parameters:
+        movie_data (MovieData): the movie data
+        ids (np.array): movie ids the rows of the index are aligned with, e.g. the ids of a vector store,
+                        the ids of the movie data if not given
+
+    Returns:
+        attribute_index (AttributeIndex): the attribute index
+    """
+    if ids is None:
+        ids = movie_data.ids
+    ids = np.asarray(ids, dtype=np.int64)
+
+    # the row of the movie data of each row of the index, -1 for movies without data
+    known_ids = (ids >= 0) & (ids < len(movie_data.id_to_row))
+    data_rows = np.full(len(ids), -1, dtype=np.int64)
+    data_rows[known_ids] = movie_data.id_to_row[ids[known_ids]]
+    known = data_rows >= 0
+
+    columns = {}
+    for column in NUMERIC_COLUMNS:
+        values = movie_data.columns[column]
+        columns[column] = np.full(len(ids), -1, dtype=values.dtype)
+        columns[column][known] = values[data_rows[known]]
+
+    bitmaps = {}
+    for column in BITMAP_COLUMNS:
+        category = movie_data.columns[column]
+        codes = np.full(len(ids), -1, dtype=np.int64)
+        codes[known] = category.codes[data_rows[known]]
+
+        # the rows grouped by their code, the rows without data come first
+        grouped_rows = np.argsort(codes, kind="stable")
+        ends = np.cumsum(np.bincount(codes + 1, minlength=len(category.values) + 1))
+
+        # a value like "Drama|Horror" belongs to the bitmap of every genre in it
+        masks = {}
+        for code, value in enumerate(category.values):
+            rows = grouped_rows[ends[code]:ends[code + 1]]
+            if len(rows) == 0:
+                continue
+            for single_value in value.split("|"):
+                masks.setdefault(single_value, np.zeros(len(ids), dtype=bool))[rows] = True
+
+        bitmaps[column] = {value: np.packbits(mask) for value, mask in masks.items()}
+
+    return AttributeIndex(ids, columns, bitmaps)
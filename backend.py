@@ -1,16 +1,269 @@
-import csv
+import os
 import numpy as np
 import random
+import instrumentation
+from ann_index import load_ivf_index
+from attribute_index import build_attribute_index, parse_filter
+from movie_data import load_movie_data, load_movie_data_binary
+from similarity_table import load_similarity_table
+from text_index import build_text_index
+from vector_store import convert_precision, load_vectors_binary, load_vectors_csv, load_vocabulary_fingerprint
+
+
+VECTORS_FILE = "main_data/normalized_vectors.csv"
+VECTORS_BINARY_FILE = "main_data/normalized_vectors.bin"
+SIMILAR_MOVIES_FILE = "main_data/similar_movies.npz"
+IVF_INDEX_FILE = "main_data/ivf_index.npz"
+MOVIE_DATA_FILE = "main_data/A_complete_data.csv"
+MOVIE_DATA_BINARY_FILE = "main_data/movie_data.npz"
+EMBEDDED_VECTORS_FILE = "main_data/embedded_vectors.bin"
+EMBEDDED_IVF_INDEX_FILE = "main_data/embedded_ivf_index.npz"
+PROFILES_DIRECTORY = "main_data/profiles"
+USER_VECTORS_FILE = "main_data/user_vectors.bin"
+RECOMMENDATIONS_FILE = "main_data/recommendations.csv"
+VOCABULARY_FILE = "main_data/vector_info.csv"
+
+# precision the movie vectors are scored in: "float64", "float32" or "int8" (with a scale for each row),
+# check the quality of the smaller formats with benchmarks/validate_precision.py before switching
+VECTOR_PRECISION = "float64"
+
+# "exact" scores the whole catalog, "ivf" uses the approximate index built by libraries/build_index.py,
+# "sharded" scores the whole catalog in parallel, split into shards scored by worker processes
+SEARCH_INDEX = "exact"
+# whether user vectors are built and scored in the low-dimensional space of libraries/build_embedding.py
+# instead of the tf-idf space, check the quality with benchmarks/embedding.py before switching
+USE_EMBEDDING = False
+# number of worker processes of the sharded search (the number of cores if None)
+# and rows in a shard (if None, at least one shard for each worker process)
+SCORING_WORKERS = None
+SCORING_SHARD_SIZE = None
+
+_vocabulary_fingerprint = None
+_vector_store = None
+_search_index = None
+_similarity_table = None
+_attribute_index = None
+_text_index = None
+_movie_data = None
+
+
+def get_vocabulary_fingerprint():
+    """
+    A function to get the fingerprint of the vocabulary of the movie vectors (the terms of vector_info.csv in order).
+    Every file derived from the vectors keeps the fingerprint it was built with and is checked against it on load.
+
+    Returns:
+        fingerprint (str): 16 hexadecimal digits, see vector_store.vocabulary_fingerprint
+    """
+    global _vocabulary_fingerprint
+
+    if _vocabulary_fingerprint is None:
+        _vocabulary_fingerprint = load_vocabulary_fingerprint(VOCABULARY_FILE)
+
+    return _vocabulary_fingerprint
+
+
+def get_vector_store():
+    """
+    A function to get the movie vector store.
+    The vectors are loaded from the disk only on the first call, every later call returns the same store.
+    The binary vector file is memory-mapped if it exists, otherwise the csv file is parsed.
+    With USE_EMBEDDING the embedded vectors are loaded instead.
+    The vectors are converted to VECTOR_PRECISION once, when they are loaded.
+
+    Returns:
+        vector_store (VectorStore): all movie vectors held in memory
+    """
+    global _vector_store
+
+    if _vector_store is None:
+        with instrumentation.stage("load"):
+            if USE_EMBEDDING:
+                vector_store = load_vectors_binary(EMBEDDED_VECTORS_FILE, get_vocabulary_fingerprint())
+            elif os.path.exists(VECTORS_BINARY_FILE):
+                vector_store = load_vectors_binary(VECTORS_BINARY_FILE, get_vocabulary_fingerprint())
+            else:
+                with instrumentation.stage("parse"):
+                    vector_store = load_vectors_csv(VECTORS_FILE)
+
+            _vector_store = convert_precision(vector_store, VECTOR_PRECISION)
+
+    return _vector_store
+
+
+def get_ivf_index_file():
+    """
+    A function to get the path of the IVF index of the vectors get_vector_store returns.
+    The embedded vectors have an index of their own, the centroids of one space cannot score the other.
+
+    Returns:
+        path (str): path to the file of the index
+    """
+    return EMBEDDED_IVF_INDEX_FILE if USE_EMBEDDING else IVF_INDEX_FILE
+
+
+def get_search_index():
+    """
+    A function to get the index that recommendations are searched in, chosen by SEARCH_INDEX.
+    The exact search is the vector store itself, the approximate index is loaded
+    and the worker processes of the sharded search are started on the first call.
+
+    Returns:
+        search_index (VectorStore, IVFIndex or ShardedScorer): the index used by top_k when no vector store is given
+    """
+    global _search_index
+
+    if SEARCH_INDEX == "exact":
+        return get_vector_store()
+
+    if _search_index is None:
+        if SEARCH_INDEX == "ivf":
+            _search_index = load_ivf_index(get_ivf_index_file(), get_vector_store(), vocabulary=get_vocabulary_fingerprint())
+        elif SEARCH_INDEX == "sharded":
+            # multiprocessing is only imported when the sharded search is used, it slows down the startup
+            from sharded_scoring import ShardedScorer
+            _search_index = ShardedScorer(get_vector_store(), SCORING_WORKERS, SCORING_SHARD_SIZE)
+        else:
+            raise ValueError(f"unknown search index {SEARCH_INDEX!r}")
+
+    return _search_index
+
+
+def get_similarity_table():
+    """
+    A function to get the precomputed table of similar movies, built by libraries/similar_movies.py.
+    The table is loaded from the disk only on the first call.
+
+    Returns:
+        similarity_table (SimilarityTable): the most similar movies of every movie
+    """
+    global _similarity_table
+
+    if _similarity_table is None:
+        _similarity_table = load_similarity_table(SIMILAR_MOVIES_FILE, get_vocabulary_fingerprint())
+
+    return _similarity_table
+
+
+def get_movie_data():
+    """
+    A function to get the data of all movies (title, year, IMDb score, ...).
+    The data is loaded from the disk only on the first call, every later call returns the same data.
+    The binary file written by libraries/convert_movie_data.py is loaded if it exists, otherwise the csv file is parsed.
+
+    Returns:
+        movie_data (MovieData): the movie data, column by column
+    """
+    global _movie_data
+
+    if _movie_data is None:
+        with instrumentation.stage("load"):
+            if os.path.exists(MOVIE_DATA_BINARY_FILE):
+                _movie_data = load_movie_data_binary(MOVIE_DATA_BINARY_FILE)
+            else:
+                with instrumentation.stage("parse"):
+                    _movie_data = load_movie_data(MOVIE_DATA_FILE)
+
+    return _movie_data
+
+
+def get_attribute_index():
+    """
+    A function to get the attribute index of the movie data, aligned with the rows of the shared vector store.
+    The index is built only on the first call.
+
+    Returns:
+        attribute_index (AttributeIndex): columns and bitmaps of the movie attributes
+    """
+    global _attribute_index
+
+    if _attribute_index is None:
+        _attribute_index = build_attribute_index(
+            get_movie_data(), get_vector_store().ids)
+
+    return _attribute_index
+
+
+def get_text_index():
+    """
+    A function to get the inverted index over the titles, keywords, actors and directors of the movie data.
+    The index is built only on the first call, it does not need the movie vectors.
+
+    Returns:
+        text_index (TextIndex): the inverted index
+    """
+    global _text_index
+
+    if _text_index is None:
+        _text_index = build_text_index(get_movie_data())
+
+    return _text_index
+
+
+def search_movies(query, limit=10):
+    """
+    A function to find movies by title (the last word may be unfinished), actor, director or keyword.
+
+    Parameters:
+        query (str): the text that is looked up, e.g. "star wa" or "tom hanks"
+        limit (int): the number of movies to return
+
+    Returns:
+        movie_ids (list): ids of the movies, title matches first, then by IMDb score
+    """
+    with instrumentation.stage("search"):
+        return [int(movie_id) for movie_id in get_text_index().search(query, limit)]
+
+
+def filter_movies(expression):
+    """
+    A function to find the movies that satisfy a filter expression, before anything is scored.
+
+    Parameters:
+        expression (str): filter expression, e.g. "genre=Sci-Fi, year>2000, imdb>=7, duration<130"
+
+    Returns:
+        candidates (np.array): boolean mask over the rows of the shared vector store
+    """
+    return get_attribute_index().mask(parse_filter(expression))
+
+
+def similar_movies(movie_id=int, n=10, similarity_table=None):
+    """
+    A function to get the movies most similar to the given movie.
+    The movies are looked up in the precomputed table, the catalog is not scanned.
+
+    Parameters:
+        movie_id (int): id of the movie
+        n (int): number of similar movies
+        similarity_table (SimilarityTable): table of similar movies, the shared table is used if not given
+
+    Returns:
+        similar_movies_list (list): ids of the most similar movies, best first
+    """
+    if similarity_table is None:
+        similarity_table = get_similarity_table()
+
+    movie_ids, _ = similarity_table.lookup(movie_id, n)
+
+    return [int(similar_movie) for similar_movie in movie_ids]
+
+
+# the user vector is kept as a scaled combination within a chunk of feedback events,
+# chunks keep both the matrix of dot products and the scale factor small
+FEEDBACK_BATCH_SIZE = 256
+# a user vector this short is only a rounding error, e.g. after liking and disliking the same movie
+ZERO_MAGNITUDE = 1e-6
 
 
 def handle_feedback(
-        movie_vectors=list, uservector=np.array,
+        vector_store=None, uservector=np.array,
         feedback=bool, movie_id=int):
     """
     A function to handle the user's feedback and update the user vector
 
     Parameters:
-        movie_vectors (list): list of movie vectors
+        vector_store (VectorStore): movie vectors, the shared store is used if not given
         uservector (np.array): user vector that is to be updated
         feedback (bool): whether the user liked the movie or not
         movie_id (int): id of the movie that the user just got recommended
@@ -18,14 +271,13 @@ def handle_feedback(
     Returns:
         normalized_user_vector (np.array): the updated user vector
     """
+    if vector_store is None:
+        vector_store = get_vector_store()
 
-    movievector = np.zeros((1399,), dtype=float)
+    instrumentation.count("feedback events")
 
-    for row in movie_vectors:
-        if int(row["movie_id"]) == movie_id:
-            movievector = np.array(
-                list(map(float, row['normalized_vector'].split(','))))
-            break
+    # find the movie vector through the id -> row lookup, a zero vector is used for unknown movies
+    movievector = vector_store.vector(movie_id)
 
     # update user vector to be the sum of the user vector and the movie vector
     if feedback:
@@ -35,12 +287,82 @@ def handle_feedback(
     else:
         uservector = (uservector - movievector)/2
 
-    # normalize the user vector
-    normalized_user_vector = uservector / np.linalg.norm(uservector)
+    # normalize the user vector, a zero vector stays zero
+    magnitude = np.linalg.norm(uservector)
+    if magnitude <= ZERO_MAGNITUDE:
+        return np.zeros_like(uservector)
+
+    normalized_user_vector = uservector / magnitude
 
     return normalized_user_vector
 
 
+def handle_feedback_batch(vector_store=None, uservector=np.array, events=list):
+    """
+    A function to apply a sequence of feedback events to the user vector at once.
+    The result is the same as calling handle_feedback for each event in order.
+
+    Each update only adds or subtracts a movie vector and rescales the user vector,
+    so the user vector stays a combination of the starting vector and the movie vectors.
+    The movie vectors are gathered once, their dot products come from one matrix product,
+    and only the scalar coefficients of the combination are updated event by event.
+    The user vector itself is built only once per chunk of events.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors, the shared store is used if not given
+        uservector (np.array): user vector that is to be updated
+        events (iterable): (movie_id, liked) pairs in the order the feedback was given
+
+    Returns:
+        normalized_user_vector (np.array): the updated user vector
+    """
+    if vector_store is None:
+        vector_store = get_vector_store()
+
+    events = list(events)
+    uservector = np.array(uservector, dtype=float)
+    instrumentation.count("feedback events", len(events))
+
+    for start in range(0, len(events), FEEDBACK_BATCH_SIZE):
+        chunk = events[start:start + FEEDBACK_BATCH_SIZE]
+        movie_ids = [movie_id for movie_id, _ in chunk]
+        signs = [1.0 if liked else -1.0 for _, liked in chunk]
+
+        movievectors = vector_store.vectors(movie_ids)
+        gram = movievectors @ movievectors.T
+        user_dot_products = movievectors @ uservector
+
+        # user vector = scale * (user_coefficient * uservector + movie_coefficients @ movievectors)
+        scale = 1.0
+        user_coefficient = 1.0
+        movie_coefficients = np.zeros(len(chunk))
+        squared_magnitude = float(uservector @ uservector)
+
+        for i, sign in enumerate(signs):
+            # dot product of the current user vector with the movie vector of this event
+            dot_product = scale * (user_coefficient * user_dot_products[i]
+                                   + gram[i, :i] @ movie_coefficients[:i])
+
+            squared_magnitude += 2 * sign * dot_product + gram[i, i]
+            movie_coefficients[i] = sign / scale
+
+            # the same renormalization as in handle_feedback, a zero vector stays zero
+            if squared_magnitude <= ZERO_MAGNITUDE ** 2:
+                scale = 1.0
+                user_coefficient = 0.0
+                movie_coefficients[:i + 1] = 0
+                squared_magnitude = 0.0
+                continue
+
+            scale /= np.sqrt(squared_magnitude)
+            squared_magnitude = 1.0
+
+        uservector = scale * (user_coefficient * uservector
+                              + movie_coefficients @ movievectors)
+
+    return uservector
+
+
 def cosine_similarity(vector_a, vector_b):
     """
     A function to calculate the cosine similarity between two vectors.
@@ -66,42 +388,62 @@ def cosine_similarity(vector_a, vector_b):
     return similarity
 
 
-def get_recommendation(uservector=None, recommended_movies=None):
+def top_k(user_vector, k, exclude=None, vector_store=None, candidates=None):
     """
-    A function to get a recommendation for the user.
+    A function to find the k movies with the best cosine similarity to the user vector.
+    The catalog is scored only once and the best movies are picked with a partial selection.
+    If only a few movies are candidates, only those movies are scored.
 
     Parameters:
-        uservector (np.array): user vector
-        recommended_movies (list): list of movies that have already been recommended
+        user_vector (np.array): user vector
+        k (int): number of movies to find
+        exclude (iterable): ids of movies that must not be returned, e.g. already recommended movies
+        vector_store (VectorStore): movie vectors or an index over them, the search index is used if not given
+        candidates (np.array): boolean mask of the rows that may be returned, e.g. from filter_movies
 
     Returns:
-        best_recommendation (int): id of the movie with the best cosine similarity to the user vector
+        movie_ids (np.array): ids of the best movies in ranked order
+        similarity (np.array): cosine similarity of those movies
     """
-    similarity_score = {}
+    if vector_store is None:
+        vector_store = get_search_index()
 
-    # calculate the cosine similarity between the user vector and each movie vector
-    with open("main_data/normalized_vectors.csv", "r") as normalized_vectors_file:
-        reader = csv.DictReader(normalized_vectors_file, delimiter=";")
+    # mask the excluded movies instead of checking every movie against a list
+    with instrumentation.stage("exclude"):
+        if candidates is None:
+            available = np.ones(len(vector_store), dtype=bool)
+        else:
+            available = np.array(candidates, dtype=bool)
+        if exclude is not None:
+            rows = vector_store.rows(exclude)
+            available[rows[rows >= 0]] = False
 
-        for row in reader:
-            movie_id = int(row["movie_id"])
-            normalized_vector = np.array(
-                list(map(float, row['normalized_vector'].split(','))))
+    rows, similarity = vector_store.search(user_vector, k, available)
 
-            similarity = cosine_similarity(uservector, normalized_vector)
-            similarity_score[movie_id] = similarity
+    return vector_store.ids[rows], similarity
+
+
+def get_recommendation(uservector=None, recommended_movies=None, vector_store=None, candidates=None):
+    """
+    A function to get a recommendation for the user.
 
-    # remove movies that have already been recommended
-    similarity_score = {movie_id: similarity for movie_id,
-                        similarity in similarity_score.items() if movie_id not in recommended_movies}
+    Parameters:
+        uservector (np.array): user vector
+        recommended_movies (list): list of movies that have already been recommended
+        vector_store (VectorStore): movie vectors, the shared store is used if not given
+        candidates (np.array): boolean mask of the rows that may be recommended, e.g. from filter_movies
 
-    # loop until a movie that has not been recommended is found
-    while True:
-        best_recommendation = int(
-            max(similarity_score, key=similarity_score.get, default=0))
+    Returns:
+        best_recommendation (int): id of the movie with the best cosine similarity to the user vector, 0 if there is none left
+    """
+    movie_ids, _ = top_k(uservector, 1, recommended_movies,
+                         vector_store, candidates)
 
-        if best_recommendation not in recommended_movies:
-            break
+    # there is nothing left to recommend
+    if len(movie_ids) == 0:
+        best_recommendation = 0
+    else:
+        best_recommendation = int(movie_ids[0])
 
     # add the best recommendation to the list of recommended movies
     already_recommended(best_recommendation, recommended_movies)
@@ -110,6 +452,34 @@ def get_recommendation(uservector=None, recommended_movies=None):
     return best_recommendation
 
 
+def recommend_after_feedback(vector_store=None, uservector=np.array, feedback=bool,
+                             movie_id=int, recommended_movies=list):
+    """
+    A function to find what would be recommended if the user gave the feedback on the movie.
+    Nothing is changed, so it can run speculatively for both the like and the dislike outcome.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors, the shared store is used if not given
+        uservector (np.array): current user vector
+        feedback (bool): whether the user likes the movie or not
+        movie_id (int): id of the movie that the user is reacting to
+        recommended_movies (iterable): movie ids that have already been recommended
+
+    Returns:
+        updated_user_vector (np.array): the user vector after the feedback
+        recommendation (int): id of the movie that would be recommended next, 0 if there is none left
+    """
+    updated_user_vector = handle_feedback(
+        vector_store, uservector, feedback, movie_id)
+    movie_ids, _ = top_k(updated_user_vector, 1,
+                         recommended_movies, vector_store)
+
+    if len(movie_ids) == 0:
+        return updated_user_vector, 0
+
+    return updated_user_vector, int(movie_ids[0])
+
+
 def add_to_watchlist(movie_id=int, watchlist=list):
     """
     A function to add a movie to the user's watchlist.
@@ -162,14 +532,16 @@ def get_random_movies(recommended_movies=list):
     """
 
     random_movies = []
+    # the ids of the movies in the catalog, the catalog can grow and shrink
+    movie_ids = get_movie_data().ids
 
     # generate 10 random movie ids
     for i in range(10):
-        random_movies.append(random.randint(1, 4660))
+        random_movies.append(int(random.choice(movie_ids)))
 
         # make sure that the movie ids are unique
         while random_movies[i] in random_movies[:i]:
-            random_movies[i] = random.randint(1, 4660)
+            random_movies[i] = int(random.choice(movie_ids))
 
     # add the random movie ids to the list of already recommended movies
     for movie in random_movies:
@@ -179,24 +551,27 @@ def get_random_movies(recommended_movies=list):
     return random_movies
 
 
-def give_recommendations_list(uservector=np.array, recommended_movies=list):
+def give_recommendations_list(uservector=np.array, recommended_movies=list, vector_store=None,
+                              candidates=None):
     """
     After the program ends, this function gives a list of 10 recommendations.
 
     Parameters:
         uservector (np.array): user vector
         recommended_movies (list): list of movie ids that have already been recommended
+        vector_store (VectorStore): movie vectors, the shared store is used if not given
+        candidates (np.array): boolean mask of the rows that may be recommended, e.g. from filter_movies
 
     Returns:
         recommendations_list (list): list of 10 recommended movie ids
     """
-    recommendations_list = []
-
-    # get 10 recommendations
-    for _ in range(10):
+    # get 10 recommendations at once, the catalog is scored only once
+    movie_ids, _ = top_k(uservector, 10, recommended_movies,
+                         vector_store, candidates)
+    recommendations_list = [int(movie_id) for movie_id in movie_ids]
 
-        recommendation = get_recommendation(uservector, recommended_movies)
-        recommendations_list.append(recommendation)
+    for recommendation in recommendations_list:
+        already_recommended(recommendation, recommended_movies)
 
     # return the list of recommendations
     return recommendations_list
@@ -0,0 +1,428 @@
+import csv
+import os
+import struct
+import numpy as np
+import instrumentation
+from profiles import ProfileStore
+from vector_store import (QuantizedSparseVectorStore, QuantizedVectorStore, SparseVectorStore, VectorStore,
+                          check_vocabulary)
+
+
+# number of users scored together, one matrix-matrix product per block of the catalog
+EXPORT_CHUNK_SIZE = 64
+# the scores of one block of the catalog for a whole chunk of users are at most this many float64 values,
+# this bounds the memory of the export
+EXPORT_BLOCK_VALUES = 2 ** 22
+# number of the most common columns of sparse movie vectors that are scored as a dense matrix
+EXPORT_DENSE_COLUMNS = 64
+# number of recommendations exported for every user
+EXPORT_COUNT = 10
+
+# the file of user vectors starts with a header (magic, version, dimension, fingerprint of the vocabulary)
+# and then holds one record per user:
+# the record header, the term indices and values of the non-zero values of the user vector
+# and the ids of the movies that must not be recommended to the user
+USER_VECTORS_MAGIC = b"MUSR"
+USER_VECTORS_VERSION = 2
+USER_VECTORS_HEADER = struct.Struct("<4sIQ16s")
+USER_RECORD = np.dtype([("name", "S64"), ("terms", "<u4"), ("excluded", "<u4")])
+
+
+def write_user_vectors(path, users, dimension, vocabulary=""):
+    """
+    A function to save user vectors and the movies excluded for each user, one record after the other.
+    The users are written as they come, so they never have to be in memory at once.
+
+    Parameters:
+        path (str): path to the file
+        users (iterable): (name, user vector, ids of the excluded movies) for each user, names of up to 64 bytes
+        dimension (int): the dimension of the user vectors
+        vocabulary (str): fingerprint of the vocabulary of the user vectors, see vocabulary_fingerprint
+
+    Returns:
+        count (int): the number of users written
+    """
+    count = 0
+
+    with open(path + ".tmp", "wb") as users_file:
+        users_file.write(USER_VECTORS_HEADER.pack(USER_VECTORS_MAGIC, USER_VECTORS_VERSION, dimension,
+                                                  vocabulary.encode("ascii")))
+
+        for name, user_vector, excluded_ids in users:
+            user_vector = np.asarray(user_vector, dtype=np.float32)
+            if len(user_vector) != dimension:
+                raise ValueError(f"user {name!r} has a vector of dimension {len(user_vector)}, not {dimension}")
+
+            terms = np.flatnonzero(user_vector)
+            excluded_ids = np.asarray(excluded_ids, dtype=np.int64)
+
+            record = np.zeros(1, dtype=USER_RECORD)
+            record["name"] = name.encode("utf-8")
+            record["terms"] = len(terms)
+            record["excluded"] = len(excluded_ids)
+
+            users_file.write(record.tobytes())
+            users_file.write(terms.astype("<i4").tobytes())
+            users_file.write(user_vector[terms].astype("<f4").tobytes())
+            users_file.write(excluded_ids.astype("<i8").tobytes())
+            count += 1
+
+    # a half-written file never replaces the file of the last run
+    os.replace(path + ".tmp", path)
+
+    return count
+
+
+def read_user_vectors(path, chunk_size=EXPORT_CHUNK_SIZE, vocabulary=""):
+    """
+    A function to read a file of user vectors chunk by chunk, only one chunk is in memory at a time.
+
+    Parameters:
+        path (str): path to the file
+        chunk_size (int): number of users in a chunk
+        vocabulary (str): fingerprint of the vocabulary in use, a ValueError is raised if the file has another one
+
+    Returns:
+        chunks (generator): (names, user vectors, excluded ids) for each chunk, the user vectors
+                            are the rows of a 2D array and excluded ids is a list with an array for each user
+    """
+    with open(path, "rb") as users_file:
+        magic, version, dimension, saved = USER_VECTORS_HEADER.unpack(users_file.read(USER_VECTORS_HEADER.size))
+        if magic != USER_VECTORS_MAGIC or version != USER_VECTORS_VERSION:
+            raise ValueError(f"{path} is not a file of user vectors")
+
+        check_vocabulary(path, saved.rstrip(b"\0").decode("ascii"), vocabulary)
+
+        while True:
+            names, vectors, excluded = [], np.zeros((chunk_size, dimension), dtype=np.float32), []
+
+            while len(names) < chunk_size:
+                data = users_file.read(USER_RECORD.itemsize)
+                if len(data) < USER_RECORD.itemsize:
+                    break
+
+                record = np.frombuffer(data, dtype=USER_RECORD)[0]
+                terms, excluded_count = int(record["terms"]), int(record["excluded"])
+
+                indices = np.frombuffer(users_file.read(terms * 4), dtype="<i4")
+                vectors[len(names), indices] = np.frombuffer(users_file.read(terms * 4), dtype="<f4")
+                excluded.append(np.frombuffer(users_file.read(excluded_count * 8), dtype="<i8"))
+                names.append(record["name"].decode("utf-8"))
+
+            if not names:
+                return
+
+            yield names, vectors[:len(names)], excluded
+
+
+def stored_profiles(profile_store=None, vector_store=None):
+    """
+    A function to restore every stored profile, one after the other.
+
+    Parameters:
+        profile_store (ProfileStore): the stored profiles, the default directory if not given
+        vector_store (VectorStore): movie vectors the tails of the logs are replayed with
+
+    Returns:
+        users (generator): (name, user vector, ids of the already recommended movies) for each profile
+    """
+    if profile_store is None:
+        profile_store = ProfileStore()
+
+    for name in profile_store.names():
+        user_vector, excluded_ids, _, _ = profile_store.load(name, vector_store)
+        yield name, user_vector, excluded_ids
+
+
+class CatalogBlock:
+    """
+    This class scores one block of rows of the catalog for a whole chunk of users at once.
+
+    A block of a dense store is scored with one matrix-matrix product of its rows.
+    A block of a sparse store is split by columns: the few columns that most movies have (genres,
+    common keywords) are filled into a small dense matrix scored with one matrix-matrix product,
+    the values of the other columns are only multiplied with the values of the users in the same column,
+    so a user only touches the movies that share one of its rarer terms.
+    Scoring every non-zero value of the block for every user would take many times longer.
+
+    Nothing but the norms is copied out of the vector store when the block is made, the dense matrix
+    of a sparse block is filled each time the block is scored and dropped afterwards,
+    so only the block being scored takes memory.
+
+    Variables:
+    start: the first row of the block in the catalog
+    end: the row after the last row of the block
+    norms: an array of the magnitudes of the movie vectors of the block, 1 for zero vectors
+    vector_store: the movie vectors
+    store: a vector store over the rows of a dense block, None for a sparse block
+    dense_columns: an array of the columns of a sparse block that are scored as a dense matrix
+    dense_positions: an array mapping a column to its position in dense_columns (-1 for the other columns)
+    """
+
+    def __init__(self, vector_store, start, end, dense_columns):
+        """
+        The constructor for the CatalogBlock class.
+
+        Parameters:
+            vector_store (VectorStore): movie vectors
+            start (int): first row of the block
+            end (int): row after the last row of the block
+            dense_columns (np.array): columns of a sparse store that are scored as a dense matrix
+        """
+        self.start, self.end = start, end
+        # a zero vector has a dot product of 0 with every user, the norm only has to be non-zero
+        self.norms = np.where(vector_store.norms[start:end] != 0, vector_store.norms[start:end], 1.0)
+        self.vector_store = vector_store
+        self.store = None
+
+        if not isinstance(vector_store, SparseVectorStore):
+            # a view of the rows, nothing is copied
+            if isinstance(vector_store, QuantizedVectorStore):
+                self.store = QuantizedVectorStore(vector_store.ids[start:end], vector_store.matrix[start:end],
+                                                  vector_store.scales[start:end], self.norms)
+            else:
+                self.store = VectorStore(vector_store.ids[start:end], vector_store.matrix[start:end], self.norms)
+            return
+
+        self.dense_columns = np.asarray(dense_columns, dtype=np.int64)
+        self.dense_positions = np.full(vector_store.dimension, -1, dtype=np.int64)
+        self.dense_positions[self.dense_columns] = np.arange(len(self.dense_columns))
+
+    def __len__(self):
+        return self.end - self.start
+
+    def dot_products(self, user_vectors):
+        """
+        A function to calculate the dot products of every movie vector of the block with every user vector.
+
+        Parameters:
+            user_vectors (np.array): one user vector per row
+
+        Returns:
+            dot_products (np.array): 2D array with one row per user and one column per movie of the block
+        """
+        if self.store is not None:
+            return self.store.dot_products(user_vectors.T).T
+
+        vector_store = self.vector_store
+        users, rows = len(user_vectors), len(self)
+
+        # the non-zero values of the block, straight from the csr arrays of the store
+        first, last = vector_store.indptr[self.start], vector_store.indptr[self.end]
+        value_rows = np.repeat(np.arange(rows), np.diff(vector_store.indptr[self.start:self.end + 1]))
+        columns = vector_store.indices[first:last]
+        values = vector_store.data[first:last].astype(float)
+        if isinstance(vector_store, QuantizedSparseVectorStore):
+            values *= vector_store.scales[self.start:self.end][value_rows]
+
+        # the common columns as a dense matrix of the block only, filled through its flat positions
+        positions = self.dense_positions[columns]
+        in_dense = positions >= 0
+        filled = np.flatnonzero(in_dense)
+        dense = np.zeros((rows, len(self.dense_columns)), dtype=float)
+        dense.ravel()[value_rows[filled] * len(self.dense_columns) + positions[filled]] = values[filled]
+        dot_products = np.asarray(user_vectors[:, self.dense_columns], dtype=float) @ dense.T
+
+        # the non-zero values of the users sorted by column, the chunk is small next to the block
+        user_rows, terms = np.divmod(np.flatnonzero(user_vectors != 0), user_vectors.shape[1])
+        order = np.argsort(terms, kind="stable")
+        user_rows, terms = user_rows[order], terms[order]
+        user_values = user_vectors[user_rows, terms].astype(float)
+        offsets = np.zeros(vector_store.dimension + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(terms, minlength=vector_store.dimension))
+
+        # every value of the other columns meets the values of the users in the same (rare) column
+        rare = np.flatnonzero(~in_dense)
+        starts = offsets[columns[rare]]
+        lengths = offsets[columns[rare] + 1] - starts
+        pairs = np.repeat(rare, lengths)
+        partners = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+        keys = user_rows[partners] * rows + value_rows[pairs]
+        weights = user_values[partners] * values[pairs]
+        dot_products += np.bincount(keys, weights, minlength=users * rows).reshape(users, rows)
+
+        return dot_products
+
+
+def catalog_blocks(vector_store, chunk_size=EXPORT_CHUNK_SIZE, block_values=EXPORT_BLOCK_VALUES,
+                   dense_columns=EXPORT_DENSE_COLUMNS):
+    """
+    A function to split the catalog into blocks of rows that are scored for a chunk of users at once.
+    A block has at most block_values / chunk_size rows, so the scores of a chunk take at most block_values values.
+    The blocks only point into the vector store, their values are gathered each time a block is scored.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        chunk_size (int): number of users scored together
+        block_values (int): the number of values the scores of a block may take
+        dense_columns (int): number of the most common columns of a sparse store that are scored as a dense matrix
+
+    Returns:
+        blocks (list): a CatalogBlock for every block
+    """
+    count = len(vector_store)
+    limit = max(1, block_values // max(1, chunk_size))
+
+    columns = np.zeros(0, dtype=np.int64)
+    if isinstance(vector_store, SparseVectorStore):
+        column_counts = np.bincount(vector_store.indices, minlength=vector_store.dimension)
+        columns = np.sort(np.argsort(-column_counts, kind="stable")[:dense_columns])
+
+    return [CatalogBlock(vector_store, start, min(count, start + limit), columns)
+            for start in range(0, count, limit)]
+
+
+def _top_n(scores, rows, n, sentinel):
+    """
+    A function to pick the n best scores of every user, ties keep the lower rows like select_top_k.
+    Only the scores from the n-th best score of a user up are sorted.
+
+    Parameters:
+        scores (np.array): the scores, one row per user
+        rows (np.array): the catalog rows of the scores, of the same shape or one for each column
+        n (int): number of scores that are picked
+        sentinel (int): a row after every row of the catalog
+
+    Returns:
+        best_scores (np.array): the best n scores of each user in ranked order, -inf where a user has fewer
+        best_rows (np.array): the catalog rows of the best scores, sentinel where a user has fewer
+    """
+    users, columns = scores.shape
+    rows = np.broadcast_to(rows, scores.shape)
+
+    if n <= 0:
+        return np.zeros((users, 0)), np.zeros((users, 0), dtype=np.int64)
+
+    if columns > n:
+        threshold = np.partition(scores, columns - n, axis=1)[:, columns - n]
+        # np.flatnonzero of a boolean mask is much faster than np.nonzero of a 2D array
+        picked_users, picked = np.divmod(np.flatnonzero(scores >= threshold[:, None]), columns)
+    else:
+        picked_users, picked = np.divmod(np.arange(users * columns), columns)
+
+    picked_scores, picked_rows = scores[picked_users, picked], rows[picked_users, picked]
+    order = np.lexsort((picked_rows, -picked_scores, picked_users))
+    picked_users, picked_scores, picked_rows = picked_users[order], picked_scores[order], picked_rows[order]
+
+    # the rank of every score among the scores of its user, only the first n ranks are kept
+    ranks = np.arange(len(picked_users)) - np.searchsorted(picked_users, picked_users)
+    kept = ranks < n
+
+    best_scores = np.full((users, n), -np.inf)
+    best_rows = np.full((users, n), sentinel, dtype=np.int64)
+    best_scores[picked_users[kept], ranks[kept]] = picked_scores[kept]
+    best_rows[picked_users[kept], ranks[kept]] = picked_rows[kept]
+
+    return best_scores, best_rows
+
+
+def score_chunk(vector_store, user_vectors, excluded, n=EXPORT_COUNT, candidates=None, blocks=None):
+    """
+    A function to find the n best movies for each user of a chunk.
+    Every block of the catalog is scored for all users with one matrix-matrix product,
+    the excluded movies of each user are masked out and the best n of every user are merged block by block.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        user_vectors (np.array): one user vector per row
+        excluded (list): ids of the movies that must not be recommended, an array for each user
+        n (int): number of movies to find for each user
+        candidates (np.array): boolean mask of the rows that may be recommended, all rows if not given
+        blocks (list): the blocks of the catalog, see catalog_blocks
+
+    Returns:
+        rows (np.array): rows of the best movies of each user in ranked order, one row per user
+        similarity (np.array): cosine similarity of those movies, -inf where a user has fewer than n movies
+    """
+    users, count = len(user_vectors), len(vector_store)
+    if blocks is None:
+        blocks = catalog_blocks(vector_store, users)
+
+    # users or movies with a zero vector have a dot product of 0, and so a similarity of 0
+    user_norms = np.linalg.norm(user_vectors, axis=1)
+    user_norms[user_norms == 0] = 1
+    best_scores = np.full((users, 0), -np.inf)
+    best_rows = np.full((users, 0), count, dtype=np.int64)
+
+    # the excluded rows of all users, sorted by row so that every block takes one slice of them
+    excluded_users = np.repeat(np.arange(users), [len(ids) for ids in excluded])
+    excluded_rows = vector_store.rows(np.concatenate(list(excluded) + [np.zeros(0, dtype=np.int64)]))
+    known = excluded_rows >= 0
+    order = np.argsort(excluded_rows[known], kind="stable")
+    excluded_rows, excluded_users = excluded_rows[known][order], excluded_users[known][order]
+
+    for block in blocks:
+        start, end = block.start, block.end
+
+        with instrumentation.stage("score"):
+            scores = block.dot_products(user_vectors)
+            scores /= user_norms[:, None]
+            scores /= block.norms
+        instrumentation.count("rows scored", (end - start) * users)
+
+        with instrumentation.stage("select"):
+            first, last = np.searchsorted(excluded_rows, [start, end])
+            scores[excluded_users[first:last], excluded_rows[first:last] - start] = -np.inf
+            if candidates is not None:
+                scores[:, ~candidates[start:end]] = -np.inf
+
+            # the best n of the block are merged with the best n of the blocks before
+            block_scores, block_rows = _top_n(scores, np.arange(start, end), n, count)
+            best_scores, best_rows = _top_n(np.hstack((best_scores, block_scores)),
+                                            np.hstack((best_rows, block_rows)), n, count)
+
+    return best_rows, best_scores
+
+
+def export_recommendations(vector_store, users_path, output_path, n=EXPORT_COUNT, chunk_size=EXPORT_CHUNK_SIZE,
+                           candidates=None, block_values=EXPORT_BLOCK_VALUES, vocabulary=""):
+    """
+    A function to export the n best movies for every user of a file of user vectors.
+    The users are read, scored and written chunk by chunk, so the memory does not grow with the number of users.
+
+    The output is a csv file with a line for each user: the name of the user, the movie ids and the cosine
+    similarities of the movies, best first, separated by '|'. Excluded movies are never exported,
+    a user with fewer than n other movies gets all of them.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        users_path (str): path to the file of user vectors, see write_user_vectors
+        output_path (str): path to the csv file
+        n (int): number of movies for each user
+        chunk_size (int): number of users scored together
+        candidates (np.array): boolean mask of the rows that may be recommended, e.g. from filter_movies
+        block_values (int): the number of values the scores of a block of the catalog may take
+        vocabulary (str): fingerprint of the vocabulary of the movie vectors, checked against the file of users
+
+    Returns:
+        count (int): the number of users exported
+    """
+    # an index or a pool of workers is not needed, every movie is scored anyway
+    vector_store = getattr(vector_store, "vector_store", vector_store)
+    blocks = catalog_blocks(vector_store, chunk_size, block_values)
+    count = 0
+
+    with open(output_path + ".tmp", "w", newline="") as output_file:
+        writer = csv.writer(output_file, delimiter=";")
+        writer.writerow(["User", "Movies", "Similarity"])
+
+        for names, user_vectors, excluded in read_user_vectors(users_path, chunk_size, vocabulary):
+            if user_vectors.shape[1] != vector_store.dimension:
+                raise ValueError(f"the user vectors have dimension {user_vectors.shape[1]}, "
+                                 f"the movie vectors {vector_store.dimension}")
+
+            rows, similarity = score_chunk(vector_store, user_vectors, excluded, n, candidates, blocks)
+            movie_ids = vector_store.ids[np.minimum(rows, len(vector_store) - 1)]
+
+            for name, user_ids, user_similarity in zip(names, movie_ids, similarity):
+                found = user_similarity > -np.inf
+                writer.writerow([name, "|".join(map(str, user_ids[found].tolist())),
+                                 "|".join(f"{value:.6f}" for value in user_similarity[found].tolist())])
+
+            count += len(names)
+            instrumentation.count("users exported", len(names))
+
+    os.replace(output_path + ".tmp", output_path)
+
+    return count
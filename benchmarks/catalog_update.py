@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# run from the root of the project: python benchmarks/catalog_update.py [changed movies ...]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_index import build_ivf_index
+from attribute_index import build_attribute_index
+from build_pipeline import build_catalog, read_movies
+from catalog import load_catalog
+from similarity_table import build_similarity_table
+
+metadata_file = 'additional_data/movie_metadata.csv'
+neighbours = 50
+
+
+def full_rebuild(directory):
+    """
+    A function to build the catalog and its indexes from scratch, what a refresh cost before.
+    """
+    _, vector_store, _ = build_catalog(metadata_file, directory)
+    build_ivf_index(vector_store)
+    build_similarity_table(vector_store, neighbours)
+
+
+def main():
+    """
+    A function to compare a full rebuild of the catalog with removing and adding back a few movies.
+    """
+    changes = [int(argument) for argument in sys.argv[1:]] or [1, 10, 100]
+
+    #the full rebuild of the catalog and its indexes
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        full_rebuild(directory)
+        rebuild_time = time.perf_counter() - start
+
+        print(f"full rebuild: {rebuild_time * 1000:.0f} ms")
+        print("changed movies;ms to remove;ms to add back;speedup")
+
+        movies = {movie["Title"]: movie for _, movie in read_movies(metadata_file)}
+        rng = np.random.default_rng(0)
+
+        #remove some movies and add them back, with every index kept up to date
+        for change in changes:
+            catalog = load_catalog(directory)
+            catalog.ivf_index = build_ivf_index(catalog.vector_store)
+            catalog.similarity_table = build_similarity_table(catalog.vector_store, neighbours)
+            catalog.attribute_index = build_attribute_index(catalog.movie_data, catalog.vector_store.ids)
+
+            removed = rng.choice(catalog.vector_store.ids, change, replace=False)
+            added = [movies[title] for title in catalog.movie_data.titles(removed)]
+
+            start = time.perf_counter()
+            catalog.remove_movies(removed)
+            remove_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            catalog.add_movies(added)
+            add_time = time.perf_counter() - start
+
+            print(f"{change};{remove_time * 1000:.1f};{add_time * 1000:.1f};"
+                  f"{rebuild_time / (remove_time + add_time):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import numpy as np
+
+# run from the root of the project: python benchmarks/embedding.py [dimension ...]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from embedding import EMBEDDING_METHODS, build_embedding
+from user_vectors import random_user_vectors
+from vector_store import load_vectors_binary
+
+users = 200
+k = 10
+
+
+def measure(vector_store):
+    """
+    A function to build the user vectors of the benchmark users in a space and search their top k movies.
+
+    Returns:
+        results (list): the top k movie ids of every user
+        feedback_time (float): seconds to apply one feedback event
+        query_time (float): seconds to search the top k movies of one user
+    """
+    start = time.perf_counter()
+    user_vectors = random_user_vectors(vector_store, users)
+    feedback_time = (time.perf_counter() - start) / users / 10
+
+    start = time.perf_counter()
+    results = [set(bk.top_k(user_vector, k, vector_store=vector_store)[0]) for user_vector in user_vectors]
+    query_time = (time.perf_counter() - start) / users
+
+    return results, feedback_time, query_time
+
+
+def main():
+    """
+    A function to compare the search in embedded spaces of several dimensions with the search in the tf-idf space.
+    """
+    dimensions = [int(argument) for argument in sys.argv[1:]] or [32, 64, 128, 256]
+
+    #the same users (the same feedback on the same movies) in the tf-idf space and in every embedded space
+    vector_store = load_vectors_binary(bk.VECTORS_BINARY_FILE, bk.get_vocabulary_fingerprint())
+    reference, feedback_time, query_time = measure(vector_store)
+
+    print("space;dimension;seconds to build;overlap@10;ms per feedback;ms per query")
+    print(f"tf-idf;{vector_store.dimension};-;1.000;{feedback_time * 1000:.3f};{query_time * 1000:.3f}")
+
+    for method in EMBEDDING_METHODS:
+        for dimension in dimensions:
+            start = time.perf_counter()
+            embedded_store = build_embedding(vector_store, dimension, method)
+            build_time = time.perf_counter() - start
+
+            results, feedback_time, query_time = measure(embedded_store)
+            overlap = np.mean([len(found & expected) / k for found, expected in zip(results, reference)])
+
+            print(f"{method};{dimension};{build_time:.2f};{overlap:.3f};"
+                  f"{feedback_time * 1000:.3f};{query_time * 1000:.3f}")
+
+
+if __name__ == "__main__":
+    main()
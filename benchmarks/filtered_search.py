@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+# run from the root of the project: python benchmarks/filtered_search.py ["filter expression" ...]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from user_vectors import random_user_vectors
+
+users = 200
+k = 10
+
+
+def main():
+    """
+    A function to compare the unfiltered search with searches of the movies that pass a filter.
+    """
+    expressions = sys.argv[1:] or ["genre=Sci-Fi, year>2000, imdb>=7, duration<130",
+                                   "director=Steven Spielberg", "genre=Drama", "imdb>=5"]
+
+    #compare the unfiltered search with searches that only score the movies passing a filter
+    vector_store = bk.get_vector_store()
+    user_vectors = random_user_vectors(vector_store, users)
+
+    start = time.perf_counter()
+    for user_vector in user_vectors:
+        bk.top_k(user_vector, k, vector_store=vector_store)
+    unfiltered_time = (time.perf_counter() - start) / users
+
+    print(f"no filter: {unfiltered_time * 1000:.3f} ms per query")
+    print("filter;candidates;ms to build the mask;ms per query")
+
+    for expression in expressions:
+        start = time.perf_counter()
+        candidates = bk.filter_movies(expression)
+        mask_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for user_vector in user_vectors:
+            bk.top_k(user_vector, k, vector_store=vector_store, candidates=candidates)
+        query_time = (time.perf_counter() - start) / users
+
+        print(f"{expression};{int(candidates.sum())};{mask_time * 1000:.3f};{query_time * 1000:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import numpy as np
+
+# run from the root of the project: python benchmarks/index_recall.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from ann_index import load_ivf_index
+from user_vectors import random_user_vectors
+
+users = 200
+k = 10
+probe_settings = [1, 2, 4, 8, 16, 32]
+
+
+def main():
+    """
+    A function to measure the recall and the speed of the approximate search for several numbers of probes.
+    """
+    #compare the approximate search with the exact scan of the whole catalog
+    vector_store = bk.get_vector_store()
+    ivf_index = load_ivf_index(bk.get_ivf_index_file(), vector_store, vocabulary=bk.get_vocabulary_fingerprint())
+    user_vectors = random_user_vectors(vector_store, users)
+
+    start = time.perf_counter()
+    exact = [set(vector_store.search(user_vector, k)[0]) for user_vector in user_vectors]
+    exact_time = (time.perf_counter() - start) / users
+
+    print(f"exact scan: {exact_time * 1000:.3f} ms per query")
+    print("probes;recall@10;ms per query")
+
+    for probes in probe_settings:
+        start = time.perf_counter()
+        found = [ivf_index.search(user_vector, k, probes=probes)[0] for user_vector in user_vectors]
+        query_time = (time.perf_counter() - start) / users
+
+        recall = np.mean([len(exact_rows & set(rows)) / k for exact_rows, rows in zip(exact, found)])
+        print(f"{probes};{recall:.3f};{query_time * 1000:.3f}")
+
+
+if __name__ == "__main__":
+    main()
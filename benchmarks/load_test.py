@@ -0,0 +1,416 @@
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from multiprocessing import Pool
+import numpy as np
+
+# run from the root of the project: python benchmarks/load_test.py [--mode backend|incremental|batched]
+#   [--sessions 2000] [--concurrency 1000] [--clicks 50] [--workers 1] [--processes] [--output results.json]
+# every worker (a thread, or a process with --processes) keeps its share of the sessions alive at once
+# and lets each of them click once in turn, like many users sitting in front of the program at the same time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from service import RecommendationService
+
+# "backend" is the original session of the program: a list of recommended movies, handle_feedback
+# and get_recommendation after every click and give_recommendations_list at the end,
+# "incremental" is a session of the service with incremental scores, like the GUI now uses,
+# "batched" is a session of the service scored in batches with the other sessions, like the http service uses
+# (a batch waits for requests of other workers, so it needs many workers)
+MODES = ("backend", "incremental", "batched")
+# number of random movies shown before the first recommendation
+WARM_UP = 10
+# a synthetic user's taste is the sum of a few movies, the user likes the movies most similar to it
+TASTE_MOVIES = 3
+LIKE_FRACTION = 0.2
+# probability that a user decides against their taste, and that a liked movie goes to the watchlist
+NOISE = 0.05
+WATCHLIST_RATE = 0.2
+# sessions whose memory is measured, one after the other in one thread
+MEMORY_SESSIONS = 200
+# clicks are grouped by their position in the session, to see whether clicks get slower as a session goes on
+LENGTH_BUCKETS = (1, 11, 101, 1001, 10001)
+
+
+class SyntheticUser:
+    """
+    This class is a simulated user with a hidden taste, they like a movie if it is close to their taste.
+
+    Variables:
+    vector_store: the movie vectors
+    likes: a boolean mask over the rows of the vector store, the movies the user likes
+    rng: the random generator of the user's decisions
+    """
+
+    def __init__(self, vector_store, rng):
+        """
+        The constructor for the SyntheticUser class.
+
+        Parameters:
+            vector_store (VectorStore): movie vectors
+            rng (np.random.Generator): random generator
+        """
+        taste = vector_store.vectors(rng.choice(vector_store.ids, TASTE_MOVIES, replace=False)).sum(axis=0)
+        scores = vector_store.scores(taste)
+
+        self.vector_store = vector_store
+        self.likes = scores >= np.quantile(scores, 1 - LIKE_FRACTION)
+        self.rng = rng
+
+    def decide(self, movie_id):
+        """
+        A function to decide whether the user likes a movie.
+
+        Parameters:
+            movie_id (int): id of the movie
+
+        Returns:
+            liked (bool): True for Like, False for Dislike
+        """
+        row = self.vector_store.rows([movie_id])[0]
+        liked = bool(row >= 0 and self.likes[row])
+
+        if self.rng.random() < NOISE:
+            liked = not liked
+
+        return liked
+
+
+class Timings:
+    """
+    This class collects the latencies of one worker.
+
+    Variables:
+    clicks: the position of every click in its session (1 for the first click)
+    click_times: the time of every click in seconds
+    start_times: the time of starting every session in seconds
+    end_times: the time of ending every session in seconds
+    """
+
+    def __init__(self, keep=True):
+        """
+        The constructor for the Timings class.
+
+        Parameters:
+            keep (bool): whether the latencies are kept, they are thrown away while the memory is measured
+        """
+        # a deque of length 0 forgets everything that is appended
+        self.clicks, self.click_times, self.start_times, self.end_times = (
+            [] if keep else deque(maxlen=0) for _ in range(4))
+
+
+def backend_session(user, clicks, timings):
+    """
+    A function that plays one session of the original program with the backend functions, one click per step.
+
+    Parameters:
+        user (SyntheticUser): the user
+        clicks (int): number of clicks after the random movies
+        timings (Timings): the latencies are added to it
+
+    Returns:
+        session (generator): a generator that makes one click each time it is advanced
+    """
+    start = time.perf_counter()
+    recommended_movies = []
+    watchlist = []
+    movie_queue = deque(bk.get_random_movies(recommended_movies))
+    uservector = np.zeros(bk.get_vector_store().dimension)
+    timings.start_times.append(time.perf_counter() - start)
+    yield
+
+    for click in range(1, WARM_UP + clicks + 1):
+        movie_id = movie_queue.popleft()
+        liked = user.decide(movie_id)
+
+        start = time.perf_counter()
+        uservector = bk.handle_feedback(None, uservector, liked, movie_id)
+        if liked and user.rng.random() < WATCHLIST_RATE:
+            bk.add_to_watchlist(movie_id, watchlist)
+
+        if not movie_queue:
+            recommendation = bk.get_recommendation(uservector, recommended_movies)
+            if recommendation == 0:
+                break
+            movie_queue.append(recommendation)
+        timings.clicks.append(click)
+        timings.click_times.append(time.perf_counter() - start)
+        yield
+
+    start = time.perf_counter()
+    bk.give_recommendations_list(uservector, recommended_movies)
+    timings.end_times.append(time.perf_counter() - start)
+
+
+def service_session(service, incremental, user, clicks, timings):
+    """
+    A function that plays one session of the recommendation service, one click per step.
+
+    Parameters:
+        service (RecommendationService): the service, shared by the sessions of all threads
+        incremental (bool): whether the session keeps incremental scores or is scored in batches
+        user (SyntheticUser): the user
+        clicks (int): number of clicks after the random movies
+        timings (Timings): the latencies are added to it
+
+    Returns:
+        session (generator): a generator that makes one click each time it is advanced
+    """
+    start = time.perf_counter()
+    session_id, random_movies = service.start_session(incremental)
+    movie_queue = deque(random_movies)
+    timings.start_times.append(time.perf_counter() - start)
+    yield
+
+    for click in range(1, WARM_UP + clicks + 1):
+        movie_id = movie_queue.popleft()
+        liked = user.decide(movie_id)
+
+        start = time.perf_counter()
+        service.feedback(session_id, movie_id, liked)
+        if liked and user.rng.random() < WATCHLIST_RATE:
+            service.add_to_watchlist(session_id, movie_id)
+
+        if not movie_queue:
+            movie_ids = service.recommend(session_id)
+            if not movie_ids:
+                break
+            movie_queue.append(movie_ids[0])
+        timings.clicks.append(click)
+        timings.click_times.append(time.perf_counter() - start)
+        yield
+
+    start = time.perf_counter()
+    service.end_session(session_id, 10)
+    timings.end_times.append(time.perf_counter() - start)
+
+
+def new_session(mode, service, user, clicks, timings):
+    """
+    A function to start the session of a mode, see MODES.
+    """
+    if mode == "backend":
+        return backend_session(user, clicks, timings)
+
+    return service_session(service, mode == "incremental", user, clicks, timings)
+
+
+def drive(mode, service, sessions, concurrency, clicks, rng, timings):
+    """
+    A function to play sessions, up to concurrency of them are alive at once and click in turn.
+    A finished session is replaced by a new one until all sessions are played.
+
+    Parameters:
+        mode (str): see MODES
+        service (RecommendationService): the service of the service modes
+        sessions (int): number of sessions
+        concurrency (int): number of sessions alive at once
+        clicks (int): number of clicks of a session after the random movies
+        rng (np.random.Generator): random generator of the users
+        timings (Timings): the latencies are added to it
+
+    Returns:
+        None
+    """
+    vector_store = bk.get_vector_store()
+    users = [SyntheticUser(vector_store, rng) for _ in range(min(sessions, concurrency))]
+    alive = deque()
+    started = 0
+
+    while alive or started < sessions:
+        while started < sessions and len(alive) < concurrency:
+            session = new_session(mode, service, users[started % len(users)], clicks, timings)
+            next(session)
+            alive.append(session)
+            started += 1
+
+        session = alive.popleft()
+        try:
+            next(session)
+            alive.append(session)
+        except StopIteration:
+            pass
+
+    return None
+
+
+def run_process(arguments):
+    """
+    A function run in a worker process, it plays its share of the sessions with its own service.
+
+    Parameters:
+        arguments (tuple): (mode, sessions, concurrency, clicks, seed)
+
+    Returns:
+        timings (Timings): the latencies of the process
+    """
+    mode, sessions, concurrency, clicks, seed = arguments
+    random.seed(seed)
+    timings = Timings()
+    drive(mode, RecommendationService(), sessions, concurrency, clicks, np.random.default_rng(seed), timings)
+
+    return timings
+
+
+def memory_per_session(mode, clicks, seed):
+    """
+    A function to measure the memory a session holds just before it ends, with tracemalloc.
+    The similarity rows the incremental sessions cache are shared by all sessions, they are counted apart.
+
+    Parameters:
+        mode (str): see MODES
+        clicks (int): number of clicks of a session after the random movies
+        seed (int): seed of the random generators
+
+    Returns:
+        memory (float): bytes for each session
+        shared (int): bytes of the similarity rows cached while the sessions were played
+    """
+    rng = np.random.default_rng(seed)
+    service = RecommendationService()
+    users = [SyntheticUser(bk.get_vector_store(), rng) for _ in range(MEMORY_SESSIONS)]
+    timings = Timings(keep=False)
+
+    # one warm-up session, so that nothing loaded on first use is counted
+    session = new_session(mode, service, users[0], clicks, timings)
+    for _ in session:
+        pass
+
+    tracemalloc.start()
+    before, cached = tracemalloc.get_traced_memory()[0], service.similarity_cache.size
+
+    sessions = []
+    for user in users:
+        session = new_session(mode, service, user, clicks, timings)
+        for _ in range(WARM_UP + clicks + 1):
+            next(session, None)
+        sessions.append(session)
+
+    shared = service.similarity_cache.size - cached
+    memory = (tracemalloc.get_traced_memory()[0] - before - shared) / len(sessions)
+    tracemalloc.stop()
+
+    return memory, shared
+
+
+def summary(times):
+    """
+    A function to summarize latencies in milliseconds.
+    """
+    milliseconds = np.array(times) * 1000
+    if not len(milliseconds):
+        return {"count": 0}
+
+    return {"count": len(milliseconds),
+            "mean_ms": float(milliseconds.mean()),
+            "p50_ms": float(np.percentile(milliseconds, 50)),
+            "p90_ms": float(np.percentile(milliseconds, 90)),
+            "p99_ms": float(np.percentile(milliseconds, 99)),
+            "max_ms": float(milliseconds.max())}
+
+
+def option(arguments, name, default):
+    """
+    A function to read an option of the command line, e.g. --sessions 2000.
+    """
+    if name not in arguments:
+        return default
+
+    return type(default)(arguments[arguments.index(name) + 1])
+
+
+def main():
+    """
+    A function to play the sessions of the load test and print or write its report.
+    """
+    arguments = sys.argv[1:]
+    mode = option(arguments, "--mode", "incremental")
+    sessions = option(arguments, "--sessions", 2000)
+    concurrency = option(arguments, "--concurrency", 1000)
+    clicks = option(arguments, "--clicks", 50)
+    workers = option(arguments, "--workers", 1)
+    processes = "--processes" in arguments
+    output_path = option(arguments, "--output", "")
+    seed = 0
+
+    if mode not in MODES:
+        raise ValueError(f"unknown mode {mode!r}, use one of {', '.join(MODES)}")
+
+    #the movie vectors are loaded before the clock starts, a forked process shares them
+    random.seed(seed)
+    vector_store = bk.get_vector_store()
+    bk.get_movie_data()
+
+    #each worker plays an equal share of the sessions and keeps an equal share of them alive
+    shares = [(mode, sessions // workers + (worker < sessions % workers),
+               max(1, concurrency // workers), clicks, seed + 1 + worker) for worker in range(workers)]
+
+    print(f"{sessions} {mode} sessions of {WARM_UP} + {clicks} clicks, {concurrency} at once, "
+          f"{workers} {'processes' if processes else 'threads'} ...", file=sys.stderr)
+
+    start = time.perf_counter()
+    if processes:
+        with Pool(workers) as pool:
+            results = pool.map(run_process, shares)
+    else:
+        service = RecommendationService()
+        results = [Timings() for _ in shares]
+        threads = [threading.Thread(target=drive, args=(mode, service, share[1], share[2], clicks,
+                                                        np.random.default_rng(share[4]), timings))
+                   for share, timings in zip(shares, results)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+
+    clicks_of_all = np.concatenate([np.array(timings.clicks, dtype=np.int64) for timings in results])
+    click_times = np.concatenate([np.array(timings.click_times) for timings in results])
+
+    #the clicks by their position in the session, a growing latency is a cliff for long sessions
+    by_length = {}
+    for low, high in zip(LENGTH_BUCKETS, LENGTH_BUCKETS[1:]):
+        in_bucket = (clicks_of_all >= low) & (clicks_of_all < high)
+        if in_bucket.any():
+            by_length[f"{low}-{high - 1}"] = summary(click_times[in_bucket])
+
+    #rss of this process, and of the largest worker process
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if processes:
+        peak_rss = max(peak_rss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+    load_test = {"python": platform.python_version(), "numpy": np.__version__, "cpus": os.cpu_count(),
+               "movies": len(vector_store), "mode": mode, "sessions": sessions, "concurrency": concurrency,
+               "clicks": clicks, "workers": workers, "processes": processes,
+               "seconds": elapsed,
+               "sessions_per_s": sessions / elapsed,
+               "clicks_per_s": len(click_times) / elapsed,
+               "click": summary(click_times),
+               "click_by_position": by_length,
+               "start": summary(np.concatenate([timings.start_times for timings in results])),
+               "end": summary(np.concatenate([timings.end_times for timings in results])),
+               "peak_rss_mb": peak_rss / 1024}
+
+    memory, shared = memory_per_session(mode, clicks, seed)
+    load_test["memory_per_session_kb"] = memory / 1024
+    load_test[f"shared_cache_mb_of_{MEMORY_SESSIONS}_sessions"] = shared / 2 ** 20
+
+    report = json.dumps(load_test, indent=2)
+    if output_path:
+        with open(output_path, "w") as output_file:
+            output_file.write(report + "\n")
+    else:
+        print(report)
+
+
+#the worker processes of --processes import this file again under the spawn start method, they must not run the test
+if __name__ == "__main__":
+    main()
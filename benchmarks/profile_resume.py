@@ -0,0 +1,90 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# run from the root of the project: python benchmarks/profile_resume.py [events ...]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from profiles import EVENT_DISLIKED, EVENT_LIKED, EVENT_RECOMMENDED, LOG_RECORD, SNAPSHOT_INTERVAL, ProfileStore
+
+repeats = 5
+
+
+def best_time(function):
+    """
+    A function to get the shortest time of a few runs of a function, in milliseconds.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return min(times) * 1000
+
+
+def append_events(profile_store, name, count, vector_store, rng):
+    """
+    A function to log the events of a heavy user, every movie is recommended and then liked or disliked.
+    """
+    movie_ids = rng.choice(vector_store.ids, count // 2)
+    for movie_id, liked in zip(movie_ids.tolist(), rng.integers(2, size=len(movie_ids)).tolist()):
+        profile_store.append(name, [movie_id], EVENT_RECOMMENDED)
+        profile_store.append(name, [movie_id], EVENT_LIKED if liked else EVENT_DISLIKED)
+
+
+def replay_one_by_one(profile_store, name, vector_store):
+    """
+    A function to restore the user vector of a profile the slow way, every feedback through handle_feedback.
+    """
+    records = np.fromfile(os.path.join(profile_store.directory, name + ".log"), dtype=LOG_RECORD)
+    user_vector = np.zeros(vector_store.dimension)
+
+    for movie_id, event in zip(records["movie_id"].tolist(), records["event"].tolist()):
+        if event <= EVENT_LIKED:
+            user_vector = bk.handle_feedback(vector_store, user_vector, event == EVENT_LIKED, movie_id)
+
+    return user_vector
+
+
+def main():
+    """
+    A function to compare the ways of restoring a profile:
+    one event at a time, the whole log in batches, a snapshot and its tail.
+    """
+    event_counts = [int(argument) for argument in sys.argv[1:]] or [1000, 5000, 20000]
+    vector_store = bk.get_vector_store()
+    rng = np.random.default_rng(0)
+
+    print(f"{len(vector_store)} movies, dimension {vector_store.dimension}, snapshot every {SNAPSHOT_INTERVAL} events")
+    print("events;ms one by one;ms whole log in batches;ms snapshot and tail;snapshot size in bytes")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for event_count in event_counts:
+            profile_store = ProfileStore(directory)
+            name = f"user{event_count}"
+
+            #the snapshot is as old as it can get, the tail is one event short of the next snapshot
+            append_events(profile_store, name, event_count - SNAPSHOT_INTERVAL + 2, vector_store, rng)
+            user_vector, excluded_ids, watchlist, length = profile_store.load(name, vector_store)
+            append_events(profile_store, name, SNAPSHOT_INTERVAL - 2, vector_store, rng)
+
+            one_by_one = best_time(lambda: replay_one_by_one(profile_store, name, vector_store))
+            whole_log = best_time(lambda: profile_store.load(name, vector_store))
+
+            profile_store.save_snapshot(name, user_vector, excluded_ids, watchlist, length)
+            with_snapshot = best_time(lambda: profile_store.load(name, vector_store))
+
+            #the resumed profile is the same as the profile replayed one event at a time
+            assert np.allclose(profile_store.load(name, vector_store)[0],
+                               replay_one_by_one(profile_store, name, vector_store), atol=1e-6)
+
+            print(f"{event_count};{one_by_one:.1f};{whole_log:.1f};{with_snapshot:.1f};"
+                  f"{os.path.getsize(os.path.join(directory, name + '.npz'))}")
+
+
+if __name__ == "__main__":
+    main()
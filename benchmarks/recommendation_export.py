@@ -0,0 +1,97 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+# run from the root of the project: python benchmarks/recommendation_export.py [users ...] [--movies count]
+# with --movies, a synthetic catalog of that many movies is scored instead of the real one
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import backend as bk
+from batch_export import EXPORT_COUNT, export_recommendations, write_user_vectors
+from synthetic_catalog import synthetic_vectors, synthetic_vocabulary
+
+chunk_sizes = [64, 256, 1024]
+# the users of the baseline are given their lists one by one with give_recommendations_list
+baseline_users = 200
+likes = 10
+
+
+def synthetic_users(vector_store, count, rng):
+    """
+    A function to create users that reacted to a few random movies, 100 users at a time.
+    """
+    for start in range(0, count, 100):
+        users = min(100, count - start)
+        movie_ids = rng.choice(vector_store.ids, (users, likes))
+        signs = np.where(rng.random((users, likes)) < 0.7, 1.0, -1.0)
+
+        vectors = vector_store.vectors(movie_ids.ravel()).reshape(users, likes, -1)
+        for user in range(users):
+            yield f"user{start + user}", signs[user] @ vectors[user], movie_ids[user]
+
+
+def one_by_one(vector_store, rng):
+    """
+    A function to time the lists of a few users given one by one, in seconds per user.
+    """
+    users = list(synthetic_users(vector_store, baseline_users, rng))
+
+    start = time.perf_counter()
+    for _, user_vector, excluded_ids in users:
+        bk.give_recommendations_list(user_vector, excluded_ids.tolist(), vector_store)
+
+    return (time.perf_counter() - start) / len(users)
+
+
+def main():
+    """
+    A function to compare the lists given one by one with the batch export,
+    for several numbers of users and chunk sizes.
+    """
+    arguments = sys.argv[1:]
+    movies = None
+    if "--movies" in arguments:
+        position = arguments.index("--movies")
+        movies = int(arguments[position + 1])
+        del arguments[position:position + 2]
+
+    user_counts = [int(argument) for argument in arguments] or [10000, 100000]
+
+    if movies is None:
+        vector_store = bk.get_vector_store()
+    else:
+        vector_store = synthetic_vectors(movies, synthetic_vocabulary(os.path.join(root, "main_data", "vector_info.csv")))
+    rng = np.random.default_rng(0)
+
+    print(f"{len(vector_store)} movies, dimension {vector_store.dimension}, {EXPORT_COUNT} movies for each user")
+    print(f"one by one: {1 / one_by_one(vector_store, rng):.0f} users/s")
+    print("users;chunk size;seconds;users/s;peak memory MB;file MB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        users_path = os.path.join(directory, "user_vectors.bin")
+        output_path = os.path.join(directory, "recommendations.csv")
+
+        for count in user_counts:
+            write_user_vectors(users_path, synthetic_users(vector_store, count, rng), vector_store.dimension)
+
+            for chunk_size in chunk_sizes:
+                start = time.perf_counter()
+                export_recommendations(vector_store, users_path, output_path, chunk_size=chunk_size)
+                elapsed = time.perf_counter() - start
+
+                #the peak memory of a second run, tracemalloc slows the run down
+                tracemalloc.start()
+                export_recommendations(vector_store, users_path, output_path, chunk_size=chunk_size)
+                peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                print(f"{count};{chunk_size};{elapsed:.2f};{count / elapsed:.0f};{peak_memory / 2 ** 20:.1f};"
+                      f"{os.path.getsize(users_path) / 2 ** 20:.1f}")
+
+
+if __name__ == "__main__":
+    main()
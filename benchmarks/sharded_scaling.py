@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import numpy as np
+
+# run from the root of the project: python benchmarks/sharded_scaling.py [max workers] [shard size] [copies]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from sharded_scoring import ShardedScorer
+from user_vectors import random_user_vectors
+from vector_store import SparseVectorStore, VectorStore
+
+users = 50
+k = 10
+
+
+def repeat_catalog(vector_store, copies):
+    """
+    A function to build a larger catalog out of copies of the movie vectors, with new movie ids.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        copies (int): number of copies of the catalog
+
+    Returns:
+        vector_store (VectorStore): the larger catalog
+    """
+    if copies == 1:
+        return vector_store
+
+    count = len(vector_store)
+    ids = np.arange(1, count * copies + 1)
+
+    if isinstance(vector_store, SparseVectorStore):
+        nnz = vector_store.nnz
+        indptr = np.concatenate([vector_store.indptr[:-1] + copy * nnz for copy in range(copies)]
+                                + [[nnz * copies]])
+        return SparseVectorStore(ids, indptr, np.tile(vector_store.indices, copies),
+                                 np.tile(vector_store.data, copies), vector_store.dimension)
+
+    return VectorStore(ids, np.tile(vector_store.matrix, (copies, 1)))
+
+
+def main():
+    """
+    A function to compare the sharded search with 1 to max workers worker processes to the single process search.
+    """
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    #the shard size is derived from the number of workers if not given
+    shard_size = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    #the catalog is repeated this many times, to measure a catalog larger than the real one
+    copies = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    #score random users with the single process search and with 1 to max_workers worker processes
+    vector_store = repeat_catalog(bk.get_vector_store(), copies)
+    user_vectors = random_user_vectors(vector_store, users)
+
+    start = time.perf_counter()
+    expected = [vector_store.search(user_vector, k) for user_vector in user_vectors]
+    single_time = (time.perf_counter() - start) / users
+
+    print(f"{len(vector_store)} movies")
+    print(f"single process: {single_time * 1000:.3f} ms per query")
+    print("workers;shards;ms per query;speedup;same results")
+
+    for workers in range(1, max_workers + 1):
+        scorer = ShardedScorer(vector_store, workers, shard_size)
+
+        # the first query starts the worker processes
+        scorer.search(user_vectors[0], k)
+
+        start = time.perf_counter()
+        found = [scorer.search(user_vector, k) for user_vector in user_vectors]
+        query_time = (time.perf_counter() - start) / users
+
+        #a shard is scored as a smaller matrix, the similarities can differ in the last bits
+        same = all(np.array_equal(rows, expected_rows) and np.allclose(similarity, expected_similarity, atol=1e-5)
+                   for (rows, similarity), (expected_rows, expected_similarity) in zip(found, expected))
+        print(f"{workers};{len(scorer.shards)};{query_time * 1000:.3f};{single_time / query_time:.2f};{same}")
+
+        scorer.close()
+
+
+#the worker processes import this file again under the spawn start method, they must not run the benchmark
+if __name__ == "__main__":
+    main()
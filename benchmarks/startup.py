@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+
+# run from the root of the project: python benchmarks/startup.py
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# every scenario runs in a fresh interpreter, it prints the seconds it took and the peak resident memory
+measure = """
+import csv, resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import backend as bk
+{code}
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+scenarios = {
+    # what the window used to wait for: a list of csv.DictReader dicts and the movie vectors
+    "before: dicts + vectors": """
+with open(bk.MOVIE_DATA_FILE, "r") as csvfile:
+    movie_data = [row for row in csv.DictReader(csvfile, delimiter=";")]
+vector_store = bk.get_vector_store()
+""",
+    # what the window waits for now: the columnar movie data only
+    "after: first window": """
+movie_data = bk.get_movie_data()
+""",
+    # the movie vectors loaded later in the background
+    "after: vectors loaded": """
+movie_data = bk.get_movie_data()
+vector_store = bk.get_vector_store()
+""",
+    "imports only": "",
+}
+
+repeats = 5
+
+
+def main():
+    """
+    A function to time every scenario in a fresh interpreter and print the fastest run.
+    """
+    #time every scenario a few times and keep the fastest run
+    print("scenario;ms;peak RSS in MB")
+
+    for name, code in scenarios.items():
+        runs = []
+        for _ in range(repeats):
+            output = subprocess.run([sys.executable, "-c", measure.format(root=root, code=code)],
+                                    cwd=root, capture_output=True, text=True, check=True).stdout
+            elapsed, peak = output.split()
+            runs.append((float(elapsed), int(peak)))
+
+        elapsed, peak = min(runs)
+        print(f"{name};{elapsed * 1000:.1f};{peak / 1024:.1f}")
+
+
+if __name__ == "__main__":
+    main()
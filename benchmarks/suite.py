@@ -0,0 +1,262 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+# run from the root of the project: python benchmarks/suite.py [movies ...] [--output results.json]
+# compare two runs, e.g. of two commits: python benchmarks/suite.py --compare before.json after.json
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import backend as bk
+from build_pipeline import save_vectors_text
+from synthetic_catalog import save_movie_terms, synthetic_vectors, synthetic_vocabulary
+from vector_store import load_vectors_binary, load_vectors_csv, save_vectors_binary
+
+default_sizes = [5000, 100000, 1000000]
+# number of timed calls of each step, the slow steps of large catalogs are called fewer times
+calls = {"load binary": 20, "load csv": 3, "handle_feedback": 500, "get_recommendation": 200,
+         "give_recommendations_list": 100, "vector.py": 1, "normalize.py": 1}
+# a step is called fewer times once the calls would take longer than this (in seconds)
+step_budget = 10.0
+# number of feedback events that make the user vector the recommendations are scored for
+likes = 10
+
+# an offline script runs in a fresh interpreter in the folder of its data, it prints the seconds and the peak RSS
+measure_script = """
+import resource, runpy, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+runpy.run_path({script!r}, run_name="__main__")
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def statistics(times, peak_memory, movies=None):
+    """
+    A function to summarize the times of the calls of one step.
+
+    Parameters:
+        times (list): the time of each call in seconds
+        peak_memory (int): the peak memory of a call in bytes
+        movies (int): the number of movies a call goes through, for the steps that load or build the catalog
+
+    Returns:
+        summary (dict): latency percentiles in milliseconds, calls per second, peak memory in MB
+                        and movies per second if movies is given
+    """
+    milliseconds = np.array(times) * 1000
+    summary = {"calls": len(times),
+               "mean_ms": float(milliseconds.mean()),
+               "p50_ms": float(np.percentile(milliseconds, 50)),
+               "p90_ms": float(np.percentile(milliseconds, 90)),
+               "p99_ms": float(np.percentile(milliseconds, 99)),
+               "max_ms": float(milliseconds.max()),
+               "throughput_per_s": float(len(times) / max(sum(times), 1e-12)),
+               "peak_memory_mb": peak_memory / 2 ** 20}
+    if movies is not None:
+        summary["movies_per_s"] = movies * len(times) / max(sum(times), 1e-12)
+
+    return summary
+
+
+def time_step(name, function, arguments, movies=None):
+    """
+    A function to time a step of the program in this process.
+    The calls are timed without tracemalloc, which slows allocations down, and one more call
+    is made with it to find the peak memory that a call allocates.
+
+    Parameters:
+        name (str): name of the step, the key of its number of calls
+        function (callable): the step, called with each item of arguments
+        arguments (callable): a function that gives the arguments of the i-th call
+        movies (int): the number of movies a call goes through, see statistics
+
+    Returns:
+        summary (dict): see statistics
+    """
+    times = []
+    started = time.perf_counter()
+
+    for i in range(calls[name]):
+        args = arguments(i)
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+
+        if time.perf_counter() - started > step_budget:
+            break
+
+    args = arguments(len(times))
+    tracemalloc.start()
+    function(*args)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return statistics(times, peak_memory, movies)
+
+
+def time_script(name, directory, movies):
+    """
+    A function to time an offline script of libraries in a fresh interpreter.
+
+    Parameters:
+        name (str): file name of the script, e.g. vector.py
+        directory (str): the folder with the data of the script, the script runs in it
+        movies (int): the number of movies of the catalog
+
+    Returns:
+        summary (dict): see statistics, the peak memory is the peak RSS of the interpreter
+    """
+    times = []
+    peak_memory = 0
+
+    for _ in range(calls[name]):
+        code = measure_script.format(root=root, script=os.path.join(root, "libraries", name))
+        output = subprocess.run([sys.executable, "-c", code], cwd=directory,
+                                capture_output=True, text=True, check=True).stdout
+        elapsed, peak = output.split()[-2:]
+        times.append(float(elapsed))
+        # ru_maxrss is in kilobytes on linux
+        peak_memory = max(peak_memory, int(peak) * 1024)
+
+    return statistics(times, peak_memory, movies)
+
+
+def benchmark_catalog(count, vocabulary, directory):
+    """
+    A function to run every step on a synthetic catalog.
+
+    Parameters:
+        count (int): number of movies
+        vocabulary (list): (term, database frequency, idf) for each column
+        directory (str): an empty folder for the files of the catalog
+
+    Returns:
+        result (dict): the catalog and a summary of each step
+    """
+    start = time.perf_counter()
+    vector_store = synthetic_vectors(count, vocabulary)
+    generate_time = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    steps = {}
+
+    #loading the catalog the program loads, as binary file and as csv file
+    binary_path = os.path.join(directory, "normalized_vectors.bin")
+    text_path = os.path.join(directory, "normalized_vectors.csv")
+    save_vectors_binary(binary_path, vector_store)
+    save_vectors_text(text_path, vector_store)
+
+    steps["load binary"] = time_step("load binary", load_vectors_binary, lambda i: (binary_path,), count)
+    steps["load csv"] = time_step("load csv", load_vectors_csv,
+                                  lambda i: (text_path, vector_store.dimension), count)
+
+    #the feedback of a user on random movies
+    user_vector = np.zeros(vector_store.dimension)
+    movie_ids = rng.choice(vector_store.ids, 10 * calls["handle_feedback"] + 1).tolist()
+    steps["handle_feedback"] = time_step(
+        "handle_feedback", bk.handle_feedback,
+        lambda i: (vector_store, user_vector, i % 3 != 0, movie_ids[i]))
+
+    #recommendations for users that reacted to a few random movies, like after the 10 random movies of a session
+    users = []
+    for i in range(max(calls["get_recommendation"], calls["give_recommendations_list"]) + 1):
+        events = list(zip(movie_ids[i * likes:(i + 1) * likes], (rng.random(likes) < 0.7).tolist()))
+        users.append((bk.handle_feedback_batch(vector_store, np.zeros(vector_store.dimension), events),
+                      [movie_id for movie_id, _ in events]))
+
+    steps["get_recommendation"] = time_step(
+        "get_recommendation", bk.get_recommendation,
+        lambda i: (users[i][0], list(users[i][1]), vector_store))
+    steps["give_recommendations_list"] = time_step(
+        "give_recommendations_list", bk.give_recommendations_list,
+        lambda i: (users[i][0], list(users[i][1]), vector_store))
+
+    #the offline build of the vectors from the movie terms
+    save_movie_terms(os.path.join(directory, "A_data.csv"), vector_store, vocabulary)
+    shutil.copy(os.path.join(root, "main_data", "vector_info.csv"), directory)
+    steps["vector.py"] = time_script("vector.py", directory, count)
+    steps["normalize.py"] = time_script("normalize.py", directory, count)
+
+    return {"movies": count, "dimension": vector_store.dimension,
+            "terms_per_movie": vector_store.nnz / count, "generate_s": generate_time, "steps": steps}
+
+
+def git_commit():
+    """
+    A function to get the commit the benchmarks ran on, None outside of a git repository.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path):
+    """
+    A function to print the median latency of every step of two runs side by side.
+    """
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+
+    print(f"before: {before['commit']}, after: {after['commit']}")
+    print("movies;step;p50 ms before;p50 ms after;speedup")
+
+    before_catalogs = {catalog["movies"]: catalog for catalog in before["catalogs"]}
+    for catalog in after["catalogs"]:
+        if catalog["movies"] not in before_catalogs:
+            continue
+
+        for step, summary in catalog["steps"].items():
+            old = before_catalogs[catalog["movies"]]["steps"].get(step)
+            if old is not None:
+                print(f"{catalog['movies']};{step};{old['p50_ms']:.3f};{summary['p50_ms']:.3f};"
+                      f"{old['p50_ms'] / max(summary['p50_ms'], 1e-9):.2f}x")
+
+
+def main():
+    """
+    A function to run the benchmarks on synthetic catalogs of every size, or to compare two runs.
+    """
+    arguments = sys.argv[1:]
+
+    if arguments[:1] == ["--compare"]:
+        compare(arguments[1], arguments[2])
+        return None
+
+    output_path = None
+    if "--output" in arguments:
+        position = arguments.index("--output")
+        output_path = arguments[position + 1]
+        del arguments[position:position + 2]
+
+    sizes = [int(argument) for argument in arguments] or default_sizes
+    vocabulary = synthetic_vocabulary(os.path.join(root, "main_data", "vector_info.csv"))
+
+    results = {"commit": git_commit(), "python": platform.python_version(), "numpy": np.__version__,
+               "cpus": os.cpu_count(), "catalogs": []}
+
+    #every catalog is written to its own folder, which is removed afterwards
+    for count in sizes:
+        print(f"{count} movies ...", file=sys.stderr)
+        with tempfile.TemporaryDirectory() as directory:
+            results["catalogs"].append(benchmark_catalog(count, vocabulary, directory))
+
+    report = json.dumps(results, indent=2)
+    if output_path is not None:
+        with open(output_path, "w") as output_file:
+            output_file.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import csv
+import numpy as np
+from build_pipeline import load_vocabulary
+from vector_store import SparseVectorStore
+
+
+def synthetic_vectors(count, vocabulary, seed=0):
+    """
+    A function to create normalized movie vectors of a synthetic catalog with the term statistics of the real one.
+
+    The idf of a term is ln(movie count / database frequency), so exp(-idf) is the fraction of the real
+    movies with the term. Every synthetic movie has every term with that probability, so each column is
+    as sparse as in the real catalog and the weights are the real idf.
+
+    Parameters:
+        count (int): number of movies
+        vocabulary (list): (term, database frequency, idf) for each column, e.g. from main_data/vector_info.csv
+        seed (int): seed of the random generator
+
+    Returns:
+        vector_store (SparseVectorStore): the normalized movie vectors, the movie ids are 1 to count
+    """
+    rng = np.random.default_rng(seed)
+    idf = np.array([idf for _, _, idf in vocabulary], dtype=float)
+    dimension = len(idf)
+
+    # the movies of each column are drawn at random and a movie drawn twice has the term once,
+    # with a poisson number of draws of mean -count * ln(1 - p) every movie has the term with probability p
+    probability = np.minimum(np.exp(-idf), 1 - 1e-9)
+    columns = np.repeat(np.arange(dimension, dtype=np.int64), rng.poisson(-count * np.log1p(-probability)))
+    rows = rng.integers(count, size=len(columns), dtype=np.int64)
+    rows, columns = np.divmod(np.unique(rows * dimension + columns), dimension)
+
+    indptr = np.zeros(count + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=count))
+
+    data = idf[columns]
+    norms = np.sqrt(np.bincount(rows, weights=data ** 2, minlength=count))
+    data /= norms[rows]
+
+    return SparseVectorStore(np.arange(1, count + 1, dtype=np.int64), indptr, columns.astype(np.int32),
+                             data, dimension)
+
+
+def synthetic_vocabulary(path="main_data/vector_info.csv"):
+    """
+    A function to read the term statistics the synthetic catalogs are based on.
+
+    Parameters:
+        path (str): path to vector_info.csv
+
+    Returns:
+        vocabulary (list): (term, database frequency, idf) for each column
+    """
+    return load_vocabulary(path)
+
+
+def save_movie_terms(path, vector_store, vocabulary):
+    """
+    A function to save the terms of the synthetic movies in the format of A_data.csv, for vector.py.
+    All terms of a movie are written as its keywords, vector.py looks every term up in the same way.
+
+    Parameters:
+        path (str): path to the csv file
+        vector_store (SparseVectorStore): the synthetic movie vectors
+        vocabulary (list): (term, database frequency, idf) for each column
+
+    Returns:
+        None
+    """
+    terms = [term for term, _, _ in vocabulary]
+
+    with open(path, "w", newline="") as movies_file:
+        writer = csv.writer(movies_file, delimiter=";")
+        writer.writerow(["ID", "Title", "Year", "IMDb", "Duration", "Director", "Actor", "Genre", "Keywords"])
+
+        for row, movie_id in enumerate(vector_store.ids.tolist()):
+            start, end = vector_store.indptr[row], vector_store.indptr[row + 1]
+            keywords = "|".join(terms[column] for column in vector_store.indices[start:end].tolist())
+            writer.writerow([movie_id, f"Movie {movie_id}", "", "", "", "", "", "", keywords])
+
+    return None
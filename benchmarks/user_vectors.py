@@ -0,0 +1,27 @@
+import numpy as np
+import backend as bk
+
+
+def random_user_vectors(vector_store, count, likes=10, seed=0):
+    """
+    A function to create user vectors the way the program does, from feedback on random movies.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        count (int): number of user vectors
+        likes (int): number of feedback events of each user
+        seed (int): seed of the random generator
+
+    Returns:
+        user_vectors (list): the user vectors
+    """
+    rng = np.random.default_rng(seed)
+    user_vectors = []
+
+    for _ in range(count):
+        movie_ids = rng.choice(vector_store.ids, size=likes, replace=False)
+        events = [(int(movie_id), bool(rng.random() < 0.7)) for movie_id in movie_ids]
+        user_vectors.append(bk.handle_feedback_batch(
+            vector_store, np.zeros(vector_store.dimension), events))
+
+    return user_vectors
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import numpy as np
+
+# run from the root of the project: python benchmarks/validate_precision.py [users] [k]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from user_vectors import random_user_vectors
+from vector_store import PRECISIONS, convert_precision
+
+
+def values_size(vector_store):
+    """
+    A function to get the memory taken up by the values of a vector store (in bytes).
+    """
+    if hasattr(vector_store, "data"):
+        size = vector_store.data.nbytes + vector_store.indices.nbytes + vector_store.indptr.nbytes
+    else:
+        size = vector_store.matrix.nbytes
+
+    return size + getattr(vector_store, "scales", np.zeros(0)).nbytes
+
+
+def main():
+    """
+    A function to compare the top k rankings of every precision with the float64 rankings.
+    """
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    #compare the top-k rankings of every precision with the float64 rankings for random user profiles
+    reference_store = convert_precision(bk.get_vector_store(), "float64")
+    user_vectors = random_user_vectors(reference_store, users)
+    reference = [reference_store.search(user_vector, k) for user_vector in user_vectors]
+
+    print("precision;bytes;overlap@k;same order;max score error;ms per query")
+
+    for precision in PRECISIONS:
+        vector_store = convert_precision(reference_store, precision)
+
+        start = time.perf_counter()
+        results = [vector_store.search(user_vector, k) for user_vector in user_vectors]
+        query_time = (time.perf_counter() - start) / users
+
+        overlap = np.mean([len(set(rows) & set(reference_rows)) / k
+                           for (rows, _), (reference_rows, _) in zip(results, reference)])
+        same_order = np.mean([np.array_equal(rows, reference_rows)
+                              for (rows, _), (reference_rows, _) in zip(results, reference)])
+        score_error = max(np.abs(vector_store.scores(user_vector) - reference_store.scores(user_vector)).max()
+                          for user_vector in user_vectors[:50])
+
+        print(f"{precision};{values_size(vector_store)};{overlap:.4f};{same_order:.4f};"
+              f"{score_error:.2e};{query_time * 1000:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+import csv
+import io
+import os
+from collections import Counter
+import numpy as np
+from movie_data import build_movie_data, save_movie_data_binary
+from vector_store import SparseVectorStore, save_vectors_binary, vocabulary_fingerprint
+from vectorizer import Vectorizer
+
+
+# the columns of the movie data and the columns of movie_metadata.csv they are taken from
+METADATA_COLUMNS = {"Title": "movie_title", "Year": "title_year", "IMDb": "imdb_score",
+                    "Duration": "duration", "Director": "director_name", "Actor": "actor_1_name",
+                    "Genre": "genres", "Keywords": "plot_keywords"}
+# the kinds of terms in the order of their blocks in the vectors, and the column they come from
+TERM_KINDS = (("genre", "Genre"), ("keyword", "Keywords"), ("actor", "Actor"), ("director", "Director"))
+# keywords, actors and directors of fewer movies are not used in the vectors, every genre is used
+MIN_TERM_COUNT = 5
+# idf values are rounded to this many decimals, like in vector_info.csv
+IDF_DECIMALS = 4
+
+# files written by build_catalog, the same names the program loads them from
+VECTORS_BINARY_NAME = "normalized_vectors.bin"
+MOVIE_DATA_BINARY_NAME = "movie_data.npz"
+VOCABULARY_NAME = "vector_info.csv"
+# the document frequencies, the catalog size of the idf and the next movie id, see catalog.py
+CATALOG_STATE_NAME = "catalog_state.npz"
+# text files that are only written if they are asked for
+MOVIE_DATA_TEXT_NAME = "A_complete_data.csv"
+VECTORS_TEXT_NAME = "normalized_vectors.csv"
+
+
+def read_rows(path):
+    """
+    A function to stream the complete rows of movie_metadata.csv, one at a time, rows with a missing value are skipped.
+    The values are cleaned like the old scripts cleaned them, so a build reproduces A_complete_data.csv:
+    the non-breaking spaces the values end with are removed, except in the titles with a comma and no digit,
+    which keep them (the old cleaning missed them).
+
+    Parameters:
+        path (str): path to movie_metadata.csv
+
+    Yields:
+        row (int): the number of the row in the file
+        link (str): the IMDb link of the movie, the same movie can be in several rows
+        sort_key (str): the title as it is written in the file, the movie ids follow its order
+        movie (dict): the values of the movie data columns ("Title", "Year", ...)
+    """
+    with open(path, "r", encoding="utf-8") as metadata_file:
+        for row, values in enumerate(csv.DictReader(metadata_file)):
+            movie = {column: values[name].replace("\xa0", " ").strip()
+                     for column, name in METADATA_COLUMNS.items()}
+
+            title = values["movie_title"]
+            if "," in title and not any(character.isdigit() for character in title):
+                movie["Title"] = title
+
+            if all(movie.values()):
+                yield row, values["movie_imdb_link"], title, movie
+
+
+def _choose(chosen, row, sort_key, movie):
+    """
+    A function to keep one movie of each title: the one with the best IMDb score, the first one of equal scores.
+    """
+    best = chosen.get(movie["Title"])
+    if best is None or float(movie["IMDb"]) > best[2]:
+        chosen[movie["Title"]] = (row, sort_key, float(movie["IMDb"]))
+
+    return None
+
+
+def choose_movies(rows):
+    """
+    A function to choose the movies of the catalog, one movie of each title.
+
+    Parameters:
+        rows (iterable): (row, link, sort key, movie) from read_rows
+
+    Returns:
+        movies (dict): the sort key of each chosen row
+    """
+    chosen = {}
+    for row, _, sort_key, movie in rows:
+        _choose(chosen, row, sort_key, movie)
+
+    return {row: sort_key for row, sort_key, _ in chosen.values()}
+
+
+def read_movies(path, movies=None):
+    """
+    A function to stream the movies of the catalog from movie_metadata.csv, one movie of each title.
+
+    Parameters:
+        path (str): path to movie_metadata.csv
+        movies (dict): the rows chosen by choose_movies or count_terms, the file is read once more to choose them if not given
+
+    Yields:
+        sort_key (str): the title as it is written in the file, the movie ids follow its order
+        movie (dict): the values of the movie data columns ("Title", "Year", ...)
+    """
+    if movies is None:
+        movies = choose_movies(read_rows(path))
+
+    for row, _, sort_key, movie in read_rows(path):
+        if row in movies:
+            yield sort_key, movie
+
+
+def movie_terms(movie):
+    """
+    A function to get the terms of a movie.
+
+    Parameters:
+        movie (dict): the values of the movie data columns
+
+    Returns:
+        terms (dict): a set of terms for each kind of terms
+    """
+    return {kind: set(movie[column].split("|")) for kind, column in TERM_KINDS}
+
+
+def count_terms(rows):
+    """
+    A function to count in how many movies each term appears (the document frequency) and to choose the movies.
+    Like in vector_info.csv, the terms are counted once for every movie (IMDb link) of movie_metadata.csv,
+    also for the movies that share their title with a better movie and are left out of the catalog.
+
+    Parameters:
+        rows (iterable): (row, link, sort key, movie) from read_rows
+
+    Returns:
+        term_counts (dict): a Counter of the terms of each kind
+        movies (dict): the sort key of each chosen row, see choose_movies
+    """
+    term_counts = {kind: Counter() for kind, _ in TERM_KINDS}
+    links = set()
+    chosen = {}
+
+    for row, link, sort_key, movie in rows:
+        _choose(chosen, row, sort_key, movie)
+
+        if link not in links:
+            links.add(link)
+            for kind, terms in movie_terms(movie).items():
+                term_counts[kind].update(terms)
+
+    return term_counts, {row: sort_key for row, sort_key, _ in chosen.values()}
+
+
+def build_vocabulary(term_counts, movie_count, min_count=MIN_TERM_COUNT):
+    """
+    A function to choose the terms of the vectors and calculate their idf.
+    The terms are in blocks by kind, and in every block from the most frequent term.
+
+    Parameters:
+        term_counts (dict): a Counter of the terms of each kind
+        movie_count (int): number of movies in the catalog
+        min_count (int): keywords, actors and directors of fewer movies are left out
+
+    Returns:
+        vocabulary (list): (term, database frequency, idf) for each column of the vectors
+    """
+    vocabulary = []
+
+    for kind, _ in TERM_KINDS:
+        for term, count in vocabulary_terms(term_counts, kind, min_count):
+            vocabulary.append((term, count, term_idf(movie_count, count)))
+
+    return vocabulary
+
+
+def vocabulary_terms(term_counts, kind, min_count=MIN_TERM_COUNT):
+    """
+    A function to choose the terms of one kind that get a column, from the most frequent term.
+
+    Parameters:
+        term_counts (dict): a Counter of the terms of each kind
+        kind (str): the kind of terms, e.g. "keyword"
+        min_count (int): keywords, actors and directors of fewer movies are left out
+
+    Returns:
+        terms (list): (term, database frequency) of each chosen term
+    """
+    terms = [(term, count) for term, count in term_counts[kind].items()
+             if kind == "genre" or count >= min_count]
+    terms.sort(key=lambda term_count: (term_count[1], term_count[0]), reverse=True)
+
+    return terms
+
+
+def term_idf(movie_count, count):
+    """
+    A function to calculate the idf of a term, rounded like in vector_info.csv.
+
+    Parameters:
+        movie_count (int): number of movies in the catalog
+        count (int): number of movies the term appears in
+
+    Returns:
+        idf (float): ln(movie_count / count), 0 for terms that do not appear in any movie
+    """
+    if count <= 0:
+        return 0.0
+
+    return round(float(np.log(movie_count / count)), IDF_DECIMALS)
+
+
+def vectorize(movies, movie_ids, vocabulary):
+    """
+    A function to turn a stream of movies into tf-idf vectors.
+    A column is set if its term is any of the movie's genres, keywords, actor or director.
+
+    Parameters:
+        movies (iterable): (sort key, movie) pairs from read_movies
+        movie_ids (dict): movie id for each sort key
+        vocabulary (list): (term, database frequency, idf) for each column
+
+    Yields:
+        movie_id (int): id of the movie
+        movie (dict): the values of the movie data columns
+        columns (np.array): the columns of the movie's terms, ascending
+        weights (np.array): the idf of those terms
+    """
+    vectorizer = Vectorizer([term for term, _, _ in vocabulary],
+                            [idf for _, _, idf in vocabulary])
+
+    for sort_key, movie in movies:
+        columns = vectorizer.columns(set().union(*movie_terms(movie).values()))
+
+        yield movie_ids[sort_key], movie, columns, vectorizer.idf[columns]
+
+
+def normalize(vectors):
+    """
+    A function to normalize a stream of vectors to unit length, zero vectors stay zero.
+
+    Parameters:
+        vectors (iterable): (movie id, movie, columns, weights) from vectorize
+
+    Yields:
+        movie_id (int): id of the movie
+        movie (dict): the values of the movie data columns
+        columns (np.array): the columns of the non-zero weights
+        weights (np.array): the normalized weights
+    """
+    for movie_id, movie, columns, weights in vectors:
+        magnitude = np.linalg.norm(weights)
+        if magnitude > 0:
+            weights = weights / magnitude
+
+        yield movie_id, movie, columns, weights
+
+
+def build_catalog(metadata_path, output_directory, text=False):
+    """
+    A function to build everything the program loads from movie_metadata.csv in one go.
+
+    The file is streamed twice: the first pass counts the terms, the second pass vectorizes and normalizes
+    every movie and puts it straight into the runtime formats. Only the results are kept in memory,
+    the intermediate csv files of the old scripts are written only if they are asked for.
+
+    Parameters:
+        metadata_path (str): path to movie_metadata.csv
+        output_directory (str): directory the files are written to, e.g. main_data
+        text (bool): whether the movie data and the vectors are also written as csv files
+
+    Returns:
+        movie_data (MovieData): the movie data
+        vector_store (SparseVectorStore): the normalized movie vectors
+        vocabulary (list): (term, database frequency, idf) for each column of the vectors
+    """
+    # first pass: count the terms and choose the movies, the movie ids follow the order of the titles
+    term_counts, movies = count_terms(read_rows(metadata_path))
+    movie_count = len(movies)
+    movie_ids = {sort_key: movie_id for movie_id, sort_key in enumerate(sorted(movies.values()), start=1)}
+
+    vocabulary = build_vocabulary(term_counts, movie_count)
+
+    # second pass: vectorize and normalize, the row of a movie is its id - 1
+    values = {column: [None] * movie_count for column in METADATA_COLUMNS}
+    row_columns = [None] * movie_count
+    row_weights = [None] * movie_count
+
+    for movie_id, movie, columns, weights in normalize(
+            vectorize(read_movies(metadata_path, movies), movie_ids, vocabulary)):
+        row = movie_id - 1
+        for column, value in movie.items():
+            values[column][row] = value
+        row_columns[row] = columns
+        row_weights[row] = weights
+
+    ids = np.arange(1, movie_count + 1)
+    values["ID"] = [str(movie_id) for movie_id in ids]
+    movie_data = build_movie_data(values)
+
+    indptr = np.zeros(movie_count + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(columns) for columns in row_columns])
+    vector_store = SparseVectorStore(
+        ids, indptr, np.concatenate(row_columns + [np.zeros(0, dtype=np.int32)]),
+        np.concatenate(row_weights + [np.zeros(0)]), len(vocabulary))
+
+    save_vectors_binary(os.path.join(output_directory, VECTORS_BINARY_NAME), vector_store,
+                        vocabulary_fingerprint([term for term, _, _ in vocabulary]))
+    save_movie_data_binary(os.path.join(output_directory, MOVIE_DATA_BINARY_NAME), movie_data)
+    save_vocabulary(os.path.join(output_directory, VOCABULARY_NAME), vocabulary)
+    kinds = [kind for kind, _ in TERM_KINDS for _ in vocabulary_terms(term_counts, kind)]
+    save_catalog_state(os.path.join(output_directory, CATALOG_STATE_NAME),
+                       [count for _, count, _ in vocabulary], kinds, movie_count, movie_count + 1)
+
+    if text:
+        save_movie_data_text(os.path.join(output_directory, MOVIE_DATA_TEXT_NAME), ids, values)
+        save_vectors_text(os.path.join(output_directory, VECTORS_TEXT_NAME), vector_store)
+
+    return movie_data, vector_store, vocabulary
+
+
+def _write_rows(csv_file, rows, delimiter, lineterminator):
+    """
+    A function to write csv rows separated by the line terminator, without one after the last row.
+    """
+    text = io.StringIO()
+    csv.writer(text, delimiter=delimiter, lineterminator=lineterminator).writerows(rows)
+    csv_file.write(text.getvalue()[:-len(lineterminator)])
+
+    return None
+
+
+def save_vocabulary(path, vocabulary):
+    """
+    A function to save the terms of the vectors in the format of vector_info.csv.
+
+    Parameters:
+        path (str): path to the csv file
+        vocabulary (list): (term, database frequency, idf) for each column
+
+    Returns:
+        None
+    """
+    #like the shipped vector_info.csv: unix line ends and no line end after the last row
+    lines = [["term", "database frequency", "idf"]] + [[term, count, f"{idf:.{IDF_DECIMALS}f}"]
+                                                        for term, count, idf in vocabulary]
+    with open(path, "w", newline="", encoding="utf-8") as vocabulary_file:
+        _write_rows(vocabulary_file, lines, delimiter=",", lineterminator="\n")
+
+    return None
+
+
+def load_vocabulary(path):
+    """
+    A function to load the terms of the vectors from a file in the format of vector_info.csv.
+
+    Parameters:
+        path (str): path to the csv file
+
+    Returns:
+        vocabulary (list): (term, database frequency, idf) for each column
+    """
+    with open(path, "r", encoding="utf-8") as vocabulary_file:
+        return [(row["term"], int(row["database frequency"]), float(row["idf"]))
+                for row in csv.DictReader(vocabulary_file, delimiter=",")]
+
+
+def save_catalog_state(path, counts, kinds, idf_count, next_id):
+    """
+    A function to save what an incremental catalog update needs besides the vectors and the movie data.
+
+    Parameters:
+        path (str): path to the file
+        counts (list): the document frequency of each column of the vectors
+        kinds (list): the kind of the term of each column ("genre", "keyword", "actor" or "director")
+        idf_count (int): the catalog size the idf was calculated with
+        next_id (int): the id the next added movie gets
+
+    Returns:
+        None
+    """
+    with open(path, "wb") as state_file:
+        np.savez(state_file, counts=np.asarray(counts, dtype=np.int64), kinds=np.array(kinds, dtype=str),
+                 idf_count=idf_count, next_id=next_id)
+
+    return None
+
+
+def load_catalog_state(path):
+    """
+    A function to load the state saved by save_catalog_state.
+
+    Parameters:
+        path (str): path to the file
+
+    Returns:
+        counts (np.array): the document frequency of each column of the vectors
+        kinds (list): the kind of the term of each column
+        idf_count (int): the catalog size the idf was calculated with
+        next_id (int): the id the next added movie gets
+    """
+    with np.load(path) as state_file:
+        return (state_file["counts"], state_file["kinds"].tolist(),
+                int(state_file["idf_count"]), int(state_file["next_id"]))
+
+
+def save_movie_data_text(path, ids, values):
+    """
+    A function to save the movie data in the format of A_complete_data.csv.
+
+    Parameters:
+        path (str): path to the csv file
+        ids (np.array): movie ids, one for each row
+        values (dict): the values of each column, one for each row
+
+    Returns:
+        None
+    """
+    #like the shipped A_complete_data.csv: windows line ends and no line end after the last row
+    lines = [["ID"] + list(METADATA_COLUMNS)] + [[movie_id] + [values[column][row] for column in METADATA_COLUMNS]
+                                                 for row, movie_id in enumerate(ids)]
+    with open(path, "w", newline="", encoding="utf-8") as data_file:
+        _write_rows(data_file, lines, delimiter=";", lineterminator="\r\n")
+
+    return None
+
+
+def save_vectors_text(path, vector_store):
+    """
+    A function to save sparse vectors in the format normalize.py writes, term index:weight pairs.
+
+    Parameters:
+        path (str): path to the csv file
+        vector_store (SparseVectorStore): the vectors
+
+    Returns:
+        None
+    """
+    with open(path, "w", newline="") as vectors_file:
+        writer = csv.writer(vectors_file, delimiter=";")
+        writer.writerow(["movie_id", "normalized_vector"])
+
+        for row, movie_id in enumerate(vector_store.ids):
+            start, end = vector_store.indptr[row], vector_store.indptr[row + 1]
+            writer.writerow([movie_id, ",".join(
+                f"{index}:{weight}" for index, weight in
+                zip(vector_store.indices[start:end], vector_store.data[start:end].tolist()))])
+
+    return None
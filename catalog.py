@@ -0,0 +1,291 @@
+import os
+import numpy as np
+from ann_index import load_ivf_index, save_ivf_index
+from attribute_index import build_attribute_index
+from build_pipeline import (CATALOG_STATE_NAME, METADATA_COLUMNS, MOVIE_DATA_BINARY_NAME, MOVIE_DATA_TEXT_NAME,
+                            VECTORS_BINARY_NAME, VECTORS_TEXT_NAME, VOCABULARY_NAME, load_catalog_state,
+                            load_vocabulary, movie_terms, save_catalog_state, save_vocabulary, term_idf)
+from movie_data import build_movie_data, load_movie_data, load_movie_data_binary, save_movie_data_binary
+from similarity_table import load_similarity_table, save_similarity_table
+from vector_store import load_vectors_binary, load_vectors_csv, save_vectors_binary, vocabulary_fingerprint
+from vectorizer import Vectorizer
+
+
+# indexes that are updated together with the catalog if they exist
+IVF_INDEX_NAME = "ivf_index.npz"
+SIMILAR_MOVIES_NAME = "similar_movies.npz"
+
+# the idf of every term is calculated again once the catalog size is this fraction away
+# from the catalog size the idf was calculated with
+IDF_REFRESH_DRIFT = 0.05
+
+
+class Catalog:
+    """
+    This class keeps the movie vectors, the movie data and the indexes over them up to date
+    when movies are added to the catalog or removed from it, without a full rebuild.
+
+    The document frequency of every column is kept, so a change only counts the terms of the added
+    and removed movies. Only the idf of those terms is calculated again, and only the rows with
+    one of those terms are reweighted and normalized again.
+    The idf is ln(idf_count / document frequency), where idf_count is the catalog size the last time
+    the idf of every term was calculated. Once the catalog size drifts more than IDF_REFRESH_DRIFT away
+    from it, the idf of every term is calculated again with the new catalog size.
+    New terms only get a column of their own in a full rebuild (libraries/build.py).
+
+    Variables:
+    vectorizer: the terms and the idf of the vector columns
+    kinds: the kind of the term of each column ("genre", "keyword", "actor" or "director")
+    counts: an array of the document frequency of each column, in how many movies its term is of its kind
+    idf_count: the catalog size the idf is calculated with
+    next_id: the id the next added movie gets
+    vector_store: the normalized movie vectors (SparseVectorStore)
+    movie_data: the movie data
+    ivf_index: the approximate index over the vector store, or None
+    similarity_table: the nearest neighbours of every movie, or None
+    attribute_index: the attribute index aligned with the vector store, or None
+    """
+
+    def __init__(self, vocabulary, kinds, vector_store, movie_data, idf_count, next_id,
+                 ivf_index=None, similarity_table=None, attribute_index=None):
+        """
+        The constructor for the Catalog class.
+
+        Parameters:
+            vocabulary (list): (term, database frequency, idf) for each column of the vectors
+            kinds (list): the kind of the term of each column
+            vector_store (SparseVectorStore): the normalized movie vectors in float64
+            movie_data (MovieData): the movie data
+            idf_count (int): the catalog size the idf was calculated with
+            next_id (int): the id the next added movie gets
+            ivf_index (IVFIndex): approximate index over the vector store
+            similarity_table (SimilarityTable): nearest neighbours of every movie
+            attribute_index (AttributeIndex): attribute index aligned with the vector store
+        """
+        self.vectorizer = Vectorizer([term for term, _, _ in vocabulary],
+                                     [idf for _, _, idf in vocabulary])
+        self.kinds = list(kinds)
+        self.counts = np.array([count for _, count, _ in vocabulary], dtype=np.int64)
+        self.idf_count = int(idf_count)
+        self.next_id = int(next_id)
+
+        # a name can be both an actor and a director, it is counted separately for each
+        self._kind_columns = {(kind, term): column for column, (kind, term) in
+                              enumerate(zip(self.kinds, self.vectorizer.terms))}
+
+        self.vector_store = vector_store
+        self.movie_data = movie_data
+        self.ivf_index = ivf_index
+        self.similarity_table = similarity_table
+        self.attribute_index = attribute_index
+
+    def __len__(self):
+        return len(self.vector_store)
+
+    @property
+    def vocabulary(self):
+        """
+        The (term, database frequency, idf) of each column of the vectors.
+        """
+        return [(term, int(count), float(idf)) for term, count, idf in
+                zip(self.vectorizer.terms, self.counts, self.vectorizer.idf)]
+
+    def add_movies(self, movies):
+        """
+        A function to add movies to the catalog.
+
+        Parameters:
+            movies (iterable): the values of the movie data columns of each movie ("Title", "Year", ...),
+                               e.g. the movies of build_pipeline.read_movies
+
+        Returns:
+            movie_ids (np.array): the ids the movies got
+        """
+        return self.update(added=movies)
+
+    def remove_movies(self, movie_ids):
+        """
+        A function to remove movies from the catalog, unknown movie ids are skipped.
+
+        Parameters:
+            movie_ids (iterable): ids of the movies
+
+        Returns:
+            None
+        """
+        self.update(removed=movie_ids)
+
+        return None
+
+    def update(self, added=(), removed=()):
+        """
+        A function to add and remove movies in one go.
+        The vector store, the movie data and the indexes are updated in place,
+        the kept movies keep their order and the added movies come after them.
+        The version of the vector store changes, so the sessions and the similarity caches that hold it
+        score the catalog again instead of using dot products of the old rows.
+
+        Parameters:
+            added (iterable): the values of the movie data columns of each new movie
+            removed (iterable): ids of the movies that are removed
+
+        Returns:
+            movie_ids (np.array): the ids the added movies got
+        """
+        vector_store = self.vector_store
+        added = list(added)
+        removed = np.fromiter(removed, dtype=np.int64)
+
+        removed_rows = vector_store.rows(removed)
+        keep = np.ones(len(vector_store), dtype=bool)
+        keep[removed_rows[removed_rows >= 0]] = False
+        kept_values = np.repeat(keep, np.diff(vector_store.indptr))
+
+        added_columns = [self.vectorizer.columns(set().union(*movie_terms(movie).values()))
+                         for movie in added]
+        movie_ids = np.arange(self.next_id, self.next_id + len(added), dtype=np.int64)
+        self.next_id += len(added)
+
+        # only the document frequencies of the terms of the added and removed movies change
+        counts = self.counts.copy()
+        for movie_id in vector_store.ids[~keep]:
+            if movie_id in self.movie_data:
+                counts[self._counted_columns(_movie_values(self.movie_data.movie(movie_id)))] -= 1
+        for movie in added:
+            counts[self._counted_columns(movie)] += 1
+
+        changed = counts != self.counts
+        self.counts = counts
+
+        catalog_size = int(keep.sum()) + len(added)
+        if abs(catalog_size - self.idf_count) > IDF_REFRESH_DRIFT * self.idf_count:
+            self.idf_count = catalog_size
+            changed[:] = True
+
+        for column in np.flatnonzero(changed):
+            self.vectorizer.idf[column] = term_idf(self.idf_count, counts[column])
+
+        # the kept rows come first, then the rows of the added movies
+        lengths = np.concatenate((np.diff(vector_store.indptr)[keep],
+                                  [len(columns) for columns in added_columns])).astype(np.int64)
+        indptr = np.zeros(catalog_size + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(lengths)
+        indices = np.concatenate([vector_store.indices[kept_values]] + added_columns
+                                 + [np.zeros(0, dtype=np.int32)])
+        data = np.concatenate((np.asarray(vector_store.data[kept_values], dtype=float),
+                               np.zeros(indptr[-1] - kept_values.sum())))
+        norms = np.concatenate((vector_store.norms[keep], np.zeros(len(added))))
+
+        vector_store.set_rows(np.concatenate((vector_store.ids[keep], movie_ids)),
+                              indptr, indices, data, norms)
+
+        # the added rows and the rows with a term whose idf changed are weighted and normalized again
+        row_of_value = np.repeat(np.arange(catalog_size), lengths)
+        touched = np.union1d(row_of_value[changed[indices]], np.arange(catalog_size - len(added), catalog_size))
+        vector_store.reweight_rows(touched, self.vectorizer.idf)
+
+        data_keep = np.ones(len(self.movie_data), dtype=bool)
+        known = (removed >= 0) & (removed < len(self.movie_data.id_to_row))
+        data_rows = self.movie_data.id_to_row[removed[known]]
+        data_keep[data_rows[data_rows >= 0]] = False
+
+        values = {column: [movie[column] for movie in added] for column in METADATA_COLUMNS}
+        values["ID"] = movie_ids
+        self.movie_data.update(data_keep, build_movie_data(values))
+
+        if self.ivf_index is not None:
+            self.ivf_index.update(keep)
+        if self.similarity_table is not None:
+            self.similarity_table.update(keep, vector_store)
+        if self.attribute_index is not None:
+            self.attribute_index.update(keep, build_attribute_index(self.movie_data, movie_ids))
+
+        return movie_ids
+
+    def _counted_columns(self, movie):
+        """
+        A function to find the columns whose document frequency counts the movie,
+        the columns of its terms, each only for the kind of term the column stands for.
+        """
+        return np.array([self._kind_columns[kind, term] for kind, terms in movie_terms(movie).items()
+                         for term in terms if (kind, term) in self._kind_columns], dtype=np.int64)
+
+    def save(self, directory):
+        """
+        A function to save the catalog to the files the program loads, and the indexes that exist.
+
+        Parameters:
+            directory (str): directory the files are written to, e.g. main_data
+
+        Returns:
+            None
+        """
+        # the columns never change in an update, so the files keep the fingerprint of the full rebuild
+        fingerprint = vocabulary_fingerprint(self.vectorizer.terms)
+
+        # the vectors are written next to the old file first, a program may still have the old file memory-mapped
+        vectors_path = os.path.join(directory, VECTORS_BINARY_NAME)
+        save_vectors_binary(vectors_path + ".tmp", self.vector_store, fingerprint)
+        os.replace(vectors_path + ".tmp", vectors_path)
+
+        save_movie_data_binary(os.path.join(directory, MOVIE_DATA_BINARY_NAME), self.movie_data)
+        save_vocabulary(os.path.join(directory, VOCABULARY_NAME), self.vocabulary)
+
+        save_catalog_state(os.path.join(directory, CATALOG_STATE_NAME), self.counts, self.kinds,
+                           self.idf_count, self.next_id)
+
+        if self.ivf_index is not None:
+            save_ivf_index(os.path.join(directory, IVF_INDEX_NAME), self.ivf_index, fingerprint)
+        if self.similarity_table is not None:
+            save_similarity_table(os.path.join(directory, SIMILAR_MOVIES_NAME), self.similarity_table, fingerprint)
+
+        return None
+
+
+def _movie_values(movie):
+    """
+    A function to get the values of the movie data columns that hold the terms of a movie.
+    """
+    return {"Genre": movie.genre, "Keywords": movie.keywords, "Actor": movie.actor, "Director": movie.director}
+
+
+def load_catalog(directory):
+    """
+    A function to load the catalog from the files written by libraries/build.py (or by Catalog.save).
+    The binary files are loaded if they exist, otherwise the csv files. The indexes are loaded if they exist.
+
+    Parameters:
+        directory (str): directory with the files, e.g. main_data
+
+    Returns:
+        catalog (Catalog): the catalog
+    """
+    vocabulary = load_vocabulary(os.path.join(directory, VOCABULARY_NAME))
+    fingerprint = vocabulary_fingerprint([term for term, _, _ in vocabulary])
+
+    vectors_path = os.path.join(directory, VECTORS_BINARY_NAME)
+    if os.path.exists(vectors_path):
+        vector_store = load_vectors_binary(vectors_path, fingerprint)
+    else:
+        vector_store = load_vectors_csv(os.path.join(directory, VECTORS_TEXT_NAME), len(vocabulary))
+
+    movie_data_path = os.path.join(directory, MOVIE_DATA_BINARY_NAME)
+    if os.path.exists(movie_data_path):
+        movie_data = load_movie_data_binary(movie_data_path)
+    else:
+        movie_data = load_movie_data(os.path.join(directory, MOVIE_DATA_TEXT_NAME))
+
+    state_path = os.path.join(directory, CATALOG_STATE_NAME)
+    if not os.path.exists(state_path):
+        raise ValueError(f"{state_path} is missing, build the catalog with libraries/build.py first")
+
+    counts, kinds, idf_count, next_id = load_catalog_state(state_path)
+    vocabulary = [(term, int(count), idf) for (term, _, idf), count in zip(vocabulary, counts)]
+
+    ivf_index = similarity_table = None
+    if os.path.exists(os.path.join(directory, IVF_INDEX_NAME)):
+        ivf_index = load_ivf_index(os.path.join(directory, IVF_INDEX_NAME), vector_store, vocabulary=fingerprint)
+    if os.path.exists(os.path.join(directory, SIMILAR_MOVIES_NAME)):
+        similarity_table = load_similarity_table(os.path.join(directory, SIMILAR_MOVIES_NAME), fingerprint)
+
+    return Catalog(vocabulary, kinds, vector_store, movie_data, idf_count, next_id, ivf_index, similarity_table)
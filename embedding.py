@@ -0,0 +1,121 @@
+import numpy as np
+from vector_store import VectorStore
+
+
+# dimension of the embedded vectors, check the quality with benchmarks/embedding.py before changing it
+EMBEDDING_DIMENSION = 128
+# "svd" keeps the directions with the most variance, "random" is a sparse random projection that needs no training
+EMBEDDING_METHODS = ("svd", "random")
+# extra directions and power iterations of the randomized svd, more of them give a more accurate svd
+SVD_OVERSAMPLING = 10
+SVD_POWER_ITERATIONS = 4
+# number of movie vectors turned into a dense block at once
+EMBEDDING_BLOCK_SIZE = 4096
+
+
+def _transposed_product(vector_store, matrix, block_size=EMBEDDING_BLOCK_SIZE):
+    """
+    A function to multiply the transposed matrix of the movie vectors by a matrix, block by block.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        matrix (np.array): 2D array with one row for each movie vector
+        block_size (int): number of movie vectors used at once
+
+    Returns:
+        product (np.array): 2D array with one row for each column of the movie vectors
+    """
+    product = np.zeros((vector_store.dimension, matrix.shape[1]), dtype=float)
+
+    for start in range(0, len(vector_store), block_size):
+        block = vector_store.vectors(vector_store.ids[start:start + block_size])
+        product += block.T @ matrix[start:start + block_size]
+
+    return product
+
+
+def svd_projection(vector_store, dimension=EMBEDDING_DIMENSION, seed=0):
+    """
+    A function to find the projection onto the top right singular vectors of the movie vectors (truncated svd).
+
+    The svd is randomized: the movie vectors are multiplied by a few random vectors, a few power iterations
+    sharpen the result and only a small matrix is decomposed exactly. The movie vectors are only ever
+    multiplied by dense matrices, so a sparse store stays sparse.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        dimension (int): dimension of the embedded vectors
+        seed (int): seed of the random generator
+
+    Returns:
+        projection (np.array): 2D array with one row for each column of the movie vectors and one column for each dimension
+    """
+    rng = np.random.default_rng(seed)
+    size = min(dimension + SVD_OVERSAMPLING, vector_store.dimension, len(vector_store))
+
+    basis = np.linalg.qr(vector_store.dot_products(rng.standard_normal((vector_store.dimension, size))))[0]
+    for _ in range(SVD_POWER_ITERATIONS):
+        columns = np.linalg.qr(_transposed_product(vector_store, basis))[0]
+        basis = np.linalg.qr(vector_store.dot_products(columns))[0]
+
+    # the rows of the small matrix basis.T @ movie vectors span the same space as the movie vectors
+    _, _, right_vectors = np.linalg.svd(_transposed_product(vector_store, basis).T, full_matrices=False)
+
+    return right_vectors[:dimension].T
+
+
+def random_projection(input_dimension, dimension=EMBEDDING_DIMENSION, seed=0):
+    """
+    A function to create a sparse random projection (Achlioptas).
+    Two thirds of the values are 0, the others are +-sqrt(3 / dimension), so distances are kept on average.
+
+    Parameters:
+        input_dimension (int): dimension of the movie vectors
+        dimension (int): dimension of the embedded vectors
+        seed (int): seed of the random generator
+
+    Returns:
+        projection (np.array): 2D array with one row for each column of the movie vectors and one column for each dimension
+    """
+    rng = np.random.default_rng(seed)
+    signs = rng.choice([-1.0, 0.0, 1.0], size=(input_dimension, dimension), p=[1 / 6, 2 / 3, 1 / 6])
+
+    return signs * np.sqrt(3 / dimension)
+
+
+def embed(vector_store, projection):
+    """
+    A function to project the movie vectors into the embedded space.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        projection (np.array): projection matrix, one row for each column of the movie vectors
+
+    Returns:
+        vector_store (VectorStore): the embedded movie vectors, dense
+    """
+    return VectorStore(vector_store.ids, vector_store.dot_products(projection))
+
+
+def build_embedding(vector_store, dimension=EMBEDDING_DIMENSION, method="svd", seed=0):
+    """
+    A function to embed the movie vectors in a dense low-dimensional space.
+    User vectors are then built and scored in that space, with the same functions as before.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        dimension (int): dimension of the embedded vectors
+        method (str): "svd" or "random"
+        seed (int): seed of the random generator
+
+    Returns:
+        vector_store (VectorStore): the embedded movie vectors
+    """
+    if method == "svd":
+        projection = svd_projection(vector_store, dimension, seed)
+    elif method == "random":
+        projection = random_projection(vector_store.dimension, dimension, seed)
+    else:
+        raise ValueError(f"unknown embedding method {method!r}, use one of {EMBEDDING_METHODS}")
+
+    return embed(vector_store, projection)
@@ -1,46 +1,17 @@
 import tkinter as tk
 from tkinter import messagebox
-import csv
-import numpy as np
+import os
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import backend as bk
+import instrumentation
+from service import RecommendationService
 
 
-def load_movie_data():
-    """ 
-    This function loads movie data from a csv file.
-
-    Returns:
-        movie_data (list): a list of dictionaries containing movie data
-    """
-    movie_data = []
-
-    # open csv file and read data into a list
-    with open('main_data/A_complete_data.csv', 'r') as csvfile:
-        reader = csv.DictReader(csvfile, delimiter=';')
-        for row in reader:
-            movie_data.append(row)
-
-    return movie_data
-
-
-def load_movie_vectors():
-    """
-    This function loads movie vectors from a csv file.
-
-    Returns:
-        movie_vectors (list): a list of dictionaries containing movie vectors
-    """
-    movie_vectors = []
-
-    with open("main_data/normalized_vectors.csv", "r") as normalized_vectors_file:
-        reader = csv.DictReader(normalized_vectors_file, delimiter=";")
-
-        for row in reader:
-            movie_vectors.append(row)
-
-    # return a list of movie vectors
-    return movie_vectors
+# how often the main thread checks for finished background recommendations (in milliseconds)
+PREFETCH_POLL_INTERVAL = 20
+# the profile the user's sessions are saved to, the next start continues where the last session ended
+GUI_PROFILE = "default"
 
 
 class MovieRecommendationApp:
@@ -50,18 +21,24 @@ class MovieRecommendationApp:
 
     The "Like" button shows the next movie, and adds the movie to the user's watchlist if the user wants to.
     The "Dislike" button shows the next movie, and does not add the movie to the user's watchlist.
+    Below them, the user can search for movies they like, liking one starts the recommendations right away.
 
     The program ends when the user clicks the "End Program" button.
 
     Variables:
     root: the root window
-    movie_data: a list of dictionaries containing movie data
+    movie_data: the data of all movies, column by column
+    service: the recommendation service, it keeps the user vector, the recommended movies and the watchlist
+    session: the user's session in the recommendation service, started in the background
     current_movie_id: the id of the movie that is currently being shown
-    already_recommended: a list of movie ids that have already been recommended
-    watchlist: a list of movie ids that the user has added to their watchlist
+    last_liked_movie: the id of the movie that the user liked last, 0 if there is none
     movie_queue: a queue of movie ids that are to be recommended
-    user_vector: a vector that represents the user's preferences
     feedback: a boolean that represents the user's feedback
+    found_movies: the ids of the movies in the search results
+    executor: a worker thread that starts the session and computes the next recommendation in the background
+    prefetch_version: a counter that changes with every update of the user vector, older predictions are stale
+    prefetch_futures: background computations of the next recommendation, one for each feedback
+    prefetched: finished predictions, (updated session state, recommended movie id) for each feedback
 
     """
 
@@ -75,8 +52,9 @@ class MovieRecommendationApp:
         self.root = root
         self.root.title("Movie Recommendation Program")
 
-        self.movie_data = load_movie_data()
-        self.movie_vectors = load_movie_vectors()
+        # only the movie data is loaded before the window appears, the movie vectors are loaded in the background
+        self.movie_data = bk.get_movie_data()
+        self.service = RecommendationService()
 
         self.movie_title_label = tk.Label(
             root, text="", font=("Helvetica", 18))
@@ -98,22 +76,71 @@ class MovieRecommendationApp:
             root, text="End Program", command=self.end_program)
         self.end_button.pack(pady=20)
 
+        # the "More Like This" button is only offered if the table of similar movies was built
+        self.more_like_this_button = tk.Button(
+            root, text="More Like This", command=self.show_similar_movies, state="disabled")
+        if os.path.exists(bk.SIMILAR_MOVIES_FILE):
+            self.more_like_this_button.pack(pady=5)
+
+        # the user can look up movies they like by title, actor, director or keyword,
+        # liking one of them starts the recommendations right away instead of after the random movies
+        self.search_entry = tk.Entry(root, width=40)
+        self.search_entry.pack(pady=5)
+        self.search_entry.bind("<Return>", lambda event: self.search_movies())
+
+        self.search_button = tk.Button(
+            root, text="Search", command=self.search_movies)
+        self.search_button.pack()
+
+        self.search_results = tk.Listbox(root, height=5, width=60)
+        self.search_results.pack(pady=5)
+
+        self.like_found_button = tk.Button(
+            root, text="Like Selected", command=self.like_found_movie)
+        self.like_found_button.pack(pady=5)
+
         # initialize variables
+        self.session = None
         self.current_movie_id = 0
-        self.already_recommended = []
-        self.watchlist = []
+        self.last_liked_movie = 0
         self.movie_queue = deque()
-        self.user_vector = np.zeros((1399,), dtype=float)
         self.feedback = True
+        self.found_movies = []
+
+        # speculative recommendations computed while the user is still reading the current movie
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.prefetch_version = 0
+        self.prefetch_futures = {}
+        self.prefetched = {}
 
         self.start_program()
 
+    @property
+    def session_id(self):
+        """
+        The id of the user's session, it waits until the session has been started in the background.
+        """
+        return self.session.result()[0]
+
     def start_program(self):
         """ 
         This function starts the program.
         It gets 10 random movie recommendations and adds them to the queue, so that user's profile can be created.
+        If the user's profile was saved by an earlier session, it is resumed and recommendations are shown right away.
         """
-        self.movie_list = bk.get_random_movies(self.already_recommended)
+        # a saved profile needs the movie vectors to be resumed, so the first recommendation waits for them
+        if self.service.profile_store.exists(GUI_PROFILE):
+            self.movie_list = []
+            self.session = self.executor.submit(
+                self.service.start_session, True, self.movie_list, GUI_PROFILE)
+            self.show_next_movie()
+            return
+
+        # the session keeps incremental scores, so that every feedback is cheap,
+        # it is started in the background, the random movies do not need the movie vectors
+        self.movie_list = bk.get_random_movies([])
+        self.session = self.executor.submit(
+            self.service.start_session, True, self.movie_list, GUI_PROFILE)
         self.movie_queue.extend(self.movie_list)
         self.show_movie(self.movie_queue)
 
@@ -129,15 +156,24 @@ class MovieRecommendationApp:
         # show a first movie from the queue
         self.current_movie_id = queue.popleft()
 
-        # check if the movie id is valid
-        if self.current_movie_id <= 4660:
-            # show the movie title and information, substract 1 from the movie id because the list is zero-indexed and the movie ids start at 1
-            movie = self.movie_data[self.current_movie_id - 1]
-            self.movie_title_label.config(text=movie['Title'])
-            # convert keywords to a comma-separated string
-            keywords = ', '.join(movie['Keywords'].split('|'))
-            self.movie_info_label.config(
-                text=f"Year: {movie['Year']} | IMDb: {movie['IMDb']} | Duration: {movie['Duration']} min\nGenres: {movie['Genre']}\nDirector: {movie['Director']}\nLeading actor: {movie['Actor']}\nPlot keywords: {keywords}")
+        # check if the movie id is valid, there is no movie 0 when nothing is left to recommend
+        if self.current_movie_id in self.movie_data:
+            with instrumentation.stage("render"):
+                # show the movie title and information
+                movie = self.movie_data.movie(self.current_movie_id)
+                self.movie_title_label.config(text=movie.title)
+                # convert keywords to a comma-separated string
+                keywords = ', '.join(movie.keywords.split('|'))
+                self.movie_info_label.config(
+                    text=f"Year: {movie.year} | IMDb: {movie.imdb} | Duration: {movie.duration} min\nGenres: {movie.genre}\nDirector: {movie.director}\nLeading actor: {movie.actor}\nPlot keywords: {keywords}")
+
+                # while the instrumentation is on, the window is redrawn inside the timer
+                if instrumentation.enabled():
+                    self.root.update_idletasks()
+
+            # the next movie will be a recommendation, start computing it for both possible reactions
+            if not queue:
+                self.prefetch_recommendations()
 
         else:
             self.movie_title_label.config(text="No more movies.")
@@ -151,33 +187,27 @@ class MovieRecommendationApp:
         """
         # update the feedback variable
         self.feedback = True
-        movie = self.movie_data[self.current_movie_id-1]
-
-        # update the user vector, so that the recommendation algorithm can learn from the user's feedback
-        user_vector = self.user_vector
-        self.user_vector = bk.handle_feedback(self.movie_vectors,
-                                              user_vector,
-                                              self.feedback,
-                                              self.current_movie_id)
-
-        # ask the user if they want to add the movie to their watchlist
+        movie = self.movie_data.movie(self.current_movie_id)
+        movie_id = self.current_movie_id
+        self.last_liked_movie = movie_id
+        self.more_like_this_button.config(state="normal")
+
+        # ask the user if they want to add the movie to their watchlist before the next movie is shown,
+        # showing it ends the program when nothing is left to recommend,
+        # the next recommendation keeps being prefetched while the user answers
         response = messagebox.askyesno(
-            "Add to Watchlist", f"Do you want to add '{movie['Title']}' to your watchlist?")
+            "Add to Watchlist", f"Do you want to add '{movie.title}' to your watchlist?")
 
         if response:
-            bk.add_to_watchlist(self.current_movie_id, self.watchlist)
+            self.service.add_to_watchlist(self.session_id, movie_id)
             pass
 
-        # show the next movie, if there is one to be shown
-        if self.movie_queue:
-            self.show_movie(self.movie_queue)
+        # update the user vector, so that the recommendation algorithm can learn from the user's feedback
+        with instrumentation.stage("click"):
+            prediction = self.take_prediction(self.feedback)
+            self.update_user_vector(prediction)
 
-        # if there are no more movies to be shown, recommend a new movie
-        else:
-            recommended_movie = bk.get_recommendation(
-                self.user_vector, self.already_recommended)
-            self.movie_queue.append(recommended_movie)
-            self.show_movie(self.movie_queue)
+            self.show_next_movie(prediction)
 
     def dislike_movie(self):
         """
@@ -189,32 +219,173 @@ class MovieRecommendationApp:
         self.feedback = False
 
         # update the user vector, so that the recommendation algorithm can learn from the user's feedback
-        user_vector = self.user_vector
-        self.user_vector = bk.handle_feedback(
-            self.movie_vectors, user_vector, self.feedback, self.current_movie_id)
+        with instrumentation.stage("click"):
+            prediction = self.take_prediction(self.feedback)
+            self.update_user_vector(prediction)
+
+            # do not add the movie to the watchlist, or ask anything else
+
+            self.show_next_movie(prediction)
+
+    def show_similar_movies(self):
+        """
+        This function is called when the user clicks the "More Like This" button.
+        It shows the movies most similar to the last liked movie, looked up in the precomputed table.
+        """
+        similar = bk.similar_movies(self.last_liked_movie, 10)
+        liked_title = self.movie_data.movie(self.last_liked_movie).title
+        similar_titles = "\n".join(self.movie_data.titles(similar))
+
+        messagebox.showinfo("More Like This",
+                            f"Movies similar to '{liked_title}':\n{similar_titles}")
+
+    def update_user_vector(self, prediction=None):
+        """
+        This function updates the user vector with the user's feedback on the current movie.
+        A prefetched prediction already holds the updated user vector and scores.
+        Either way the feedback is logged to the user's profile.
+        Every update makes the remaining predictions stale.
 
-        # do not add the movie to the watchlist, or ask anything else
+        Parameters:
+            prediction (tuple): prefetched (updated session state, recommended movie id), or None
+        """
+        if prediction is not None:
+            self.service.set_state(
+                self.session_id, prediction[0], (self.current_movie_id, self.feedback))
+        else:
+            self.service.feedback(
+                self.session_id, self.current_movie_id, self.feedback)
+
+        self.prefetch_version += 1
+
+    def show_next_movie(self, prediction=None):
+        """
+        This function shows the next movie from the queue, or recommends a new movie if the queue is empty.
 
+        Parameters:
+            prediction (tuple): prefetched (updated session state, recommended movie id), or None
+        """
         # show the next movie, if there is one to be shown
         if self.movie_queue:
             self.show_movie(self.movie_queue)
 
-        # if there are no more movies to be shown, recommend a new movie
+        # if there are no more movies to be shown, recommend a new movie from the session's scores
         else:
-            recommended_movie = bk.get_recommendation(
-                self.user_vector, self.already_recommended)
+            if prediction is not None:
+                recommended_movie = prediction[1]
+                self.service.mark_recommended(
+                    self.session_id, [recommended_movie])
+            else:
+                movie_ids = self.service.recommend(self.session_id)
+                recommended_movie = movie_ids[0] if movie_ids else 0
+
             self.movie_queue.append(recommended_movie)
             self.show_movie(self.movie_queue)
 
+    def prefetch_recommendations(self):
+        """
+        This function starts computing the next recommendation in the background,
+        once for the case that the user likes the current movie and once for the case that they do not.
+        """
+        self.prefetch_futures = {}
+        self.prefetched = {}
+        version = self.prefetch_version
+
+        for feedback in (True, False):
+            future = self.executor.submit(
+                self.service.preview, self.session_id, self.current_movie_id, feedback)
+            self.prefetch_futures[feedback] = (version, future)
+
+        self.root.after(PREFETCH_POLL_INTERVAL, self.collect_predictions)
+
+    def collect_predictions(self):
+        """
+        This function runs on the main thread and collects the finished background recommendations.
+        Predictions computed for an older user vector are thrown away.
+        """
+        for feedback, (version, future) in list(self.prefetch_futures.items()):
+            if version != self.prefetch_version:
+                future.cancel()
+                del self.prefetch_futures[feedback]
+
+            elif future.done():
+                del self.prefetch_futures[feedback]
+                if not future.cancelled() and future.exception() is None:
+                    self.prefetched[feedback] = future.result()
+
+        # check again later, if some predictions are still being computed
+        if self.prefetch_futures:
+            self.root.after(PREFETCH_POLL_INTERVAL, self.collect_predictions)
+
+    def take_prediction(self, feedback=bool):
+        """
+        This function returns the prefetched prediction for the user's feedback, if it is still valid.
+        A prediction that is still being computed is waited for, instead of being computed again.
+
+        Parameters:
+            feedback (bool): the user's feedback on the current movie
+
+        Returns:
+            prediction (tuple): (updated session state, recommended movie id), or None if there is no valid prediction
+        """
+        prediction = self.prefetched.pop(feedback, None)
+        version, future = self.prefetch_futures.pop(feedback, (None, None))
+        instrumentation.count("prefetch ready" if prediction is not None else "prefetch not ready")
+
+        if prediction is None and version == self.prefetch_version:
+            if future.cancel():
+                return None
+            try:
+                prediction = future.result()
+            except Exception:
+                return None
+
+        self.prefetched = {}
+
+        return prediction
+
+    def search_movies(self):
+        """
+        This function looks up the text of the search field and lists the movies that match it.
+        """
+        self.found_movies = self.service.search(self.search_entry.get(), 10)
+
+        self.search_results.delete(0, tk.END)
+        for movie_id in self.found_movies:
+            movie = self.movie_data.movie(movie_id)
+            self.search_results.insert(tk.END, f"{movie.title.strip()} ({movie.year})")
+
+    def like_found_movie(self):
+        """
+        This function is called when the user clicks the "Like Selected" button.
+        The selected movie from the search results is liked, the random movies that were still to be shown
+        are skipped, and the next movie is a recommendation.
+        """
+        selection = self.search_results.curselection()
+        if not selection:
+            return
+
+        movie_id = self.found_movies[selection[0]]
+
+        with instrumentation.stage("click"):
+            self.service.feedback(self.session_id, movie_id, True)
+            self.service.mark_recommended(self.session_id, [movie_id])
+            self.last_liked_movie = movie_id
+            self.more_like_this_button.config(state="normal")
+
+            # the movie the user picked tells more than the random movies, the predictions are stale
+            self.movie_queue.clear()
+            self.prefetch_version += 1
+            self.show_next_movie()
+
     def display_recommendations(self):
         """ 
         This function displays 10 recommended movies based on the user's preferences. 
         """
 
-        recommended_movies = bk.give_recommendations_list(
-            self.user_vector, self.already_recommended)
-        recommended_titles = [self.movie_data[movie_id - 1]
-                              ['Title'] for movie_id in recommended_movies]
+        recommended_movies = self.service.recommend(
+            self.session_id, 10, mark=False)
+        recommended_titles = self.movie_data.titles(recommended_movies)
 
         recommended_text = "\n".join(recommended_titles)
         messagebox.showinfo("Recommendations",
@@ -224,26 +395,31 @@ class MovieRecommendationApp:
         """ 
         This function is called when the user clicks the "End Program" button.
         It hides the buttons, shows the user's watchlist and recommended movies, and closes the program.
+        The user's profile is saved, so the next start continues from here.
         """
 
+        # stop the background recommendations
+        self.prefetch_version += 1
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
         # hide the buttons
         self.like_button.pack_forget()
         self.dislike_button.pack_forget()
         self.end_button.pack_forget()
+        self.more_like_this_button.pack_forget()
+        self.search_entry.pack_forget()
+        self.search_button.pack_forget()
+        self.search_results.pack_forget()
+        self.like_found_button.pack_forget()
 
-        # get the user's watchlist
-        watchlist = bk.return_watchlist()
-
-        # get recommended movies for the user
-        recommended_movies = bk.give_recommendations_list(
-            self.user_vector, self.already_recommended)
-        recommended_titles = [self.movie_data[movie_id - 1]
-                              ['Title'] for movie_id in recommended_movies]
+        # get the user's watchlist and recommended movies for the user, this ends the session
+        watchlist, recommended_movies = self.service.end_session(
+            self.session_id, 10)
+        recommended_titles = self.movie_data.titles(recommended_movies)
 
         # check if there are any movies in the watchlist
         if watchlist:
-            watchlist_text = "\n".join(
-                [self.movie_data[movie_id - 1]['Title'] for movie_id in self.watchlist])
+            watchlist_text = "\n".join(self.movie_data.titles(watchlist))
         else:
             watchlist_text = "Your watchlist is empty."
 
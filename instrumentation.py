@@ -0,0 +1,334 @@
+import atexit
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+# whether the stages of the program are timed and counted, configure() switches it on when the program starts
+INSTRUMENTATION = False
+# the collected stats are written to this file when the program ends,
+# and every STATS_INTERVAL seconds while it runs if the interval is not None
+STATS_FILE = "instrumentation_stats.json"
+STATS_INTERVAL = None
+# None, "cprofile" (every call of the main thread, slow) or "sampling" (the stacks of every thread,
+# taken every SAMPLING_INTERVAL seconds), the profile is written to PROFILE_FILE when the program ends
+PROFILER = None
+PROFILE_FILE = "instrumentation_profile.txt"
+SAMPLING_INTERVAL = 0.005
+
+_enabled = False
+_lock = threading.Lock()
+# stage -> [calls, total seconds, longest call in seconds]
+_stages = {}
+_counters = Counter()
+
+
+class _StageTimer:
+    """
+    This class times one pass through a stage of the program, it is used in a with statement.
+    """
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        elapsed = time.perf_counter() - self.start
+
+        with _lock:
+            stage = _stages.setdefault(self.name, [0, 0.0, 0.0])
+            stage[0] += 1
+            stage[1] += elapsed
+            stage[2] = max(stage[2], elapsed)
+
+        return False
+
+
+class _NoTimer:
+    """
+    This class stands in for a stage timer while the instrumentation is switched off, it does nothing.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def stage(name):
+    """
+    A function to time a stage of the program: with stage("score"): ...
+    While the instrumentation is switched off, the same do-nothing timer is returned every time.
+
+    Parameters:
+        name (str): name of the stage, e.g. "load", "parse", "score", "select" or "render"
+
+    Returns:
+        timer: a context manager that times the stage
+    """
+    if not _enabled:
+        return _NO_TIMER
+
+    return _StageTimer(name)
+
+
+def count(name, amount=1):
+    """
+    A function to add to a counter, e.g. of the rows scored or of the cache hits.
+
+    Parameters:
+        name (str): name of the counter
+        amount (int): the amount that is added
+
+    Returns:
+        None
+    """
+    if not _enabled:
+        return None
+
+    with _lock:
+        _counters[name] += amount
+
+    return None
+
+
+def enabled():
+    """
+    A function to find out whether the instrumentation is switched on.
+    """
+    return _enabled
+
+
+def enable():
+    """
+    A function to switch the instrumentation on.
+    """
+    global _enabled
+    _enabled = True
+
+    return None
+
+
+def disable():
+    """
+    A function to switch the instrumentation off, the stats collected so far are kept.
+    """
+    global _enabled
+    _enabled = False
+
+    return None
+
+
+def reset():
+    """
+    A function to throw away the stats collected so far.
+    """
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+    return None
+
+
+def stats():
+    """
+    A function to get the stats collected so far.
+
+    Returns:
+        stats (dict): calls, total, mean and longest time (in milliseconds) of each stage, and the counters
+    """
+    with _lock:
+        stages = {name: {"calls": calls, "total_ms": total * 1000, "mean_ms": total * 1000 / calls,
+                         "max_ms": longest * 1000}
+                  for name, (calls, total, longest) in sorted(_stages.items())}
+        counters = dict(sorted(_counters.items()))
+
+    return {"time": time.time(), "stages": stages, "counters": counters}
+
+
+def dump(path=STATS_FILE):
+    """
+    A function to write the stats collected so far to a json file.
+    The file is written next to the old one first, so a reader never sees half a file.
+
+    Parameters:
+        path (str): path to the file
+
+    Returns:
+        None
+    """
+    with open(path + ".tmp", "w") as stats_file:
+        json.dump(stats(), stats_file, indent=2)
+    os.replace(path + ".tmp", path)
+
+    return None
+
+
+def dump_periodically(path=STATS_FILE, interval=60.0):
+    """
+    A function to write the stats to a json file every few seconds, from a background thread.
+
+    Parameters:
+        path (str): path to the file
+        interval (float): seconds between two writes
+
+    Returns:
+        thread (threading.Thread): the background thread, it ends with the program
+    """
+    def write_stats():
+        while True:
+            time.sleep(interval)
+            dump(path)
+
+    thread = threading.Thread(target=write_stats, name="instrumentation stats", daemon=True)
+    thread.start()
+
+    return thread
+
+
+class Profiler:
+    """
+    This class is an opt-in profiler of the whole program.
+
+    "cprofile" records every function call of the thread that starts it, which makes the program
+    noticeably slower. "sampling" takes the stacks of every thread every few milliseconds from
+    a background thread, which costs little, and writes them in the collapsed format of flame graphs
+    (one "thread;function;function count" line for each stack).
+
+    Variables:
+    mode: "cprofile" or "sampling"
+    interval: seconds between two samples of the sampling profiler
+    samples: the number of times each stack was seen by the sampling profiler
+    """
+
+    def __init__(self, mode="sampling", interval=SAMPLING_INTERVAL):
+        """
+        The constructor for the Profiler class.
+
+        Parameters:
+            mode (str): "cprofile" or "sampling"
+            interval (float): seconds between two samples of the sampling profiler
+        """
+        if mode not in ("cprofile", "sampling"):
+            raise ValueError(f"unknown profiler {mode!r}, use 'cprofile' or 'sampling'")
+
+        self.mode = mode
+        self.interval = interval
+        self.samples = Counter()
+
+        self._profile = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """
+        A function to start profiling.
+        """
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample, name="instrumentation sampler", daemon=True)
+            self._thread.start()
+
+        return None
+
+    def stop(self):
+        """
+        A function to stop profiling, the profile collected so far is kept.
+        """
+        if self._profile is not None:
+            self._profile.disable()
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+        return None
+
+    def _sample(self):
+        """
+        A function that takes the stacks of the other threads until the profiler is stopped.
+        """
+        names = {}
+        own_id = threading.get_ident()
+
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+                    frame = frame.f_back
+
+                self.samples[";".join([names.get(thread_id, str(thread_id))] + stack[::-1])] += 1
+
+        return None
+
+    def save(self, path=PROFILE_FILE):
+        """
+        A function to write the profile to a text file, the cProfile table or the collapsed stacks.
+
+        Parameters:
+            path (str): path to the file
+
+        Returns:
+            None
+        """
+        with open(path, "w") as profile_file:
+            if self._profile is not None:
+                import pstats
+                pstats.Stats(self._profile, stream=profile_file).sort_stats("cumulative").print_stats()
+            else:
+                for stack, samples in self.samples.most_common():
+                    profile_file.write(f"{stack} {samples}\n")
+
+        return None
+
+
+def configure():
+    """
+    A function to switch on what the settings at the top of this file ask for, when the program starts.
+    The stats and the profile are written when the program ends.
+
+    Returns:
+        profiler (Profiler): the running profiler, or None
+    """
+    profiler = None
+
+    if INSTRUMENTATION:
+        enable()
+        atexit.register(dump, STATS_FILE)
+        if STATS_INTERVAL is not None:
+            dump_periodically(STATS_FILE, STATS_INTERVAL)
+
+    if PROFILER is not None:
+        profiler = Profiler(PROFILER)
+        profiler.start()
+
+        def save_profile():
+            profiler.stop()
+            profiler.save(PROFILE_FILE)
+
+        atexit.register(save_profile)
+
+    return profiler
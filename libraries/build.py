@@ -0,0 +1,21 @@
+import os
+import sys
+import time
+
+# run from the root of the project: python libraries/build.py [output directory] [--text]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from build_pipeline import build_catalog
+
+metadata_file = 'additional_data/movie_metadata.csv'
+arguments = [argument for argument in sys.argv[1:] if argument != '--text']
+output_directory = arguments[0] if arguments else 'main_data'
+#the text files are written when asked for and always when the directory has them, so they never go stale
+text = '--text' in sys.argv[1:] or os.path.exists(os.path.join(output_directory, 'A_complete_data.csv'))
+
+#stream movie_metadata.csv through term counting, idf, vectorization and normalization
+start = time.perf_counter()
+movie_data, vector_store, vocabulary = build_catalog(metadata_file, output_directory, text)
+
+print(f"built {len(vector_store)} vectors of dimension {len(vocabulary)} "
+      f"in {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,25 @@
+import os
+import sys
+import time
+
+# run from the root of the project: python libraries/build_embedding.py [dimension] [svd|random]
+# run it again after the catalog has changed, e.g. after libraries/update_catalog.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from embedding import EMBEDDING_DIMENSION, build_embedding
+from vector_store import load_vectors_binary, save_vectors_binary
+
+output_file = bk.EMBEDDED_VECTORS_FILE
+dimension = int(sys.argv[1]) if len(sys.argv) > 1 else EMBEDDING_DIMENSION
+method = sys.argv[2] if len(sys.argv) > 2 else "svd"
+
+#project the tf-idf vectors into a dense low-dimensional space
+vector_store = load_vectors_binary(bk.VECTORS_BINARY_FILE, bk.get_vocabulary_fingerprint())
+
+start = time.perf_counter()
+embedded_store = build_embedding(vector_store, dimension, method)
+save_vectors_binary(output_file, embedded_store, bk.get_vocabulary_fingerprint())
+
+print(f"embedded {len(embedded_store)} vectors from {vector_store.dimension} to {dimension} dimensions "
+      f"({method}) in {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,20 @@
+import os
+import sys
+
+# run from the root of the project: python libraries/build_index.py [lists] [probes]
+# the index is built for the vectors of the active mode, with USE_EMBEDDING it is saved to bk.EMBEDDED_IVF_INDEX_FILE
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from ann_index import IVF_PROBES, build_ivf_index, save_ivf_index
+
+output_file = bk.get_ivf_index_file()
+lists = int(sys.argv[1]) if len(sys.argv) > 1 else None
+probes = int(sys.argv[2]) if len(sys.argv) > 2 else IVF_PROBES
+
+#cluster the movie vectors with k-means and save the inverted lists
+vector_store = bk.get_vector_store()
+ivf_index = build_ivf_index(vector_store, lists, probes)
+save_ivf_index(output_file, ivf_index, bk.get_vocabulary_fingerprint())
+
+print(f"saved an index of {ivf_index.lists} clusters over {len(vector_store)} movies")
@@ -0,0 +1,16 @@
+import os
+import sys
+
+# run from the root of the project: python libraries/convert_movie_data.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_data import load_movie_data, save_movie_data_binary
+
+input_file = 'main_data/A_complete_data.csv'
+output_file = 'main_data/movie_data.npz'
+
+#parse the movie data once, then save its columns in the binary format
+movie_data = load_movie_data(input_file)
+save_movie_data_binary(output_file, movie_data)
+
+print(f"converted the data of {len(movie_data)} movies")
@@ -0,0 +1,17 @@
+import os
+import sys
+
+# run from the root of the project: python libraries/convert_vectors.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_store import load_vectors_csv, load_vocabulary_fingerprint, save_vectors_binary
+
+input_file = 'main_data/normalized_vectors.csv'
+output_file = 'main_data/normalized_vectors.bin'
+vocabulary_file = 'main_data/vector_info.csv'
+
+#parse the normalized vectors once, then write them in the binary format with the fingerprint of their vocabulary
+vector_store = load_vectors_csv(input_file)
+save_vectors_binary(output_file, vector_store, load_vocabulary_fingerprint(vocabulary_file))
+
+print(f"converted {len(vector_store)} vectors of dimension {vector_store.dimension}")
@@ -0,0 +1,32 @@
+import os
+import sys
+import time
+
+# run from the root of the project: python libraries/export_recommendations.py [count] [user vectors file]
+# without a file of user vectors, the stored profiles are written to bk.USER_VECTORS_FILE first
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from batch_export import EXPORT_COUNT, export_recommendations, stored_profiles, write_user_vectors
+
+output_file = bk.RECOMMENDATIONS_FILE
+count = int(sys.argv[1]) if len(sys.argv) > 1 else EXPORT_COUNT
+users_file = sys.argv[2] if len(sys.argv) > 2 else None
+
+vector_store = bk.get_vector_store()
+
+#restore every stored profile and save its user vector and already recommended movies
+if users_file is None:
+    users_file = bk.USER_VECTORS_FILE
+    start = time.perf_counter()
+    users = write_user_vectors(users_file, stored_profiles(vector_store=vector_store), vector_store.dimension,
+                               bk.get_vocabulary_fingerprint())
+    print(f"saved the vectors of {users} profiles in {time.perf_counter() - start:.1f} s")
+
+#score the users chunk by chunk and write the best movies of each of them
+start = time.perf_counter()
+users = export_recommendations(vector_store, users_file, output_file, count,
+                               vocabulary=bk.get_vocabulary_fingerprint())
+elapsed = time.perf_counter() - start
+
+print(f"exported {count} movies for each of {users} users in {elapsed:.1f} s ({users / max(elapsed, 1e-9):.0f} users/s)")
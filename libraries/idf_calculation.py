@@ -3,11 +3,16 @@ import csv
 
 open_file = 'input.csv'
 output_file = 'output.csv'
+movies_file = 'A_complete_data.csv'
 term_name = 'term'
 
 def idf_calculation():
     file_info = {}
 
+    #the number of movies is counted in the movie data, it is not fixed
+    with open(movies_file, 'r', newline='', encoding='utf-8') as data_file:
+        movie_count = sum(1 for _ in csv.DictReader(data_file, delimiter=';'))
+
     with open(open_file, 'r', newline='', encoding='utf-8') as input_file:
         reader = csv.DictReader(input_file, delimiter=',')
 
@@ -20,7 +25,7 @@ def idf_calculation():
         writer.writerow([term_name, 'database frequency', 'idf'])  # Header
 
         for term, count in file_info.items():
-            output_line = [term, count, f"{np.log(4660/int(count)):.4f}"]
+            output_line = [term, count, f"{np.log(movie_count/int(count)):.4f}"]
             writer.writerow(output_line)
 
     print("done")
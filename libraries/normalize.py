@@ -1,7 +1,7 @@
 import csv
 import numpy as np
 
-#read CSV file and parse vectors
+#read CSV file and parse sparse vectors of (term index, weight) pairs
 normalized_vectors = []
 
 with open('movie_vectors.csv', 'r') as csvfile:
@@ -11,19 +11,23 @@ with open('movie_vectors.csv', 'r') as csvfile:
         movie_id = int(row["movie_id"])
         vector_str = row["vector"]
 
-        #parse vector string and convert to floats
-        vector = np.array([float(x) for x in vector_str[1:-1].split(',')])
+        #parse vector string into term indices and weights
+        pairs = [pair.split(':') for pair in vector_str.split(',') if pair]
+        indices = [int(index) for index, weight in pairs]
+        weights = np.array([float(weight) for index, weight in pairs])
 
-        #calculate magnitude and normalize vector
-        magnitude = np.linalg.norm(vector)
-        normalized_vector = vector / magnitude
+        #calculate magnitude and normalize vector, only the non-zero weights are needed
+        magnitude = np.linalg.norm(weights)
+        if magnitude > 0:
+            weights = weights / magnitude
 
-        normalized_vectors.append((movie_id, normalized_vector))
+        normalized_vectors.append((movie_id, indices, weights))
 
 #save normalized vectors to a new CSV file
 with open('normalized_vectors.csv', 'w', newline='') as csvfile:
     writer = csv.writer(csvfile, delimiter=';')
     writer.writerow(['movie_id', 'normalized_vector'])
-    for movie_id, normalized_vector in normalized_vectors:
-        #write movie_id and normalized vector as values, not strings
-        writer.writerow([movie_id, *normalized_vector])
+    for movie_id, indices, weights in normalized_vectors:
+        #write movie_id and normalized vector as term index:weight pairs
+        writer.writerow([movie_id, ','.join(
+            f'{index}:{weight}' for index, weight in zip(indices, weights))])
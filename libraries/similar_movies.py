@@ -0,0 +1,18 @@
+import os
+import sys
+
+# run from the root of the project: python libraries/similar_movies.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from similarity_table import build_similarity_table, save_similarity_table
+
+output_file = bk.SIMILAR_MOVIES_FILE
+neighbours = 50
+
+#score the catalog against itself block by block and keep the most similar movies of each movie
+vector_store = bk.get_vector_store()
+similarity_table = build_similarity_table(vector_store, neighbours)
+save_similarity_table(output_file, similarity_table, bk.get_vocabulary_fingerprint())
+
+print(f"saved {neighbours} similar movies for each of {len(similarity_table)} movies")
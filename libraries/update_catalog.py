@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+
+# run from the root of the project: python libraries/update_catalog.py [--add movies.csv] [--remove 12,345] [directory]
+# movies.csv has the columns of movie_metadata.csv, the directory is main_data if not given
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from build_pipeline import read_movies
+from catalog import load_catalog
+
+arguments = sys.argv[1:]
+added_file = None
+removed = []
+
+if '--add' in arguments:
+    position = arguments.index('--add')
+    added_file = arguments[position + 1]
+    del arguments[position:position + 2]
+
+if '--remove' in arguments:
+    position = arguments.index('--remove')
+    removed = [int(movie_id) for movie_id in arguments[position + 1].split(',') if movie_id]
+    del arguments[position:position + 2]
+
+directory = arguments[0] if arguments else 'main_data'
+
+#load the catalog with its term counts and the indexes that exist
+catalog = load_catalog(directory)
+added = [movie for _, movie in read_movies(added_file)] if added_file else []
+
+#only the counts, the idf and the rows of the changed terms are updated, nothing is rebuilt
+start = time.perf_counter()
+movie_ids = catalog.update(added, removed)
+elapsed = time.perf_counter() - start
+catalog.save(directory)
+
+print(f"added {len(movie_ids)} movies, removed {len(removed)} movies in {elapsed:.3f} s, "
+      f"the catalog has {len(catalog)} movies")
+if len(movie_ids):
+    print(f"ids of the added movies: {movie_ids[0]}-{movie_ids[-1]}")
@@ -1,39 +1,54 @@
 import csv
-import numpy as np
-
-
-file_info = {}
-
-#read the data from the csv file
-with open("A_data.csv", "r") as file:
-    reader = csv.DictReader(file, delimiter=";")
-    
-    for row in reader:
-        movie_id, title, year, imdb, duration, director, actor, genres, keywords = row["ID"], row["Title"], row["Year"], row["IMDb"], row["Duration"], row["Director"], row["Actor"], row["Genre"], row["Keywords"]
-        file_info[movie_id] = genres.split("|"), keywords.split("|"), actor, director
-
-vector_info = []
-
-#read the terms and their idf from the csv file
-with open("vector_info.csv", "r") as vector_file:
-    reader = csv.DictReader(vector_file, delimiter=",")
-    for row in reader:
-        term, df, idf = row["term"], row["database frequency"], row["idf"]
-        vector_info.append([term, idf])
-
-#write the vectors for each movie to a csv file
-with open("movie_vectors.csv", "w") as output_file:
-    writer = csv.writer(output_file, delimiter=";")
-    writer.writerow(["movie_id", "vector"])
-
-    #for each term in the vector_info, check if it is in the movie's genres, keywords, actor or director
-    #if it is, add the idf to the vector, else add 0
-    for movie_id, (genres, keywords, actor, director) in file_info.items():
-        vector = []
-        for term, idf in vector_info:
-            if term in genres or term in keywords or term == actor or term == director:
-                vector.append(float(idf))
-            else:
-                vector.append(float(0))
-
-        writer.writerow([movie_id, vector])
\ No newline at end of file
+import os
+import sys
+
+# run from the folder with the data: python vector.py [workers]
+# the movies are vectorized in one process, worker processes are only started if their number is given
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vectorizer import load_vectorizer
+
+
+def main():
+    """
+    A function to write the tf-idf vector of every movie of A_data.csv to movie_vectors.csv.
+    """
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    file_info = {}
+
+    #read the data from the csv file
+    with open("A_data.csv", "r") as file:
+        reader = csv.DictReader(file, delimiter=";")
+
+        for row in reader:
+            movie_id, title, year, imdb, duration, director, actor, genres, keywords = row["ID"], row["Title"], row["Year"], row["IMDb"], row["Duration"], row["Director"], row["Actor"], row["Genre"], row["Keywords"]
+            file_info[movie_id] = genres.split("|"), keywords.split("|"), actor, director
+
+    #read the terms and their idf from the csv file, the term -> column dictionary is built once
+    vectorizer = load_vectorizer("vector_info.csv")
+
+    #look up the columns of each movie's genres, keywords, actor and director, in parallel only if asked for
+    movies_terms = [genres + keywords + [actor, director]
+                    for genres, keywords, actor, director in file_info.values()]
+    if workers is None:
+        indptr, indices, data = vectorizer.transform(movies_terms)
+    else:
+        indptr, indices, data = vectorizer.transform_parallel(movies_terms, workers)
+
+    #write the vectors for each movie to a csv file
+    with open("movie_vectors.csv", "w") as output_file:
+        writer = csv.writer(output_file, delimiter=";")
+        writer.writerow(["movie_id", "vector"])
+
+        #only the (term index, idf) pairs of the movie's terms are written, zeros are not written at all
+        for row, movie_id in enumerate(file_info):
+            start, end = indptr[row], indptr[row + 1]
+            vector = [f"{index}:{idf}" for index, idf in zip(indices[start:end], data[start:end].tolist())]
+
+            writer.writerow([movie_id, ",".join(vector)])
+
+
+#the worker processes import this file again under the spawn start method, they must not run the script
+if __name__ == "__main__":
+    main()
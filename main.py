@@ -1,8 +1,11 @@
 from gui import MovieRecommendationApp
 import tkinter as tk
+import instrumentation
 
 # main file to run the program
 if __name__ == "__main__":
+    # timers, counters and the profiler are only switched on by the settings in instrumentation.py
+    instrumentation.configure()
     root = tk.Tk()
     app = MovieRecommendationApp(root)
     app.run()
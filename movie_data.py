@@ -0,0 +1,411 @@
+import csv
+import numpy as np
+
+
+# columns of the movie data csv file and how they are kept in memory
+NUMERIC_COLUMNS = {"year": ("Year", np.int16), "imdb": ("IMDb", np.float32),
+                   "duration": ("Duration", np.int16)}
+# columns with few distinct values, every distinct value is kept once
+CATEGORY_COLUMNS = {"director": "Director", "actor": "Actor", "genre": "Genre"}
+# columns where almost every value is different, all values are kept in one buffer
+TEXT_COLUMNS = {"title": "Title", "keywords": "Keywords"}
+
+
+class TextColumn:
+    """
+    This class holds the strings of a column in one utf-8 buffer instead of one object per string.
+
+    Variables:
+    buffer: the utf-8 bytes of all strings, one after another
+    offsets: an array where string i is buffer[offsets[i]:offsets[i + 1]]
+    """
+
+    def __init__(self, buffer, offsets):
+        """
+        The constructor for the TextColumn class.
+
+        Parameters:
+            buffer (bytes): the utf-8 bytes of all strings
+            offsets (np.array): offsets of the strings in the buffer, one more than the number of strings
+        """
+        self.buffer = bytes(buffer)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.buffer[self.offsets[row]:self.offsets[row + 1]].decode("utf-8")
+
+
+class CategoryColumn:
+    """
+    This class holds a column with few distinct strings as codes into a list of the distinct strings.
+    Every distinct string is kept once (interned), no matter how many rows hold it.
+
+    Variables:
+    values: the distinct strings, in the order they first appear
+    codes: an array with the index of the string of each row in values
+    """
+
+    def __init__(self, values, codes):
+        """
+        The constructor for the CategoryColumn class.
+
+        Parameters:
+            values (list): the distinct strings
+            codes (np.array): the index of the string of each row in values
+        """
+        self.values = list(values)
+        self.codes = np.asarray(codes, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+
+class Movie:
+    """
+    This class is a view of one movie in the movie data, nothing is copied until a field is read.
+
+    Variables:
+    movie_data: the movie data the movie belongs to
+    row: the row of the movie
+    """
+    __slots__ = ("movie_data", "row")
+
+    def __init__(self, movie_data, row):
+        """
+        The constructor for the Movie class.
+
+        Parameters:
+            movie_data (MovieData): the movie data
+            row (int): the row of the movie
+        """
+        self.movie_data = movie_data
+        self.row = row
+
+    @property
+    def id(self):
+        """
+        The id of the movie.
+        """
+        return int(self.movie_data.ids[self.row])
+
+    @property
+    def title(self):
+        """
+        The title of the movie.
+        """
+        return self.movie_data.columns["title"][self.row]
+
+    @property
+    def year(self):
+        """
+        The year the movie was released.
+        """
+        return int(self.movie_data.columns["year"][self.row])
+
+    @property
+    def imdb(self):
+        """
+        The IMDb score of the movie.
+        """
+        # the scores have one decimal, float32 would show as 7.300000190734863
+        return round(float(self.movie_data.columns["imdb"][self.row]), 1)
+
+    @property
+    def duration(self):
+        """
+        The duration of the movie in minutes.
+        """
+        return int(self.movie_data.columns["duration"][self.row])
+
+    @property
+    def director(self):
+        """
+        The director of the movie.
+        """
+        return self.movie_data.columns["director"][self.row]
+
+    @property
+    def actor(self):
+        """
+        The leading actor of the movie.
+        """
+        return self.movie_data.columns["actor"][self.row]
+
+    @property
+    def genre(self):
+        """
+        The genres of the movie, separated by "|".
+        """
+        return self.movie_data.columns["genre"][self.row]
+
+    @property
+    def keywords(self):
+        """
+        The plot keywords of the movie, separated by "|".
+        """
+        return self.movie_data.columns["keywords"][self.row]
+
+
+class MovieData:
+    """
+    This class holds the data of all movies column by column.
+    Numeric columns are typed arrays, strings are kept in a TextColumn or a CategoryColumn.
+
+    Variables:
+    ids: an array of movie ids, one for each row
+    columns: the columns by name: "year", "imdb", "duration", "director", "actor", "genre", "title", "keywords"
+    id_to_row: an array mapping a movie id to its row (-1 for unknown movie ids)
+    """
+
+    def __init__(self, ids, columns):
+        """
+        The constructor for the MovieData class.
+
+        Parameters:
+            ids (np.array): movie ids, one for each row
+            columns (dict): the columns by name
+        """
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.columns = columns
+
+        self._build_id_index()
+
+    def _build_id_index(self):
+        """
+        A function to build the id -> row lookup array.
+        """
+        size = int(self.ids.max()) + 1 if len(self.ids) else 1
+        self.id_to_row = np.full(size, -1, dtype=np.int64)
+        self.id_to_row[self.ids] = np.arange(len(self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, movie_id):
+        return 0 <= movie_id < len(self.id_to_row) and self.id_to_row[movie_id] >= 0
+
+    def movie(self, movie_id):
+        """
+        A function to get one movie.
+
+        Parameters:
+            movie_id (int): id of the movie
+
+        Returns:
+            movie (Movie): a view of the movie, a KeyError is raised for unknown movie ids
+        """
+        if movie_id not in self:
+            raise KeyError(movie_id)
+
+        return Movie(self, int(self.id_to_row[movie_id]))
+
+    def titles(self, movie_ids):
+        """
+        A function to get the titles of several movies.
+
+        Parameters:
+            movie_ids (iterable): ids of the movies
+
+        Returns:
+            titles (list): the titles of the movies
+        """
+        return [self.movie(movie_id).title for movie_id in movie_ids]
+
+    def update(self, keep, added):
+        """
+        A function to remove rows and append the rows of other movie data, in place.
+        Movie views and everything else that holds the movie data see the new rows.
+
+        Parameters:
+            keep (np.array): boolean mask of the rows that are kept
+            added (MovieData): movie data whose rows are appended after the kept rows
+
+        Returns:
+            None
+        """
+        for name, column in self.columns.items():
+            self.columns[name] = _join_columns(column, keep, added.columns[name])
+
+        self.ids = np.concatenate((self.ids[keep], added.ids))
+        self._build_id_index()
+
+        return None
+
+
+def _encode_strings(values):
+    """
+    A function to put strings into one utf-8 buffer.
+
+    Parameters:
+        values (iterable): the strings
+
+    Returns:
+        buffer (bytes): the utf-8 bytes of all strings
+        offsets (np.array): offsets of the strings in the buffer
+    """
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+
+    return b"".join(encoded), offsets
+
+
+def _intern_strings(values):
+    """
+    A function to replace strings with codes into the list of the distinct strings.
+
+    Parameters:
+        values (iterable): the strings
+
+    Returns:
+        distinct (list): the distinct strings, in the order they first appear
+        codes (np.array): the index of each string in distinct
+    """
+    codes = {}
+    values = list(values)
+    codes_array = np.fromiter((codes.setdefault(value, len(codes)) for value in values),
+                              dtype=np.int32, count=len(values))
+
+    return list(codes), codes_array
+
+
+def _join_columns(column, keep, added):
+    """
+    A function to join the kept rows of a column with the rows of a column of the same kind.
+
+    Parameters:
+        column (np.array, CategoryColumn or TextColumn): the column
+        keep (np.array): boolean mask of the rows of the column that are kept
+        added (np.array, CategoryColumn or TextColumn): the column whose rows come after the kept rows
+
+    Returns:
+        column (np.array, CategoryColumn or TextColumn): the joined column
+    """
+    if isinstance(column, CategoryColumn):
+        # the strings of the added rows get the codes they already have, new strings are added at the end
+        codes = {value: code for code, value in enumerate(column.values)}
+        values = list(column.values)
+        added_codes = np.array([codes.setdefault(value, len(codes)) for value in added.values],
+                               dtype=np.int32)
+        values.extend(list(codes)[len(values):])
+
+        return CategoryColumn(values, np.concatenate((column.codes[keep], added_codes[added.codes])))
+
+    if isinstance(column, TextColumn):
+        lengths = np.diff(column.offsets)
+        buffer = np.frombuffer(column.buffer, dtype=np.uint8)[np.repeat(keep, lengths)].tobytes()
+        offsets = np.zeros(int(keep.sum()) + len(added) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.concatenate((lengths[keep], np.diff(added.offsets))))
+
+        return TextColumn(buffer + added.buffer, offsets)
+
+    return np.concatenate((column[keep], added))
+
+
+def load_movie_data(path):
+    """
+    A function to load the movie data from a csv file into columns.
+
+    Parameters:
+        path (str): path to the csv file
+
+    Returns:
+        movie_data (MovieData): the movie data
+    """
+    with open(path, "r") as csvfile:
+        reader = csv.reader(csvfile, delimiter=";")
+        header = next(reader)
+        # one tuple of values for each column
+        values = dict(zip(header, zip(*reader)))
+
+    return build_movie_data(values)
+
+
+def build_movie_data(values):
+    """
+    A function to build the columns of the movie data from the values of the csv columns.
+
+    Parameters:
+        values (dict): the string values of each csv column ("ID", "Title", "Year", ...), one per movie
+
+    Returns:
+        movie_data (MovieData): the movie data
+    """
+    columns = {}
+    for column, (name, dtype) in NUMERIC_COLUMNS.items():
+        columns[column] = np.array(values[name], dtype=float).astype(dtype)
+
+    for column, name in CATEGORY_COLUMNS.items():
+        columns[column] = CategoryColumn(*_intern_strings(values[name]))
+
+    for column, name in TEXT_COLUMNS.items():
+        columns[column] = TextColumn(*_encode_strings(values[name]))
+
+    return MovieData(np.array(values["ID"], dtype=np.int64), columns)
+
+
+def save_movie_data_binary(path, movie_data):
+    """
+    A function to save the columns of the movie data to a numpy file, which loads faster than the csv file.
+    The distinct strings of a category column are saved in one buffer, like a text column.
+
+    Parameters:
+        path (str): path to the file
+        movie_data (MovieData): the movie data
+
+    Returns:
+        None
+    """
+    arrays = {"ids": movie_data.ids}
+
+    for column in NUMERIC_COLUMNS:
+        arrays[column] = movie_data.columns[column]
+
+    for column in CATEGORY_COLUMNS:
+        buffer, offsets = _encode_strings(movie_data.columns[column].values)
+        arrays[f"{column}_codes"] = movie_data.columns[column].codes
+        arrays[f"{column}_buffer"] = np.frombuffer(buffer, dtype=np.uint8)
+        arrays[f"{column}_offsets"] = offsets
+
+    for column in TEXT_COLUMNS:
+        arrays[f"{column}_buffer"] = np.frombuffer(movie_data.columns[column].buffer, dtype=np.uint8)
+        arrays[f"{column}_offsets"] = movie_data.columns[column].offsets
+
+    with open(path, "wb") as data_file:
+        np.savez(data_file, **arrays)
+
+    return None
+
+
+def load_movie_data_binary(path):
+    """
+    A function to load the columns of the movie data from a numpy file written by save_movie_data_binary.
+
+    Parameters:
+        path (str): path to the file
+
+    Returns:
+        movie_data (MovieData): the movie data
+    """
+    columns = {}
+
+    with np.load(path) as data_file:
+        for column in NUMERIC_COLUMNS:
+            columns[column] = data_file[column]
+
+        for column in CATEGORY_COLUMNS:
+            values = TextColumn(data_file[f"{column}_buffer"].tobytes(), data_file[f"{column}_offsets"])
+            columns[column] = CategoryColumn([values[row] for row in range(len(values))],
+                                             data_file[f"{column}_codes"])
+
+        for column in TEXT_COLUMNS:
+            columns[column] = TextColumn(data_file[f"{column}_buffer"].tobytes(),
+                                         data_file[f"{column}_offsets"])
+
+        return MovieData(data_file["ids"], columns)
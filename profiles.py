@@ -0,0 +1,218 @@
+import os
+import re
+import time
+import numpy as np
+import backend as bk
+
+
+# one record of the event log of a profile, records are only ever appended
+LOG_RECORD = np.dtype([("timestamp", "<f8"), ("movie_id", "<i8"), ("event", "u1")])
+
+# kinds of events, a feedback event is 1 if the user liked the movie and 0 if they did not
+EVENT_DISLIKED = 0
+EVENT_LIKED = 1
+EVENT_RECOMMENDED = 2
+EVENT_WATCHLIST = 3
+
+# a snapshot of the profile is written after this many new events, a resume only replays the events after it,
+# so the feedback of the tail always fits in one chunk of handle_feedback_batch
+SNAPSHOT_INTERVAL = 256
+
+# profile names are used as file names
+PROFILE_NAME = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class ProfileStore:
+    """
+    This class keeps user profiles on disk, so that a session can be resumed later.
+
+    Every profile has an append-only log of its events (timestamp, movie id, event) and a snapshot:
+    the float32 user vector, a bitmap over the movie ids of the movies that were already recommended,
+    the watchlist, the number of log records the snapshot covers and the fingerprint of the vocabulary
+    the user vector was built with.
+    A resume loads the snapshot and replays only the log records after it. The feedback events of the tail
+    are applied with handle_feedback_batch, so even thousands of them take milliseconds.
+    The snapshot is only a shortcut, everything in it can be replayed from the log.
+
+    Variables:
+    directory: the directory with the files of the profiles
+    snapshot_interval: the number of events after which a new snapshot is due
+    """
+
+    def __init__(self, directory=bk.PROFILES_DIRECTORY, snapshot_interval=SNAPSHOT_INTERVAL):
+        """
+        The constructor for the ProfileStore class.
+
+        Parameters:
+            directory (str): the directory with the files of the profiles, it is created on the first write
+            snapshot_interval (int): the number of events after which a new snapshot is due
+        """
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+
+    def _path(self, name, extension):
+        """
+        A function to get the path of a file of a profile, a ValueError is raised for invalid names.
+        """
+        if not PROFILE_NAME.fullmatch(name):
+            raise ValueError(f"invalid profile name {name!r}, use up to 64 letters, digits, '_' or '-'")
+
+        return os.path.join(self.directory, name + extension)
+
+    def exists(self, name):
+        """
+        A function to find out whether a profile has been saved before.
+
+        Parameters:
+            name (str): name of the profile
+
+        Returns:
+            exists (bool): True if the profile has a log
+        """
+        return os.path.exists(self._path(name, ".log"))
+
+    def names(self):
+        """
+        A function to list the saved profiles.
+
+        Returns:
+            names (list): the sorted names of the profiles that have a log
+        """
+        if not os.path.isdir(self.directory):
+            return []
+
+        return sorted(file_name[:-len(".log")] for file_name in os.listdir(self.directory)
+                      if file_name.endswith(".log") and PROFILE_NAME.fullmatch(file_name[:-len(".log")]))
+
+    def log_length(self, name):
+        """
+        A function to get the number of complete records in the log of a profile.
+
+        Parameters:
+            name (str): name of the profile
+
+        Returns:
+            length (int): number of records
+        """
+        path = self._path(name, ".log")
+        if not os.path.exists(path):
+            return 0
+
+        # a record that was only partly written is not counted
+        return os.path.getsize(path) // LOG_RECORD.itemsize
+
+    def append(self, name, movie_ids, event, timestamp=None):
+        """
+        A function to append events to the log of a profile.
+
+        Parameters:
+            name (str): name of the profile
+            movie_ids (iterable): ids of the movies, one event for each
+            event (int): the kind of the events, e.g. EVENT_LIKED
+            timestamp (float): time of the events, now if not given
+
+        Returns:
+            None
+        """
+        movie_ids = np.fromiter(movie_ids, dtype=np.int64)
+        if not len(movie_ids):
+            return None
+
+        records = np.zeros(len(movie_ids), dtype=LOG_RECORD)
+        records["timestamp"] = time.time() if timestamp is None else timestamp
+        records["movie_id"] = movie_ids
+        records["event"] = event
+
+        path = self._path(name, ".log")
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, "ab") as log_file:
+            # a partly written record from an interrupted write is cut off, so the records stay aligned
+            if log_file.tell() % LOG_RECORD.itemsize:
+                log_file.truncate(log_file.tell() - log_file.tell() % LOG_RECORD.itemsize)
+            log_file.write(records.tobytes())
+
+        return None
+
+    def save_snapshot(self, name, user_vector, excluded_ids, watchlist, log_length):
+        """
+        A function to save a snapshot of a profile.
+        The snapshot is written next to the old one first, so a crash never leaves a broken snapshot.
+
+        Parameters:
+            name (str): name of the profile
+            user_vector (np.array): the user vector
+            excluded_ids (np.array): ids of the movies that were already recommended
+            watchlist (list): ids of the movies in the watchlist
+            log_length (int): the number of log records the snapshot covers
+
+        Returns:
+            None
+        """
+        excluded_ids = np.asarray(excluded_ids, dtype=np.int64)
+        excluded = np.zeros(int(excluded_ids.max()) + 1 if len(excluded_ids) else 0, dtype=bool)
+        excluded[excluded_ids] = True
+
+        path = self._path(name, ".npz")
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path + ".tmp", "wb") as snapshot_file:
+            np.savez(snapshot_file, user_vector=np.asarray(user_vector, dtype=np.float32),
+                     excluded=np.packbits(excluded), excluded_count=len(excluded),
+                     watchlist=np.asarray(watchlist, dtype=np.int64), log_length=log_length,
+                     vocabulary=bk.get_vocabulary_fingerprint())
+        os.replace(path + ".tmp", path)
+
+        return None
+
+    def load(self, name, vector_store=None):
+        """
+        A function to restore a profile from its latest snapshot and the log records after it.
+        If there is no snapshot, or the snapshot was taken with vectors of another dimension or vocabulary
+        (e.g. after a full rebuild of the catalog, which can reorder the columns), the whole log is replayed.
+
+        Parameters:
+            name (str): name of the profile
+            vector_store (VectorStore): movie vectors, the shared store is used if not given
+
+        Returns:
+            user_vector (np.array): the user vector
+            excluded_ids (np.array): ids of the movies that were already recommended
+            watchlist (list): ids of the movies in the watchlist
+            log_length (int): the number of log records the state covers
+        """
+        if vector_store is None:
+            vector_store = bk.get_vector_store()
+
+        user_vector = np.zeros(vector_store.dimension, dtype=float)
+        excluded_ids = np.zeros(0, dtype=np.int64)
+        watchlist = []
+        start = 0
+
+        snapshot_path = self._path(name, ".npz")
+        if os.path.exists(snapshot_path):
+            with np.load(snapshot_path) as snapshot:
+                # snapshots saved before the fingerprints were kept have none
+                vocabulary = str(snapshot["vocabulary"]) if "vocabulary" in snapshot else ""
+
+                if (len(snapshot["user_vector"]) == vector_store.dimension
+                        and vocabulary in ("", bk.get_vocabulary_fingerprint())):
+                    user_vector = snapshot["user_vector"].astype(float)
+                    excluded_ids = np.flatnonzero(np.unpackbits(
+                        snapshot["excluded"], count=int(snapshot["excluded_count"])))
+                    watchlist = [int(movie_id) for movie_id in snapshot["watchlist"]]
+                    start = int(snapshot["log_length"])
+
+        length = self.log_length(name)
+        records = np.zeros(0, dtype=LOG_RECORD)
+        if length > start:
+            records = np.fromfile(self._path(name, ".log"), dtype=LOG_RECORD, count=length - start,
+                                  offset=start * LOG_RECORD.itemsize)
+
+        # the whole tail of feedback is applied at once, the other events only add to the sets
+        feedback = records["event"] <= EVENT_LIKED
+        user_vector = bk.handle_feedback_batch(
+            vector_store, user_vector,
+            zip(records["movie_id"][feedback].tolist(), (records["event"][feedback] == EVENT_LIKED).tolist()))
+        excluded_ids = np.union1d(excluded_ids, records["movie_id"][records["event"] == EVENT_RECOMMENDED])
+        watchlist.extend(records["movie_id"][records["event"] == EVENT_WATCHLIST].tolist())
+
+        return user_vector, excluded_ids, watchlist, max(length, start)
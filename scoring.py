@@ -0,0 +1,347 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import backend as bk
+import instrumentation
+from vector_store import select_top_k
+
+
+# memory budget of the cached item-item similarity rows (in bytes)
+SIMILARITY_CACHE_SIZE = 64 * 1024 * 1024
+
+
+class SimilarityCache:
+    """
+    This class is a least recently used cache of item-item similarity rows.
+    A row holds the dot products of one movie vector with every movie vector in the catalog.
+    The oldest rows are dropped once the rows take up more memory than the budget.
+    All rows are dropped when the rows of the catalog change (see follow).
+
+    Variables:
+    max_bytes: the memory budget of the cached rows
+    rows: cached rows by movie id, the most recently used row is last
+    size: the memory taken up by the cached rows
+    hits: the number of lookups that found a cached row
+    misses: the number of lookups that did not find a cached row
+    version: the version of the vector store the cached rows were computed with
+    """
+
+    def __init__(self, max_bytes=SIMILARITY_CACHE_SIZE):
+        """
+        The constructor for the SimilarityCache class.
+
+        Parameters:
+            max_bytes (int): the memory budget of the cached rows
+        """
+        self.max_bytes = max_bytes
+        self.rows = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.version = None
+
+        # the cache is shared with the background thread of the GUI
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def follow(self, vector_store):
+        """
+        A function to drop every cached row if the rows of the vector store changed since they were cached,
+        e.g. after Catalog.update.
+
+        Parameters:
+            vector_store (VectorStore): the movie vectors the rows are computed with
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self.version != vector_store.version:
+                self.rows.clear()
+                self.size = 0
+                self.version = vector_store.version
+
+        return None
+
+    def get(self, movie_id):
+        """
+        A function to get a cached row.
+
+        Parameters:
+            movie_id (int): id of the movie
+
+        Returns:
+            row (np.array): the cached row, or None if it is not cached
+        """
+        with self._lock:
+            row = self.rows.get(movie_id)
+
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.rows.move_to_end(movie_id)
+
+        instrumentation.count("similarity cache misses" if row is None else "similarity cache hits")
+
+        return row
+
+    def put(self, movie_id, row):
+        """
+        A function to cache a row, the least recently used rows are dropped if the budget is exceeded.
+
+        Parameters:
+            movie_id (int): id of the movie
+            row (np.array): dot products of the movie vector with every movie vector
+
+        Returns:
+            None
+        """
+        # a row that does not fit into the budget is not cached at all
+        if row.nbytes > self.max_bytes:
+            return None
+
+        with self._lock:
+            if movie_id in self.rows:
+                self.size -= self.rows.pop(movie_id).nbytes
+
+            self.rows[movie_id] = row
+            self.size += row.nbytes
+
+            while self.size > self.max_bytes:
+                _, dropped = self.rows.popitem(last=False)
+                self.size -= dropped.nbytes
+
+        return None
+
+
+class ScoreTracker:
+    """
+    This class keeps the score vector of one user session up to date without rescoring the catalog.
+
+    A feedback update of the user vector is linear: u' = (u ± m) / |u ± m|.
+    The dot products with every movie vector follow the same rule: M·u' = (M·u ± M·m) / |u ± m|,
+    where the item-item row M·m is taken from a SimilarityCache.
+    The whole catalog is scored only on a cache miss or on an explicit resync.
+
+    When the rows of the vector store are changed in place (Catalog.update), the columns stay the same,
+    so the user vector stays valid: the catalog is scored again from it and the cached rows are dropped.
+
+    Variables:
+    vector_store: the movie vectors
+    cache: the cache of item-item similarity rows
+    user_vector: the current user vector
+    dot_products: the dot products of the user vector with every movie vector
+    full_recomputes: the number of times the whole catalog was scored
+    version: the version of the vector store the dot products were computed with
+    """
+
+    def __init__(self, vector_store=None, user_vector=None, cache=None):
+        """
+        The constructor for the ScoreTracker class.
+
+        Parameters:
+            vector_store (VectorStore): movie vectors, the shared store is used if not given
+            user_vector (np.array): the starting user vector, a zero vector if not given
+            cache (SimilarityCache): cache of item-item similarity rows, a new cache if not given
+        """
+        if vector_store is None:
+            vector_store = bk.get_vector_store()
+        if user_vector is None:
+            user_vector = np.zeros(vector_store.dimension, dtype=float)
+        if cache is None:
+            cache = SimilarityCache()
+
+        self.vector_store = vector_store
+        self.cache = cache
+        self.full_recomputes = 0
+        self.set_state((np.asarray(user_vector, dtype=float), None, None))
+
+    @property
+    def state(self):
+        """
+        The current (user vector, dot products, version of the vector store) triple.
+        """
+        return self.user_vector, self.dot_products, self.version
+
+    def set_state(self, state):
+        """
+        A function to replace the current user vector and its dot products.
+
+        Parameters:
+            state (tuple): (user vector, dot products, version of the vector store they were computed with),
+                           the dot products are recomputed if they are None or of another version
+
+        Returns:
+            None
+        """
+        self.user_vector, self.dot_products, self.version = state
+
+        # a state computed before the rows changed has the dot products of the old rows
+        if self.dot_products is None or self.version != self.vector_store.version:
+            self.resync()
+
+        return None
+
+    def resync(self):
+        """
+        A function to score the whole catalog again from the current user vector.
+        """
+        self.cache.follow(self.vector_store)
+        self.version = self.vector_store.version
+        self.dot_products = self.vector_store.dot_products(self.user_vector)
+        self.full_recomputes += 1
+
+        return None
+
+    def _follow_store(self, state):
+        """
+        A function to score the catalog again if the rows of the vector store changed since a state was scored.
+
+        Parameters:
+            state (tuple): (user vector, dot products, version) given instead of the current state, or None
+
+        Returns:
+            state (tuple): the state, with the dot products of the current rows
+        """
+        if state is None:
+            if self.version != self.vector_store.version:
+                self.resync()
+
+            return self.state
+
+        user_vector, _, version = state
+        if version != self.vector_store.version:
+            self.cache.follow(self.vector_store)
+            self.full_recomputes += 1
+            return user_vector, self.vector_store.dot_products(user_vector), self.vector_store.version
+
+        return state
+
+    def updated(self, movie_id, feedback, state=None):
+        """
+        A function to calculate the state after the user's feedback, without changing the current state.
+        It can be called from a background thread.
+
+        Parameters:
+            movie_id (int): id of the movie that the user reacted to
+            feedback (bool): whether the user liked the movie or not
+            state (tuple): (user vector, dot products, version) to start from instead of the current state
+
+        Returns:
+            state (tuple): (updated user vector, updated dot products, version of the vector store)
+        """
+        user_vector, dot_products, version = self._follow_store(state)
+        sign = 1.0 if feedback else -1.0
+
+        updated_user_vector = bk.handle_feedback(
+            self.vector_store, user_vector, feedback, movie_id)
+
+        # the feedback brought the user vector back to zero
+        if not updated_user_vector.any():
+            return updated_user_vector, np.zeros_like(dot_products), version
+
+        movievector = self.vector_store.vector(movie_id)
+        magnitude = np.linalg.norm(user_vector + sign * movievector)
+
+        row = self.cache.get(movie_id)
+
+        # cache miss, score the catalog for the new user vector and the movie in one pass
+        if row is None:
+            products = self.vector_store.dot_products(
+                np.column_stack((updated_user_vector, movievector)))
+            self.cache.put(movie_id, np.ascontiguousarray(products[:, 1]))
+            self.full_recomputes += 1
+
+            return updated_user_vector, np.ascontiguousarray(products[:, 0]), version
+
+        return updated_user_vector, (dot_products + sign * row) / magnitude, version
+
+    def apply_feedback(self, movie_id, feedback):
+        """
+        A function to update the user vector and the scores with the user's feedback.
+
+        Parameters:
+            movie_id (int): id of the movie that the user reacted to
+            feedback (bool): whether the user liked the movie or not
+
+        Returns:
+            user_vector (np.array): the updated user vector
+        """
+        self.set_state(self.updated(movie_id, feedback))
+
+        return self.user_vector
+
+    def scores(self, state=None):
+        """
+        A function to get the cosine similarity of the user vector with every movie vector.
+
+        Parameters:
+            state (tuple): (user vector, dot products, version) to use instead of the current state
+
+        Returns:
+            similarity (np.array): cosine similarity for each row of the store
+        """
+        user_vector, dot_products, _ = self._follow_store(state)
+
+        return self.vector_store.cosine(dot_products, user_vector)
+
+    def top_k(self, k, exclude=None, state=None):
+        """
+        A function to find the k best movies from the maintained scores.
+
+        Parameters:
+            k (int): number of movies to find
+            exclude (iterable): ids of movies that must not be returned
+            state (tuple): (user vector, dot products, version) to use instead of the current state
+
+        Returns:
+            movie_ids (np.array): ids of the best movies in ranked order
+            similarity (np.array): cosine similarity of those movies
+        """
+        available = np.ones(len(self.vector_store), dtype=bool)
+        if exclude is not None:
+            rows = self.vector_store.rows(exclude)
+            available[rows[rows >= 0]] = False
+
+        rows, similarity = select_top_k(self.scores(state), k, available)
+
+        return self.vector_store.ids[rows], similarity
+
+    def recommend_after_feedback(self, movie_id, feedback, recommended_movies):
+        """
+        A function to find what would be recommended if the user gave the feedback on the movie.
+        Nothing is changed, so it can run speculatively in a background thread.
+
+        Parameters:
+            movie_id (int): id of the movie that the user is reacting to
+            feedback (bool): whether the user likes the movie or not
+            recommended_movies (iterable): movie ids that have already been recommended
+
+        Returns:
+            state (tuple): (updated user vector, updated dot products, version of the vector store)
+            recommendation (int): id of the movie that would be recommended next, 0 if there is none left
+        """
+        state = self.updated(movie_id, feedback)
+        movie_ids, _ = self.top_k(1, recommended_movies, state)
+
+        if len(movie_ids) == 0:
+            return state, 0
+
+        return state, int(movie_ids[0])
+
+    def check_consistency(self):
+        """
+        A function to compare the maintained scores with a full recompute.
+
+        Returns:
+            difference (float): the largest absolute difference between the two score vectors
+        """
+        full_scores = self.vector_store.scores(self.user_vector)
+
+        if len(full_scores) == 0:
+            return 0.0
+
+        return float(np.abs(self.scores() - full_scores).max())
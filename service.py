@@ -0,0 +1,761 @@
+import json
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import backend as bk
+import instrumentation
+from profiles import EVENT_DISLIKED, EVENT_LIKED, EVENT_RECOMMENDED, EVENT_WATCHLIST, ProfileStore
+from scoring import ScoreTracker, SimilarityCache
+from vector_store import select_top_k
+
+
+# requests arriving within this window (in seconds) are scored together
+BATCH_WINDOW = 0.005
+# a batch is scored right away once it has this many requests
+MAX_BATCH_SIZE = 256
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8000
+
+
+class Session:
+    """
+    This class holds the state of one user session in a compact form.
+
+    Variables:
+    user_vector: the user vector in float32
+    excluded: a bitmap over the rows of the vector store, set bits are movies that were already recommended
+    watchlist: a list of movie ids that the user has added to their watchlist
+    score_tracker: keeps the scores of the session up to date after each feedback, None for batched sessions
+    profile: the name of the profile the session is saved to, None if it is not saved
+    unsaved: the number of events logged since the last snapshot of the profile
+    lock: a lock that serializes requests of the same session
+    """
+    __slots__ = ("user_vector", "excluded", "watchlist", "score_tracker", "profile", "unsaved", "lock")
+
+    def __init__(self, dimension, count, score_tracker=None, profile=None):
+        """
+        The constructor for the Session class.
+
+        Parameters:
+            dimension (int): the dimension of the movie vectors
+            count (int): the number of movies in the vector store
+            score_tracker (ScoreTracker): incremental scores of the session, or None
+            profile (str): the name of the profile the session is saved to, or None
+        """
+        self.user_vector = np.zeros(dimension, dtype=np.float32)
+        self.excluded = np.zeros((count + 7) // 8, dtype=np.uint8)
+        self.watchlist = []
+        self.score_tracker = score_tracker
+        self.profile = profile
+        self.unsaved = 0
+        self.lock = threading.Lock()
+
+    def exclude(self, rows):
+        """
+        A function to mark rows of the vector store as already recommended.
+
+        Parameters:
+            rows (np.array): rows of the movies, -1 for unknown movies
+
+        Returns:
+            None
+        """
+        rows = rows[rows >= 0]
+        np.bitwise_or.at(self.excluded, rows >> 3,
+                         (0x80 >> (rows & 7)).astype(np.uint8))
+
+        return None
+
+    def available(self, count):
+        """
+        A function to get the movies that can still be recommended.
+
+        Parameters:
+            count (int): the number of movies in the vector store
+
+        Returns:
+            available (np.array): boolean mask over the rows of the vector store
+        """
+        return ~np.unpackbits(self.excluded, count=count).astype(bool)
+
+
+class _ScoreRequest:
+    """
+    This class is one top-k request waiting in a batch.
+    """
+    __slots__ = ("user_vector", "k", "available", "result", "error", "done")
+
+    def __init__(self, user_vector, k, available):
+        self.user_vector = user_vector
+        self.k = k
+        self.available = available
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchScorer:
+    """
+    This class coalesces top-k requests of many users into one matrix-matrix product.
+
+    The first request that arrives waits for BATCH_WINDOW seconds (or until MAX_BATCH_SIZE requests are waiting),
+    then the whole catalog is scored for every waiting user at once, and every request gets its own top-k.
+
+    Variables:
+    vector_store: the movie vectors
+    window: how long the first request of a batch waits for more requests (in seconds)
+    max_batch_size: the number of requests that are scored right away
+    batches: the number of batches scored so far
+    """
+
+    def __init__(self, vector_store, window=BATCH_WINDOW, max_batch_size=MAX_BATCH_SIZE):
+        """
+        The constructor for the BatchScorer class.
+
+        Parameters:
+            vector_store (VectorStore): movie vectors
+            window (float): how long the first request of a batch waits for more requests (in seconds)
+            max_batch_size (int): the number of requests that are scored right away
+        """
+        self.vector_store = vector_store
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+
+        self._pending = []
+        self._condition = threading.Condition()
+
+    def top_k(self, user_vector, k, available=None):
+        """
+        A function to find the k best movies for the user vector, scored together with other waiting requests.
+
+        Parameters:
+            user_vector (np.array): user vector
+            k (int): number of movies to find
+            available (np.array): boolean mask of the rows that can be returned, all rows if not given
+
+        Returns:
+            rows (np.array): rows of the best movies in ranked order
+            similarity (np.array): cosine similarity of those movies
+        """
+        request = _ScoreRequest(user_vector, k, available)
+
+        with self._condition:
+            self._pending.append(request)
+            leader = len(self._pending) == 1
+
+            if len(self._pending) >= self.max_batch_size:
+                self._condition.notify_all()
+
+            # the first request of a batch waits for the others and scores them all
+            if leader:
+                self._condition.wait_for(
+                    lambda: len(self._pending) >= self.max_batch_size, timeout=self.window)
+                batch, self._pending = self._pending, []
+
+        if leader:
+            self._score(batch)
+        else:
+            request.done.wait()
+
+        if request.error is not None:
+            raise request.error
+
+        return request.result
+
+    def _score(self, batch):
+        """
+        A function to score a batch of requests with one matrix-matrix product.
+
+        Parameters:
+            batch (list): the waiting requests
+
+        Returns:
+            None
+        """
+        try:
+            user_vectors = np.column_stack([request.user_vector for request in batch])
+            dot_products = self.vector_store.dot_products(user_vectors)
+            self.batches += 1
+
+            for column, request in enumerate(batch):
+                similarity = self.vector_store.cosine(
+                    dot_products[:, column], request.user_vector)
+                request.result = select_top_k(similarity, request.k, request.available)
+
+        except Exception as error:
+            for request in batch:
+                request.error = error
+
+        finally:
+            for request in batch:
+                request.done.set()
+
+        return None
+
+
+class RecommendationService:
+    """
+    This class is a headless recommendation service that keeps many user sessions in memory.
+    Recommendations of different sessions are scored in batches by a BatchScorer.
+    With an approximate or sharded search index (SEARCH_INDEX) every request searches the index instead,
+    the batches only pay off for an exact scan of the whole catalog.
+    Sessions created with incremental scores keep a ScoreTracker instead, which is what the GUI uses,
+    their maintained scores are exact whatever the search index is.
+    Recommendations can be limited to the candidates of an attribute filter (see backend.filter_movies).
+
+    The movie vectors are loaded on first use, so a client can show its window before they are ready.
+
+    A session can be saved to a named profile: every event is appended to the log of the profile,
+    a snapshot is written every few events and when the session ends, and a later session
+    with the same profile resumes where it stopped instead of starting with random movies.
+
+    Variables:
+    vector_store: the movie vectors
+    search_index: the index the sessions without incremental scores are searched in
+    batch_scorer: scores the recommendations of many sessions together
+    similarity_cache: item-item rows shared by the incremental sessions
+    profile_store: the saved profiles
+    sessions: the sessions by session id
+    """
+
+    def __init__(self, vector_store=None, batch_window=BATCH_WINDOW, max_batch_size=MAX_BATCH_SIZE,
+                 profile_store=None, search_index=None):
+        """
+        The constructor for the RecommendationService class.
+
+        Parameters:
+            vector_store (VectorStore): movie vectors, the shared store is used if not given
+            search_index (IVFIndex or ShardedScorer): index over the movie vectors, if not given
+                                                      the index of SEARCH_INDEX over the shared store is used,
+                                                      or the given vector store itself
+            batch_window (float): how long the first request of a batch waits for more requests (in seconds)
+            max_batch_size (int): the number of requests that are scored right away
+            profile_store (ProfileStore): the saved profiles, the profiles in PROFILES_DIRECTORY if not given
+        """
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.similarity_cache = SimilarityCache()
+        self.profile_store = profile_store if profile_store is not None else ProfileStore()
+        self.sessions = {}
+
+        self._vector_store = vector_store
+        # a given vector store is searched exactly, the index of SEARCH_INDEX is over the shared store
+        self._search_index = search_index if search_index is not None else vector_store
+        self._batch_scorer = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def vector_store(self):
+        """
+        The movie vectors, the shared store is loaded on first use if none was given.
+        """
+        if self._vector_store is None:
+            with self._load_lock:
+                if self._vector_store is None:
+                    self._vector_store = bk.get_vector_store()
+
+        return self._vector_store
+
+    @property
+    def search_index(self):
+        """
+        The index the sessions without incremental scores are searched in, the vector store for an exact search.
+        """
+        if self._search_index is None:
+            with self._load_lock:
+                if self._search_index is None:
+                    self._search_index = bk.get_search_index()
+
+        return self._search_index
+
+    @property
+    def batch_scorer(self):
+        """
+        The BatchScorer of the sessions without incremental scores.
+        """
+        if self._batch_scorer is None:
+            with self._load_lock:
+                if self._batch_scorer is None:
+                    self._batch_scorer = BatchScorer(
+                        self.vector_store, self.batch_window, self.max_batch_size)
+
+        return self._batch_scorer
+
+    def _session(self, session_id):
+        """
+        A function to find a session, a KeyError is raised for unknown session ids.
+        """
+        with self._lock:
+            return self.sessions[session_id]
+
+    def _search(self, user_vector, k, available):
+        """
+        A function to find the k best rows for a session without incremental scores.
+        An exact search is scored in a batch with the other sessions, an index is searched right away.
+        """
+        if self.search_index is self.vector_store:
+            return self.batch_scorer.top_k(user_vector, k, available)
+
+        return self.search_index.search(user_vector, k, available)
+
+    def _log(self, session, movie_ids, event):
+        """
+        A function to append events to the profile of a session, and to save a snapshot once one is due.
+        It is called with the lock of the session held, right after the session was changed.
+        """
+        if session.profile is None:
+            return None
+
+        movie_ids = list(movie_ids)
+        self.profile_store.append(session.profile, movie_ids, event)
+        session.unsaved += len(movie_ids)
+
+        if session.unsaved >= self.profile_store.snapshot_interval:
+            self._save_snapshot(session)
+
+        return None
+
+    def _save_snapshot(self, session):
+        """
+        A function to save a snapshot of the profile of a session, with the lock of the session held.
+        """
+        excluded_rows = np.flatnonzero(np.unpackbits(session.excluded, count=len(self.vector_store)))
+        self.profile_store.save_snapshot(
+            session.profile, session.user_vector, self.vector_store.ids[excluded_rows],
+            session.watchlist, self.profile_store.log_length(session.profile))
+        session.unsaved = 0
+
+        return None
+
+    def start_session(self, incremental=False, random_movies=None, profile=None, seed_movies=None):
+        """
+        A function to start a new session.
+        The session starts with 10 random movies, so that the user's profile can be created.
+        A session of a saved profile continues where the profile stopped instead, without random movies.
+        A session seeded with movies the user likes (e.g. found with search) starts without random movies too.
+
+        Parameters:
+            incremental (bool): whether the session keeps incremental scores instead of being scored in batches
+            random_movies (list): the movies to be shown first, if the client has already picked them
+            profile (str): the name of the profile the session is resumed from and saved to, or None
+            seed_movies (list): ids of movies the user likes, the user vector starts from them
+
+        Returns:
+            session_id (str): id of the new session
+            random_movies (list): the 10 random movies to be shown first, empty for a resumed or seeded session
+        """
+        user_vector = None
+        excluded_ids = []
+        watchlist = []
+        seed_movies = [int(movie_id) for movie_id in seed_movies or ()]
+
+        if profile is not None and self.profile_store.exists(profile):
+            user_vector, excluded_ids, watchlist, _ = self.profile_store.load(profile, self.vector_store)
+            if random_movies is None:
+                random_movies = []
+
+        # the seed movies are liked all at once and are not recommended again
+        if seed_movies:
+            if user_vector is None:
+                user_vector = np.zeros(self.vector_store.dimension)
+            user_vector = bk.handle_feedback_batch(
+                self.vector_store, user_vector, [(movie_id, True) for movie_id in seed_movies])
+            excluded_ids = np.union1d(excluded_ids, seed_movies).astype(np.int64)
+            if random_movies is None:
+                random_movies = []
+
+        score_tracker = None
+        if incremental:
+            score_tracker = ScoreTracker(self.vector_store, user_vector, cache=self.similarity_cache)
+
+        session = Session(self.vector_store.dimension, len(self.vector_store), score_tracker, profile)
+        if user_vector is not None:
+            session.user_vector = user_vector.astype(np.float32)
+        session.watchlist = watchlist
+        session.exclude(self.vector_store.rows(excluded_ids))
+
+        if random_movies is None:
+            random_movies = bk.get_random_movies([])
+        session.exclude(self.vector_store.rows(random_movies))
+
+        session_id = secrets.token_hex(8)
+        with self._lock:
+            # two sessions writing to the same log would mix their events
+            if profile is not None and any(other.profile == profile for other in self.sessions.values()):
+                raise ValueError(f"profile {profile!r} is already used by another session")
+            self.sessions[session_id] = session
+
+        with session.lock:
+            self._log(session, seed_movies + list(random_movies), EVENT_RECOMMENDED)
+            self._log(session, seed_movies, EVENT_LIKED)
+
+        return session_id, random_movies
+
+    def search(self, query, limit=10):
+        """
+        A function to find movies by title, actor, director or keyword, e.g. to seed a session.
+        It does not need the movie vectors, so a client can search while they are being loaded.
+
+        Parameters:
+            query (str): the text that is looked up, e.g. "star wa" or "tom hanks"
+            limit (int): the number of movies to return
+
+        Returns:
+            movie_ids (list): ids of the movies, best first
+        """
+        return bk.search_movies(query, limit)
+
+    def feedback(self, session_id, movie_id, liked):
+        """
+        A function to update the user vector of a session with the user's feedback.
+
+        Parameters:
+            session_id (str): id of the session
+            movie_id (int): id of the movie the user reacted to
+            liked (bool): whether the user liked the movie or not
+
+        Returns:
+            None
+        """
+        session = self._session(session_id)
+
+        with session.lock:
+            if session.score_tracker is not None:
+                user_vector = session.score_tracker.apply_feedback(movie_id, liked)
+            else:
+                user_vector = bk.handle_feedback(
+                    self.vector_store, session.user_vector.astype(float), liked, movie_id)
+
+            session.user_vector = user_vector.astype(np.float32)
+            self._log(session, [movie_id], EVENT_LIKED if liked else EVENT_DISLIKED)
+
+        return None
+
+    def recommend(self, session_id, k=1, mark=True, candidates=None):
+        """
+        A function to recommend the next movies of a session.
+
+        Parameters:
+            session_id (str): id of the session
+            k (int): number of movies to recommend
+            mark (bool): whether the movies are marked as recommended, so that they are not recommended again
+            candidates (np.array): boolean mask of the rows that may be recommended, e.g. from filter_movies
+
+        Returns:
+            movie_ids (list): ids of the recommended movies, best first
+        """
+        session = self._session(session_id)
+
+        with session.lock:
+            available = session.available(len(self.vector_store))
+            if candidates is not None:
+                available &= candidates
+
+            if session.score_tracker is not None:
+                rows, _ = select_top_k(session.score_tracker.scores(), k, available)
+            else:
+                rows, _ = self._search(session.user_vector.astype(float), k, available)
+
+            if mark:
+                session.exclude(rows)
+                self._log(session, self.vector_store.ids[rows], EVENT_RECOMMENDED)
+
+        return [int(movie_id) for movie_id in self.vector_store.ids[rows]]
+
+    def preview(self, session_id, movie_id, liked, candidates=None):
+        """
+        A function to find what would be recommended if the user gave the feedback on the movie.
+        Nothing is changed, so it can run speculatively in a background thread.
+
+        Parameters:
+            session_id (str): id of the session
+            movie_id (int): id of the movie the user is reacting to
+            liked (bool): whether the user likes the movie or not
+            candidates (np.array): boolean mask of the rows that may be recommended, e.g. from filter_movies
+
+        Returns:
+            state (tuple): the updated state of the session, to be passed to set_state
+            recommendation (int): id of the movie that would be recommended next, 0 if there is none left
+        """
+        session = self._session(session_id)
+
+        # the state is copied with the lock held and scored without it, a feedback of the session
+        # may replace it meanwhile, the arrays of a state are never changed in place
+        with session.lock:
+            available = session.available(len(self.vector_store))
+            user_vector = session.user_vector.astype(float)
+            tracker_state = session.score_tracker.state if session.score_tracker is not None else None
+
+        if candidates is not None:
+            available &= candidates
+
+        if session.score_tracker is not None:
+            state = session.score_tracker.updated(movie_id, liked, tracker_state)
+            rows, _ = select_top_k(session.score_tracker.scores(state), 1, available)
+        else:
+            user_vector = bk.handle_feedback(self.vector_store, user_vector, liked, movie_id)
+            state = (user_vector, None, None)
+            rows, _ = self.search_index.search(user_vector, 1, available)
+
+        recommendation = int(self.vector_store.ids[rows[0]]) if len(rows) else 0
+
+        return state, recommendation
+
+    def set_state(self, session_id, state, feedback=None):
+        """
+        A function to replace the user vector of a session with a state computed by preview.
+
+        Parameters:
+            session_id (str): id of the session
+            state (tuple): (user vector, dot products, version of the vector store) from preview
+            feedback (tuple): the (movie id, liked) the state was computed for, it is logged to the profile
+
+        Returns:
+            None
+        """
+        session = self._session(session_id)
+
+        with session.lock:
+            if session.score_tracker is not None:
+                session.score_tracker.set_state(state)
+
+            session.user_vector = np.asarray(state[0], dtype=np.float32)
+            if feedback is not None:
+                movie_id, liked = feedback
+                self._log(session, [movie_id], EVENT_LIKED if liked else EVENT_DISLIKED)
+
+        return None
+
+    def mark_recommended(self, session_id, movie_ids):
+        """
+        A function to mark movies of a session as recommended, e.g. a recommendation found by preview.
+
+        Parameters:
+            session_id (str): id of the session
+            movie_ids (iterable): ids of the movies
+
+        Returns:
+            None
+        """
+        session = self._session(session_id)
+
+        with session.lock:
+            movie_ids = list(movie_ids)
+            session.exclude(self.vector_store.rows(movie_ids))
+            self._log(session, movie_ids, EVENT_RECOMMENDED)
+
+        return None
+
+    def add_to_watchlist(self, session_id, movie_id):
+        """
+        A function to add a movie to the watchlist of a session.
+
+        Parameters:
+            session_id (str): id of the session
+            movie_id (int): id of the movie
+
+        Returns:
+            None
+        """
+        session = self._session(session_id)
+
+        with session.lock:
+            bk.add_to_watchlist(movie_id, session.watchlist)
+            self._log(session, [movie_id], EVENT_WATCHLIST)
+
+        return None
+
+    def watchlist(self, session_id):
+        """
+        A function to get the watchlist of a session.
+
+        Parameters:
+            session_id (str): id of the session
+
+        Returns:
+            watchlist (list): ids of the movies in the watchlist
+        """
+        session = self._session(session_id)
+
+        with session.lock:
+            return list(session.watchlist)
+
+    def end_session(self, session_id, k=10, candidates=None):
+        """
+        A function to end a session, it gives the watchlist and the final recommendations.
+        The profile of the session is saved, so that the next session with it resumes without replaying the log.
+
+        Parameters:
+            session_id (str): id of the session
+            k (int): number of final recommendations
+            candidates (np.array): boolean mask of the rows that may be recommended, e.g. from filter_movies
+
+        Returns:
+            watchlist (list): ids of the movies in the watchlist
+            recommendations (list): ids of the recommended movies, best first
+        """
+        recommendations = self.recommend(session_id, k, candidates=candidates)
+        watchlist = self.watchlist(session_id)
+
+        session = self._session(session_id)
+        with session.lock:
+            if session.profile is not None:
+                self._save_snapshot(session)
+
+        with self._lock:
+            del self.sessions[session_id]
+
+        return watchlist, recommendations
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    This class answers the JSON requests of the HTTP interface of the recommendation service.
+
+    POST   /sessions                      starts a session: {"session": id, "movies": [...]},
+                                          {"profile": name} resumes and saves a profile,
+                                          {"seed": [movie ids]} starts from movies the user likes
+    GET    /search?q=star+wars&limit=10   {"movies": [...]}
+    POST   /sessions/<id>/feedback        {"movie_id": ..., "liked": ...}
+    GET    /sessions/<id>/recommend?k=1   {"movies": [...]},
+                                          &filter=genre%3DSci-Fi,year>2000 only recommends matching movies
+    GET    /sessions/<id>/watchlist       {"watchlist": [...]}
+    POST   /sessions/<id>/watchlist       {"movie_id": ...}
+    DELETE /sessions/<id>                 ends the session: {"watchlist": [...], "recommendations": [...]},
+                                          ?filter=... limits the recommendations like above
+    """
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def log_message(self, format, *args):
+        # requests are not logged to stderr
+        return None
+
+    def _handle(self, method):
+        """
+        A function to route a request to the recommendation service and send the JSON answer.
+        """
+        service = self.server.service
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+
+            if parts == ["sessions"] and method == "POST":
+                session_id, movies = service.start_session(
+                    profile=body.get("profile"), seed_movies=body.get("seed"))
+                answer = {"session": session_id, "movies": movies}
+
+            elif parts == ["search"] and method == "GET":
+                query = parse_qs(url.query)
+                answer = {"movies": service.search(query.get("q", [""])[0],
+                                                   int(query.get("limit", ["10"])[0]))}
+
+            elif len(parts) == 2 and parts[0] == "sessions" and method == "DELETE":
+                watchlist, recommendations = service.end_session(parts[1], candidates=self._candidates(url))
+                answer = {"watchlist": watchlist, "recommendations": recommendations}
+
+            elif len(parts) == 3 and parts[0] == "sessions":
+                session_id, action = parts[1], parts[2]
+
+                if action == "feedback" and method == "POST":
+                    service.feedback(session_id, int(body["movie_id"]), bool(body["liked"]))
+                    answer = {}
+
+                elif action == "recommend" and method == "GET":
+                    k = int(parse_qs(url.query).get("k", ["1"])[0])
+                    answer = {"movies": service.recommend(session_id, k, candidates=self._candidates(url))}
+
+                elif action == "watchlist" and method == "GET":
+                    answer = {"watchlist": service.watchlist(session_id)}
+
+                elif action == "watchlist" and method == "POST":
+                    service.add_to_watchlist(session_id, int(body["movie_id"]))
+                    answer = {}
+
+                else:
+                    self._send(404, {"error": "unknown endpoint"})
+                    return None
+
+            else:
+                self._send(404, {"error": "unknown endpoint"})
+                return None
+
+        except KeyError as error:
+            self._send(404, {"error": f"unknown session or missing field {error}"})
+            return None
+
+        except (ValueError, TypeError) as error:
+            self._send(400, {"error": str(error)})
+            return None
+
+        self._send(200, answer)
+
+        return None
+
+    def _candidates(self, url):
+        """
+        A function to get the candidates of the filter expression of a request, None if it has no filter.
+        """
+        expression = parse_qs(url.query).get("filter", [""])[0]
+
+        return bk.filter_movies(expression) if expression else None
+
+    def _send(self, status, answer):
+        """
+        A function to send a JSON answer.
+        """
+        data = json.dumps(answer).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+        return None
+
+
+def serve(host=SERVICE_HOST, port=SERVICE_PORT, service=None):
+    """
+    A function to run the HTTP interface of the recommendation service until it is interrupted.
+
+    Parameters:
+        host (str): address to listen on, only the local machine by default
+        port (int): port to listen on
+        service (RecommendationService): the service, a new service if not given
+
+    Returns:
+        None
+    """
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.service = service if service is not None else RecommendationService()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return None
+
+
+# run the headless service: python service.py
+if __name__ == "__main__":
+    instrumentation.configure()
+    serve()
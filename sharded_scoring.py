@@ -0,0 +1,245 @@
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import instrumentation
+from vector_store import (QuantizedSparseVectorStore, QuantizedVectorStore, SparseVectorStore,
+                          VectorStore)
+
+
+# largest number of catalog rows scored by one task of a worker process,
+# smaller catalogs are split into one shard for each worker
+SHARD_SIZE = 262144
+
+# the arrays of each kind of vector store that are placed in shared memory
+_STORE_ARRAYS = {
+    "dense": ("ids", "matrix", "norms"),
+    "sparse": ("ids", "indptr", "indices", "data", "norms"),
+    "quantized": ("ids", "matrix", "scales", "norms"),
+    "quantized_sparse": ("ids", "indptr", "indices", "data", "scales", "norms"),
+}
+
+# the state of a worker process: the attached shared memory and the stores of its shards
+_worker_memory = []
+_worker_layout = None
+_worker_shards = {}
+
+
+class ShardedScorer:
+    """
+    This class scores the catalog in parallel, split into row shards scored by a pool of worker processes.
+
+    The arrays of the vector store are copied once into shared memory, every worker attaches to them
+    without copying. A search sends every shard to the pool, each worker returns the top k of its shard
+    and the partial results are merged with the same tie rule, so the movies and their order are those of the
+    search of the vector store itself. A shard is scored as a smaller matrix, so a similarity can differ from
+    the one of the whole catalog in the last bits, and movies with scores that close can swap places.
+
+    The scorer can be used everywhere a vector store is expected, everything except search
+    is passed on to the vector store.
+
+    Variables:
+    vector_store: the movie vectors
+    workers: the number of worker processes
+    shard_size: the number of rows in a shard
+    shards: (start, end) rows of every shard
+    """
+
+    def __init__(self, vector_store, workers=None, shard_size=None):
+        """
+        The constructor for the ShardedScorer class.
+
+        Parameters:
+            vector_store (VectorStore): movie vectors
+            workers (int): number of worker processes, the number of cores if not given
+            shard_size (int): number of rows in a shard, if not given the catalog is split
+                              into at least one shard for each worker, of at most SHARD_SIZE rows
+        """
+        self.vector_store = vector_store
+        self.workers = workers or os.cpu_count() or 1
+
+        count = len(vector_store)
+        if shard_size is None:
+            shard_size = min(SHARD_SIZE, -(-count // self.workers))
+        self.shard_size = max(1, shard_size)
+
+        self.shards = [(start, min(start + self.shard_size, count))
+                       for start in range(0, count, self.shard_size)]
+
+        self._memory = []
+        layout = self._share(vector_store)
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_attach, initargs=(layout,))
+
+        atexit.register(self.close)
+
+    def __len__(self):
+        return len(self.vector_store)
+
+    def __getattr__(self, name):
+        # everything that is not about searching is answered by the vector store
+        if name == "vector_store":
+            raise AttributeError(name)
+
+        return getattr(self.vector_store, name)
+
+    def _share(self, vector_store):
+        """
+        A function to copy the arrays of the vector store into shared memory.
+
+        Parameters:
+            vector_store (VectorStore): movie vectors
+
+        Returns:
+            layout (tuple): (kind of the store, dimension, {array name: (shared memory name, dtype, shape)})
+        """
+        if isinstance(vector_store, QuantizedSparseVectorStore):
+            kind = "quantized_sparse"
+        elif isinstance(vector_store, SparseVectorStore):
+            kind = "sparse"
+        elif isinstance(vector_store, QuantizedVectorStore):
+            kind = "quantized"
+        elif isinstance(vector_store, VectorStore):
+            kind = "dense"
+        else:
+            raise TypeError(f"can not share {type(vector_store).__name__}, use a vector store")
+
+        arrays = {}
+        for name in _STORE_ARRAYS[kind]:
+            array = np.ascontiguousarray(getattr(vector_store, name))
+
+            # shared memory blocks can not be empty
+            memory = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+            self._memory.append(memory)
+
+            arrays[name] = (memory.name, array.dtype.str, array.shape)
+
+        return kind, vector_store.dimension, arrays
+
+    def search(self, uservector, k, available=None):
+        """
+        A function to find the k movies most similar to the user vector, the shards are scored in parallel.
+
+        Parameters:
+            uservector (np.array): user vector
+            k (int): number of movies to find
+            available (np.array): boolean mask of the rows that can be returned, all rows if not given
+
+        Returns:
+            rows (np.array): rows of the best movies in ranked order
+            similarity (np.array): cosine similarity of those movies
+        """
+        uservector = np.asarray(uservector, dtype=float)
+        futures = []
+
+        for start, end in self.shards:
+            # the mask of the shard is sent as bits, an eighth of its size
+            shard_available = None if available is None else np.packbits(available[start:end])
+            futures.append(self._pool.submit(
+                _search_shard, start, end, uservector, k, shard_available))
+
+        # the worker processes score and select, only the wait for them is timed here
+        with instrumentation.stage("score"):
+            results = [future.result() for future in futures]
+        instrumentation.count("rows scored", len(self))
+        rows = np.concatenate([result[0] for result in results] + [np.zeros(0, dtype=np.int64)])
+        similarity = np.concatenate([result[1] for result in results] + [np.zeros(0)])
+
+        # merge the partial results, ties keep the lower rows like select_top_k
+        order = np.lexsort((rows, -similarity))[:max(0, k)]
+
+        return rows[order], similarity[order]
+
+    def close(self):
+        """
+        A function to stop the worker processes and free the shared memory.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+        for memory in self._memory:
+            memory.close()
+            memory.unlink()
+        self._memory = []
+
+        return None
+
+
+def _attach(layout):
+    """
+    A function run once in every worker process, it attaches to the shared arrays of the vector store.
+    """
+    global _worker_layout
+
+    kind, dimension, arrays = layout
+    attached = {}
+
+    for name, (memory_name, dtype, shape) in arrays.items():
+        memory = shared_memory.SharedMemory(name=memory_name)
+        _worker_memory.append(memory)
+        attached[name] = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+    _worker_layout = (kind, dimension, attached)
+
+    return None
+
+
+def _shard_store(start, end):
+    """
+    A function to get a vector store over the rows start:end of the shared arrays, the values are not copied.
+    """
+    if (start, end) in _worker_shards:
+        return _worker_shards[(start, end)]
+
+    kind, dimension, arrays = _worker_layout
+    ids, norms = arrays["ids"][start:end], arrays["norms"][start:end]
+
+    if kind in ("dense", "quantized"):
+        matrix = arrays["matrix"][start:end]
+
+        if kind == "dense":
+            store = VectorStore(ids, matrix, norms)
+        else:
+            store = QuantizedVectorStore(ids, matrix, arrays["scales"][start:end], norms)
+
+    else:
+        indptr = arrays["indptr"][start:end + 1]
+        first, last = indptr[0], indptr[-1]
+        indices, data = arrays["indices"][first:last], arrays["data"][first:last]
+
+        if kind == "sparse":
+            store = SparseVectorStore(ids, indptr - first, indices, data, dimension, norms)
+        else:
+            store = QuantizedSparseVectorStore(ids, indptr - first, indices, data, dimension,
+                                               arrays["scales"][start:end], norms)
+
+    _worker_shards[(start, end)] = store
+
+    return store
+
+
+def _search_shard(start, end, uservector, k, available):
+    """
+    A function run in a worker process, it finds the k best movies of one shard.
+
+    Parameters:
+        start (int): first row of the shard
+        end (int): row after the last row of the shard
+        uservector (np.array): user vector
+        k (int): number of movies to find
+        available (np.array): packed bits of the rows of the shard that can be returned, or None
+
+    Returns:
+        rows (np.array): rows of the best movies of the shard (rows of the whole catalog)
+        similarity (np.array): cosine similarity of those movies
+    """
+    store = _shard_store(start, end)
+
+    if available is not None:
+        available = np.unpackbits(available, count=end - start).astype(bool)
+
+    rows, similarity = store.search(uservector, k, available)
+
+    return rows + start, similarity
@@ -0,0 +1,229 @@
+import numpy as np
+from vector_store import check_vocabulary
+
+
+# how many rows of the catalog are scored against the whole catalog at once
+SIMILARITY_BLOCK_SIZE = 512
+
+
+class SimilarityTable:
+    """
+    This class holds the precomputed nearest neighbours of every movie.
+    Each movie has one row with the ids of its most similar movies and their cosine similarities, best first.
+
+    Variables:
+    ids: an array of movie ids, one for each row
+    neighbours: a 2D array of the ids of the most similar movies (int32)
+    scores: a 2D array of the cosine similarities of those movies (float32)
+    id_to_row: an array mapping a movie id to its row (-1 for unknown movie ids)
+    """
+
+    def __init__(self, ids, neighbours, scores):
+        """
+        The constructor for the SimilarityTable class.
+
+        Parameters:
+            ids (np.array): movie ids, one for each row
+            neighbours (np.array): ids of the most similar movies for each row
+            scores (np.array): cosine similarities of the most similar movies for each row
+        """
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.neighbours = np.asarray(neighbours, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+
+        self._build_id_index()
+
+    def _build_id_index(self):
+        """
+        A function to build the id -> row lookup array.
+        """
+        size = int(self.ids.max()) + 1 if len(self.ids) else 1
+        self.id_to_row = np.full(size, -1, dtype=np.int64)
+        self.id_to_row[self.ids] = np.arange(len(self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, movie_id, n):
+        """
+        A function to get the most similar movies of one movie.
+
+        Parameters:
+            movie_id (int): id of the movie
+            n (int): number of similar movies, at most the number stored in the table
+
+        Returns:
+            movie_ids (np.array): ids of the most similar movies, best first (empty for unknown movie ids)
+            scores (np.array): cosine similarities of those movies
+        """
+        if not 0 <= movie_id < len(self.id_to_row) or self.id_to_row[movie_id] < 0:
+            return self.neighbours[:0, 0], self.scores[:0, 0]
+
+        row = self.id_to_row[movie_id]
+
+        return self.neighbours[row, :n], self.scores[row, :n]
+
+    def update(self, keep, vector_store):
+        """
+        A function to follow the rows of the vector store after movies were removed and added, in place.
+
+        The new movies are scored against the catalog once: they get rows of their own and take the place
+        of worse neighbours in the rows of the other movies. Only the movies that lost a neighbour
+        are scored against the catalog again. The similarities of the other movies are kept,
+        even if the idf of some of their terms has changed a little.
+
+        Parameters:
+            keep (np.array): boolean mask of the rows before the update that are kept
+            vector_store (VectorStore): the movie vectors after the update, the new movies come after the kept rows
+
+        Returns:
+            None
+        """
+        n = self.neighbours.shape[1]
+        kept = int(keep.sum())
+        added_rows = np.arange(kept, len(vector_store))
+
+        neighbours = self.neighbours[keep]
+        scores = self.scores[keep]
+        stale = np.flatnonzero(np.isin(neighbours, self.ids[~keep]).any(axis=1))
+
+        if len(added_rows) and n:
+            # the new movies compete with the neighbours the kept movies already have, ties keep the old ones
+            added_ids = np.broadcast_to(vector_store.ids[added_rows].astype(np.int32), (kept, len(added_rows)))
+            candidates = np.concatenate((neighbours, added_ids), axis=1)
+            candidate_scores = np.concatenate((scores, _similarities(vector_store, added_rows).T[:kept]), axis=1)
+            order = np.argsort(-candidate_scores, axis=1, kind="stable")[:, :n]
+
+            neighbours = np.take_along_axis(candidates, order, axis=1)
+            scores = np.take_along_axis(candidate_scores, order, axis=1).astype(np.float32)
+
+        self.ids = vector_store.ids.astype(np.int32)
+        self.neighbours = np.concatenate((neighbours, np.zeros((len(added_rows), n), dtype=np.int32)))
+        self.scores = np.concatenate((scores, np.zeros((len(added_rows), n), dtype=np.float32)))
+
+        rows = np.concatenate((stale, added_rows))
+        self.neighbours[rows], self.scores[rows] = _nearest(vector_store, rows, n)
+        self._build_id_index()
+
+        return None
+
+
+def _similarities(vector_store, rows):
+    """
+    A function to calculate the cosine similarity of some movies with every movie.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        rows (np.array): rows of the movies
+
+    Returns:
+        similarity (np.array): 2D array with one row for each of the movies and one column for each movie
+    """
+    # similarities of the movies with every movie, one column for each of the movies
+    dot_products = vector_store.dot_products_of_rows(rows)
+    magnitudes = np.outer(vector_store.norms, vector_store.norms[rows])
+    similarity = np.zeros(dot_products.shape, dtype=float)
+    np.divide(dot_products, magnitudes, out=similarity,
+              where=magnitudes != 0)
+
+    return similarity.T
+
+
+def _nearest(vector_store, rows, n, block_size=SIMILARITY_BLOCK_SIZE):
+    """
+    A function to find the n most similar movies of some movies, block by block.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        rows (np.array): rows of the movies
+        n (int): number of similar movies of each movie
+        block_size (int): number of movies scored at once
+
+    Returns:
+        neighbours (np.array): ids of the most similar movies for each of the rows, best first
+        scores (np.array): cosine similarities of the most similar movies
+    """
+    neighbours = np.zeros((len(rows), n), dtype=np.int32)
+    scores = np.zeros((len(rows), n), dtype=np.float32)
+
+    if n == 0:
+        return neighbours, scores
+
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        similarity = _similarities(vector_store, block)
+
+        # a movie is not its own neighbour
+        similarity[np.arange(len(block)), block] = -np.inf
+
+        # partial selection of the n best rows, then sort them, ties keep the lower rows
+        best = np.sort(np.argpartition(-similarity, n - 1, axis=1)[:, :n], axis=1)
+        best_scores = np.take_along_axis(similarity, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+
+        neighbours[start:start + block_size] = vector_store.ids[np.take_along_axis(best, order, axis=1)]
+        scores[start:start + block_size] = np.take_along_axis(best_scores, order, axis=1)
+
+    return neighbours, scores
+
+
+def build_similarity_table(vector_store, n, block_size=SIMILARITY_BLOCK_SIZE):
+    """
+    A function to find the n most similar movies of every movie in the vector store.
+
+    The catalog is scored against itself in blocks of rows, so only a block_size x catalog size
+    matrix of similarities exists at a time.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors
+        n (int): number of similar movies kept for each movie
+        block_size (int): number of movies scored at once
+
+    Returns:
+        similarity_table (SimilarityTable): the nearest neighbours of every movie
+    """
+    count = len(vector_store)
+    n = max(0, min(n, count - 1))
+
+    neighbours, scores = _nearest(vector_store, np.arange(count), n, block_size)
+
+    return SimilarityTable(vector_store.ids, neighbours, scores)
+
+
+def save_similarity_table(path, similarity_table, vocabulary=""):
+    """
+    A function to save the nearest neighbours of every movie to a numpy file.
+
+    Parameters:
+        path (str): path to the file
+        similarity_table (SimilarityTable): the nearest neighbours of every movie
+        vocabulary (str): fingerprint of the vocabulary of the movie vectors, see vocabulary_fingerprint
+
+    Returns:
+        None
+    """
+    with open(path, "wb") as table_file:
+        np.savez(table_file, ids=similarity_table.ids,
+                 neighbours=similarity_table.neighbours,
+                 scores=similarity_table.scores, vocabulary=vocabulary)
+
+    return None
+
+
+def load_similarity_table(path, vocabulary=""):
+    """
+    A function to load the nearest neighbours of every movie from a numpy file.
+
+    Parameters:
+        path (str): path to the file
+        vocabulary (str): fingerprint of the vocabulary in use, a ValueError is raised if the table has another one
+
+    Returns:
+        similarity_table (SimilarityTable): the nearest neighbours of every movie
+    """
+    with np.load(path) as table_file:
+        # tables saved before the fingerprints were kept have none
+        check_vocabulary(path, str(table_file["vocabulary"]) if "vocabulary" in table_file else "", vocabulary)
+
+        return SimilarityTable(table_file["ids"], table_file["neighbours"],
+                               table_file["scores"])
@@ -0,0 +1,90 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend as bk
+from test_scoring import TOLERANCES, random_store
+from vector_store import SparseVectorStore, VectorStore, convert_precision, select_top_k
+
+
+def tied_store(sparse, precision, copies=3):
+    """
+    A function to build a catalog where every movie vector appears copies times in a row, so scores tie.
+    """
+    vector_store = random_store(False, "float64", count=40, dimension=12)
+    matrix = np.repeat(vector_store.matrix, copies, axis=0)
+    ids = np.arange(1, len(matrix) + 1)
+
+    if sparse:
+        indptr = np.concatenate(([0], np.cumsum(np.count_nonzero(matrix, axis=1))))
+        rows, indices = np.nonzero(matrix)
+        vector_store = SparseVectorStore(ids, indptr, indices, matrix[rows, indices], matrix.shape[1])
+    else:
+        vector_store = VectorStore(ids, matrix)
+
+    return convert_precision(vector_store, precision)
+
+
+def max_k_times(scores, k, available):
+    """
+    A function to pick the best row k times, np.argmax returns the lowest row of tied scores.
+    """
+    scores = np.where(available, scores, -np.inf)
+    rows = []
+    for _ in range(min(k, int(available.sum()))):
+        rows.append(int(np.argmax(scores)))
+        scores[rows[-1]] = -np.inf
+
+    return np.array(rows, dtype=np.int64)
+
+
+@pytest.mark.parametrize("k", [1, 4, 10, 50])
+@pytest.mark.parametrize("masked", [False, True], ids=["all", "masked"])
+def test_select_top_k_breaks_ties_by_lower_row(k, masked):
+    generator = np.random.default_rng(k)
+    # few distinct values, so there are ties inside the top k and at its border
+    scores = generator.integers(0, 5, 40).astype(float)
+    available = generator.random(40) < 0.6 if masked else np.ones(40, dtype=bool)
+
+    rows, picked = select_top_k(scores, k, available if masked else None)
+
+    np.testing.assert_array_equal(rows, max_k_times(scores, k, available))
+    np.testing.assert_array_equal(picked, scores[rows])
+
+
+@pytest.mark.parametrize("sparse", [False, True], ids=["dense", "sparse"])
+@pytest.mark.parametrize("precision", ["float64", "float32", "int8"])
+def test_top_k_ranks_tied_movies_by_lower_row(precision, sparse):
+    vector_store = tied_store(sparse, precision)
+    user_vector = vector_store.vector(7) + vector_store.vector(50)
+
+    movie_ids, similarity = bk.top_k(user_vector, 9, exclude=[8], vector_store=vector_store)
+
+    available = np.ones(len(vector_store), dtype=bool)
+    available[vector_store.rows([8])] = False
+    expected = vector_store.ids[max_k_times(vector_store.scores(user_vector), 9, available)]
+    np.testing.assert_array_equal(movie_ids, expected)
+    assert 8 not in movie_ids and np.all(np.diff(similarity) <= 0)
+
+
+@pytest.mark.parametrize("sparse", [False, True], ids=["dense", "sparse"])
+@pytest.mark.parametrize("precision", ["float64", "float32", "int8"])
+@pytest.mark.parametrize("events", [1, 12, bk.FEEDBACK_BATCH_SIZE + 5])
+def test_feedback_batch_matches_sequential_feedback(events, precision, sparse):
+    vector_store = random_store(sparse, precision)
+    generator = np.random.default_rng(events)
+    # the same movie more than once, and an unknown movie id that counts as a zero vector
+    feedback = list(zip(generator.choice(vector_store.ids, events).tolist(),
+                        (generator.random(events) < 0.7).tolist()))
+    feedback[-1] = (2, feedback[-1][1])
+
+    user_vector = np.zeros(vector_store.dimension)
+    for movie_id, liked in feedback:
+        user_vector = bk.handle_feedback(vector_store, user_vector, liked, movie_id)
+
+    batched = bk.handle_feedback_batch(vector_store, np.zeros(vector_store.dimension), feedback)
+
+    np.testing.assert_allclose(batched, user_vector, atol=TOLERANCES["float64"])
@@ -0,0 +1,29 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from build_pipeline import build_catalog
+
+
+METADATA_FILE = os.path.join(ROOT, "additional_data", "movie_metadata.csv")
+
+
+@pytest.fixture(scope="module")
+def built_directory(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("catalog")
+    build_catalog(METADATA_FILE, str(directory), text=True)
+    return directory
+
+
+# a build from movie_metadata.csv reproduces the shipped data byte for byte
+@pytest.mark.parametrize("name", ["vector_info.csv", "A_complete_data.csv", "normalized_vectors.csv"])
+def test_build_reproduces_shipped_data(built_directory, name):
+    shipped = os.path.join(ROOT, "main_data", name)
+    if not os.path.exists(shipped):
+        pytest.skip(f"{name} is generated, see README")
+
+    with open(shipped, "rb") as shipped_file, open(built_directory / name, "rb") as built_file:
+        assert built_file.read() == shipped_file.read()
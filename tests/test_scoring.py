@@ -0,0 +1,120 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring import ScoreTracker, SimilarityCache
+from vector_store import SparseVectorStore, VectorStore, convert_precision
+
+
+# largest difference from a full recompute that is accepted for each precision
+TOLERANCES = {"float64": 1e-9, "float32": 1e-5, "int8": 1e-5}
+
+
+def random_store(sparse, precision, count=300, dimension=40, seed=0):
+    """
+    A function to build a small catalog of normalized tf-idf-like vectors, most of the weights are zero.
+    """
+    generator = np.random.default_rng(seed)
+    matrix = generator.random((count, dimension)) * (generator.random((count, dimension)) < 0.2)
+    matrix[np.arange(count), generator.integers(0, dimension, count)] += 1.0
+    matrix /= np.linalg.norm(matrix, axis=1)[:, np.newaxis]
+    ids = np.arange(1, 2 * count, 2)
+
+    if sparse:
+        indptr = np.concatenate(([0], np.cumsum(np.count_nonzero(matrix, axis=1))))
+        rows, indices = np.nonzero(matrix)
+        vector_store = SparseVectorStore(ids, indptr, indices, matrix[rows, indices], dimension)
+    else:
+        vector_store = VectorStore(ids, matrix)
+
+    return convert_precision(vector_store, precision)
+
+
+def full_scores(vector_store, user_vector):
+    """
+    A function to score the catalog from scratch: the dot products divided by |u| and the norms of the movies.
+    """
+    return vector_store.scores(user_vector)
+
+
+@pytest.mark.parametrize("sparse", [False, True], ids=["dense", "sparse"])
+@pytest.mark.parametrize("precision", ["float64", "float32", "int8"])
+def test_tracker_follows_full_recompute(precision, sparse):
+    vector_store = random_store(sparse, precision)
+    tolerance = TOLERANCES[precision]
+
+    # room for two similarity rows, so the third movie evicts the first one
+    row_bytes = vector_store.dot_products(np.zeros(vector_store.dimension)).nbytes
+    cache = SimilarityCache(max_bytes=2 * row_bytes)
+    tracker = ScoreTracker(vector_store, cache=cache)
+
+    feedback = [(1, True), (3, False), (5, True), (7, True), (9, False)]
+    for movie_id, liked in feedback:
+        tracker.apply_feedback(movie_id, liked)
+        assert np.abs(tracker.scores() - full_scores(vector_store, tracker.user_vector)).max() <= tolerance
+
+    assert len(cache) == 2 and cache.size <= cache.max_bytes
+    assert 1 not in cache.rows
+
+    # a cached row is updated incrementally, the evicted one scores the whole catalog again
+    recomputes = tracker.full_recomputes
+    tracker.apply_feedback(9, True)
+    assert tracker.full_recomputes == recomputes and cache.hits == 1
+    tracker.apply_feedback(1, False)
+    assert tracker.full_recomputes == recomputes + 1 and cache.misses == len(feedback) + 1
+    assert tracker.check_consistency() <= tolerance
+
+    # many incremental updates in a row, then a resync brings back the exact scores
+    for movie_id in [9, 1, 9, 1, 9, 1, 9, 1]:
+        tracker.apply_feedback(movie_id, movie_id == 9)
+    assert tracker.check_consistency() <= tolerance
+
+    tracker.resync()
+    assert tracker.full_recomputes == recomputes + 2
+    np.testing.assert_array_equal(tracker.scores(), full_scores(vector_store, tracker.user_vector))
+
+
+def test_tracker_state_after_feedback_cancels_out():
+    vector_store = random_store(False, "float64")
+    tracker = ScoreTracker(vector_store, cache=SimilarityCache())
+
+    # a dislike of the only liked movie brings the user vector back to zero, every score is then 0
+    tracker.apply_feedback(1, True)
+    tracker.apply_feedback(1, False)
+
+    assert not tracker.user_vector.any()
+    assert not tracker.scores().any()
+    assert tracker.check_consistency() == 0.0
+
+
+@pytest.mark.parametrize("change", ["reweight_rows", "set_rows"])
+def test_tracker_follows_rows_changed_in_place(change):
+    vector_store = random_store(True, "float64")
+    cache = SimilarityCache()
+    tracker = ScoreTracker(vector_store, cache=cache)
+
+    for movie_id, liked in [(1, True), (3, False), (1, True)]:
+        tracker.apply_feedback(movie_id, liked)
+    speculative = tracker.updated(5, True)
+    assert len(cache) == 3
+
+    # like Catalog.update: new weights for some rows, or the last movies removed
+    if change == "reweight_rows":
+        vector_store.reweight_rows(np.arange(0, 300, 7), np.linspace(0.5, 2.0, vector_store.dimension))
+    else:
+        rows = len(vector_store) - 20
+        vector_store.set_rows(vector_store.ids[:rows], vector_store.indptr[:rows + 1],
+                              vector_store.indices[:vector_store.indptr[rows]],
+                              vector_store.data[:vector_store.indptr[rows]])
+
+    # the cached rows are dropped and the scores follow the new rows, also those of a state computed before
+    np.testing.assert_allclose(tracker.scores(), full_scores(vector_store, tracker.user_vector), atol=1e-12)
+    assert len(cache) == 0
+    np.testing.assert_allclose(tracker.scores(speculative), full_scores(vector_store, speculative[0]), atol=1e-12)
+
+    tracker.set_state(speculative)
+    tracker.apply_feedback(3, True)
+    assert tracker.check_consistency() <= TOLERANCES["float64"]
@@ -0,0 +1,53 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sharded_scoring import ShardedScorer
+from test_backend import tied_store
+from test_scoring import TOLERANCES, random_store
+
+
+@pytest.mark.parametrize("sparse", [False, True], ids=["dense", "sparse"])
+@pytest.mark.parametrize("precision", ["float64", "int8"])
+@pytest.mark.parametrize("shard_size", [None, 7])
+def test_sharded_search_matches_single_process(shard_size, precision, sparse):
+    vector_store = random_store(sparse, precision)
+    scorer = ShardedScorer(vector_store, workers=2, shard_size=shard_size)
+    generator = np.random.default_rng(0)
+
+    try:
+        # without a shard size the catalog is split into a shard for each worker, the shards cover every row
+        assert len(scorer.shards) >= 2
+        assert scorer.shards[0][0] == 0 and scorer.shards[-1][1] == len(vector_store)
+
+        for k in [1, 10, 400]:
+            user_vector = vector_store.vector(1) - vector_store.vector(9) + generator.random(vector_store.dimension)
+            available = generator.random(len(vector_store)) < 0.5
+
+            for mask in [None, available]:
+                rows, similarity = scorer.search(user_vector, k, mask)
+                expected_rows, expected_similarity = vector_store.search(user_vector, k, mask)
+                # a shard is scored as a smaller matrix, the similarities can differ in the last bits
+                np.testing.assert_array_equal(rows, expected_rows)
+                np.testing.assert_allclose(similarity, expected_similarity, atol=TOLERANCES[precision])
+    finally:
+        scorer.close()
+
+
+def test_sharded_search_keeps_tie_order_across_shards():
+    # each vector appears three times in a row, shards of 4 rows split the ties
+    vector_store = tied_store(True, "float64")
+    scorer = ShardedScorer(vector_store, workers=2, shard_size=4)
+
+    try:
+        user_vector = vector_store.vector(4) + vector_store.vector(20)
+        rows, similarity = scorer.search(user_vector, 12)
+        expected_rows, expected_similarity = vector_store.search(user_vector, 12)
+    finally:
+        scorer.close()
+
+    np.testing.assert_array_equal(rows, expected_rows)
+    np.testing.assert_allclose(similarity, expected_similarity, atol=TOLERANCES["float64"])
@@ -0,0 +1,178 @@
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+
+# columns of the movie data that can be searched, and how much a match in each of them counts
+SEARCH_FIELDS = ("title", "actor", "director", "keywords")
+FIELD_WEIGHTS = {"title": 3, "actor": 2, "director": 2, "keywords": 1}
+
+_TOKEN = re.compile(r"\w+")
+# a character after every other character, the end of the range of tokens that start with a prefix
+_LAST_CHARACTER = "\U0010ffff"
+
+
+def normalize_tokens(text):
+    """
+    A function to split a text into normalized tokens: lower case, without accents, letters and digits only.
+
+    Parameters:
+        text (str): the text, e.g. a title or a name
+
+    Returns:
+        tokens (list): the tokens, e.g. ["amelie"] for "Amélie"
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(character for character in text if not unicodedata.combining(character))
+
+    return _TOKEN.findall(text)
+
+
+class TextIndex:
+    """
+    This class is an inverted index over the titles, keywords, actors and directors of the movies.
+
+    Every field has a sorted list of its tokens and the rows of the movies with each token, one array
+    of rows for all tokens in the order of the tokens (like the rows of a csr matrix).
+    A token is found with a binary search, and since the tokens are sorted, the rows of all tokens
+    with a prefix are one slice of the array, so a prefix search costs the same as an exact one.
+    The rows are ordered by the IMDb score of the movies, best first, so the matches are ranked
+    just by sorting their rows.
+
+    Variables:
+    ids: an array of movie ids, one for each row, the movie with the best IMDb score first
+    fields: (tokens, offsets, rows) by field name, the rows of the i-th token are rows[offsets[i]:offsets[i + 1]]
+    """
+
+    def __init__(self, ids, fields):
+        """
+        The constructor for the TextIndex class.
+
+        Parameters:
+            ids (np.array): movie ids, one for each row
+            fields (dict): (tokens, offsets, rows) by field name
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.fields = fields
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _token_rows(self, field, token, prefix):
+        """
+        A function to find the rows with a token, or with any token that starts with it.
+        """
+        tokens, offsets, rows = self.fields[field]
+
+        start = bisect_left(tokens, token)
+        end = bisect_left(tokens, token + _LAST_CHARACTER) if prefix else bisect_right(tokens, token)
+
+        if end - start == 1:
+            return rows[offsets[start]:offsets[end]]
+
+        return np.unique(rows[offsets[start]:offsets[end]])
+
+    def match(self, field, query, prefix=True):
+        """
+        A function to find the movies with every token of the query in one field.
+
+        Parameters:
+            field (str): "title", "actor", "director" or "keywords"
+            query (str): the text that is looked up, e.g. "tom hanks"
+            prefix (bool): whether the last token of the query only has to start a token, e.g. "star wa"
+
+        Returns:
+            rows (np.array): the rows of the movies, ascending, so the best IMDb score first
+        """
+        tokens = normalize_tokens(query)
+        if not tokens:
+            return np.zeros(0, dtype=np.int32)
+
+        rows = self._token_rows(field, tokens[-1], prefix)
+        for token in tokens[:-1]:
+            rows = np.intersect1d(rows, self._token_rows(field, token, False), assume_unique=True)
+
+        return rows
+
+    def search(self, query, limit=10, fields=SEARCH_FIELDS, prefix=True):
+        """
+        A function to find movies by title, actor, director or keyword.
+        Matches in the title come first, then matches of actors and directors, then of keywords,
+        the matches of equal weight are ordered by their IMDb score.
+        The fields with less weight are only searched if the better fields have too few matches.
+
+        Parameters:
+            query (str): the text that is looked up
+            limit (int): the number of movies to return
+            fields (tuple): the fields that are searched
+            prefix (bool): whether the last token of the query only has to start a token
+
+        Returns:
+            movie_ids (np.array): the ids of the movies, best first
+        """
+        found = np.zeros(0, dtype=np.int32)
+
+        for weight in sorted({FIELD_WEIGHTS[field] for field in fields}, reverse=True):
+            matches = [self.match(field, query, prefix) for field in fields if FIELD_WEIGHTS[field] == weight]
+            rows = np.unique(np.concatenate(matches))
+
+            # a movie is only listed once, with its best match
+            rows = rows[~np.isin(rows, found)]
+            found = np.concatenate((found, rows[:limit - len(found)]))
+
+            if len(found) >= limit:
+                break
+
+        return self.ids[found]
+
+
+def _field_values(movie_data, field):
+    """
+    A function to get the strings of a field of every movie, the keywords are split into single keywords.
+    """
+    column = movie_data.columns[field]
+    values = [column[row] for row in range(len(movie_data))]
+
+    if field == "keywords":
+        return [value.replace("|", " ") for value in values]
+
+    return values
+
+
+def build_text_index(movie_data):
+    """
+    A function to build the inverted index from the columns of the movie data (A_complete_data.csv).
+
+    Parameters:
+        movie_data (MovieData): the movie data
+
+    Returns:
+        text_index (TextIndex): the inverted index
+    """
+    # the rows of the index are ordered by IMDb score, ranking gives the row of the movie data of each of them
+    ranking = np.lexsort((movie_data.ids, -movie_data.columns["imdb"]))
+
+    fields = {}
+
+    for field in SEARCH_FIELDS:
+        # the rows of every token, a value that repeats (e.g. a director) is tokenized only once
+        postings = {}
+        value_tokens = {}
+        values = _field_values(movie_data, field)
+        for row, data_row in enumerate(ranking.tolist()):
+            value = values[data_row]
+            if value not in value_tokens:
+                value_tokens[value] = set(normalize_tokens(value))
+            for token in value_tokens[value]:
+                postings.setdefault(token, []).append(row)
+
+        tokens = sorted(postings)
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[token]) for token in tokens])
+        rows = np.fromiter((row for token in tokens for row in postings[token]), dtype=np.int32,
+                           count=int(offsets[-1]))
+
+        fields[field] = (tokens, offsets, rows)
+
+    return TextIndex(movie_data.ids[ranking], fields)
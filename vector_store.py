@@ -0,0 +1,1072 @@
+import csv
+import hashlib
+import struct
+import numpy as np
+import instrumentation
+
+
+# binary vector file layout: header, movie ids (int32), norms (float64), then the raw matrix
+# sparse files have the csr arrays instead of the matrix: indptr (int64), indices (int32) and data
+BINARY_MAGIC = b"MVEC"
+SPARSE_BINARY_MAGIC = b"MVCS"
+BINARY_VERSION = 2
+BINARY_HEADER = struct.Struct("<4sI8sQQ16s")
+BINARY_ALIGNMENT = 64
+# the header of version 1 files, they were saved without the fingerprint of the vocabulary
+BINARY_HEADER_V1 = struct.Struct("<4sI8sQQ")
+
+# precisions the values of a vector store can be kept in
+PRECISIONS = ("float64", "float32", "int8")
+# number of int8 rows converted to float32 at once while scoring
+QUANTIZED_BLOCK_SIZE = 65536
+# a search scores only the available rows if they are at most this fraction of the catalog,
+# e.g. after an attribute filter, gathering more rows is slower than scoring the whole catalog
+SELECTIVE_SEARCH_FRACTION = 0.25
+
+
+class VectorStore:
+    """
+    This class holds all movie vectors in memory as one contiguous matrix.
+    It is meant to be loaded once at startup and then shared by every call that needs the movie vectors.
+
+    Variables:
+    ids: an array of movie ids, one for each row of the matrix
+    matrix: a 2D array, where each row is a movie vector
+    norms: an array of precomputed magnitudes of the movie vectors
+    id_to_row: an array mapping a movie id to its row in the matrix (-1 for unknown movie ids)
+    version: the number of times the rows were changed in place, the rows of this store never change
+    """
+
+    # what was computed from the rows (cached similarity rows, the scores of a session) is only valid
+    # for the version it was computed with
+    version = 0
+
+    def __init__(self, ids, matrix, norms=None):
+        """
+        The constructor for the VectorStore class.
+
+        Parameters:
+            ids (np.array): movie ids, one for each row of the matrix
+            matrix (np.array): 2D array of movie vectors (float64 or float32), a memory-mapped array is used without copying
+            norms (np.array): precomputed magnitudes of the movie vectors, calculated if not given
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.matrix = _float_values(matrix)
+
+        if norms is None:
+            norms = np.linalg.norm(self.matrix, axis=1)
+        self.norms = np.asarray(norms, dtype=float)
+
+        self._build_id_index()
+
+    def _build_id_index(self):
+        """
+        A function to build the id -> row lookup array.
+        """
+        # movie ids are small positive integers, so a plain array is enough for the id -> row lookup
+        size = int(self.ids.max()) + 1 if len(self.ids) else 1
+        self.id_to_row = np.full(size, -1, dtype=np.int64)
+        self.id_to_row[self.ids] = np.arange(len(self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dimension(self):
+        """
+        The dimension of the movie vectors.
+        """
+        return self.matrix.shape[1]
+
+    def rows(self, movie_ids):
+        """
+        A function to find the matrix rows of the given movie ids.
+
+        Parameters:
+            movie_ids (iterable): movie ids
+
+        Returns:
+            rows (np.array): matrix rows of the movie ids, -1 for unknown movie ids
+        """
+        movie_ids = np.fromiter(movie_ids, dtype=np.int64)
+        rows = np.full(len(movie_ids), -1, dtype=np.int64)
+
+        known = (movie_ids >= 0) & (movie_ids < len(self.id_to_row))
+        rows[known] = self.id_to_row[movie_ids[known]]
+
+        return rows
+
+    def vector(self, movie_id):
+        """
+        A function to get the vector of one movie.
+
+        Parameters:
+            movie_id (int): id of the movie
+
+        Returns:
+            vector (np.array): the movie vector, or a zero vector if the movie id is unknown
+        """
+        row = self.rows([movie_id])[0]
+
+        if row < 0:
+            return np.zeros(self.dimension, dtype=float)
+
+        return np.array(self.matrix[row], dtype=float)
+
+    def vectors(self, movie_ids):
+        """
+        A function to get the vectors of several movies at once.
+
+        Parameters:
+            movie_ids (iterable): ids of the movies
+
+        Returns:
+            vectors (np.array): 2D array with one movie vector per row, zero rows for unknown movie ids
+        """
+        rows = self.rows(movie_ids)
+        vectors = np.zeros((len(rows), self.dimension), dtype=float)
+
+        known = rows >= 0
+        vectors[known] = self.matrix[rows[known]]
+
+        return vectors
+
+    def dot_products(self, vectors):
+        """
+        A function to calculate the dot products of every movie vector with the given vector(s).
+
+        Parameters:
+            vectors (np.array): one vector, or a 2D array with one vector per column
+
+        Returns:
+            dot_products (np.array): dot products for each row of the matrix (and each column of vectors)
+        """
+        return self.matrix @ np.asarray(vectors, dtype=self.matrix.dtype)
+
+    def scores(self, uservector):
+        """
+        A function to calculate the cosine similarity between the user vector and every movie vector.
+        All movies are scored with one matrix-vector product, the norms of the movie vectors are precomputed.
+
+        Parameters:
+            uservector (np.array): user vector
+
+        Returns:
+            similarity (np.array): cosine similarity for each row of the matrix
+        """
+        return self.cosine(self.dot_products(uservector), uservector)
+
+    def search(self, uservector, k, available=None):
+        """
+        A function to find the k movies most similar to the user vector.
+
+        Parameters:
+            uservector (np.array): user vector
+            k (int): number of movies to find
+            available (np.array): boolean mask of the rows that can be returned, all rows if not given
+
+        Returns:
+            rows (np.array): rows of the best movies in ranked order
+            similarity (np.array): cosine similarity of those movies
+        """
+        if available is not None:
+            rows = np.flatnonzero(available)
+
+            # only a few rows are available, score just those rows
+            if len(rows) <= len(self) * SELECTIVE_SEARCH_FRACTION:
+                with instrumentation.stage("score"):
+                    scores = self.row_scores(rows, uservector)
+                instrumentation.count("rows scored", len(rows))
+
+                with instrumentation.stage("select"):
+                    picked, similarity = select_top_k(scores, k)
+                return rows[picked], similarity
+
+        with instrumentation.stage("score"):
+            scores = self.scores(uservector)
+        instrumentation.count("rows scored", len(self))
+
+        with instrumentation.stage("select"):
+            return select_top_k(scores, k, available)
+
+    def cosine(self, dot_products, uservector, rows=None):
+        """
+        A function to turn dot products with the user vector into cosine similarities.
+
+        Parameters:
+            dot_products (np.array): dot product of the user vector with each movie vector
+            uservector (np.array): user vector
+            rows (np.array): rows the dot products belong to, all rows if not given
+
+        Returns:
+            similarity (np.array): cosine similarity for each row
+        """
+        norms = self.norms if rows is None else self.norms[rows]
+        magnitudes = norms * np.linalg.norm(uservector)
+
+        # movies (or users) with a zero vector have a similarity of 0
+        similarity = np.zeros(len(magnitudes), dtype=float)
+        np.divide(dot_products, magnitudes, out=similarity,
+                  where=magnitudes != 0)
+
+        return similarity
+
+    def row_dot_products(self, rows, vectors):
+        """
+        A function to calculate the dot products of only some movie vectors with the given vector(s).
+
+        Parameters:
+            rows (np.array): rows of the movie vectors
+            vectors (np.array): one vector, or a 2D array with one vector per column
+
+        Returns:
+            dot_products (np.array): dot products for each of the rows (and each column of vectors)
+        """
+        return self.matrix[rows] @ np.asarray(vectors, dtype=self.matrix.dtype)
+
+    def row_scores(self, rows, uservector):
+        """
+        A function to calculate the cosine similarity between the user vector and only some movie vectors.
+
+        Parameters:
+            rows (np.array): rows of the movie vectors
+            uservector (np.array): user vector
+
+        Returns:
+            similarity (np.array): cosine similarity for each of the rows
+        """
+        return self.cosine(self.row_dot_products(rows, uservector), uservector, rows)
+
+    def dot_products_of_rows(self, rows):
+        """
+        A function to calculate the dot products of every movie vector with the vectors of some movies.
+
+        Parameters:
+            rows (np.array): rows of the movies
+
+        Returns:
+            dot_products (np.array): 2D array with one row for each movie and one column for each of the rows
+        """
+        return self.dot_products(self.vectors(self.ids[rows]).T)
+
+
+class SparseVectorStore(VectorStore):
+    """
+    This class holds all movie vectors in memory in the compressed sparse row (CSR) format.
+    A movie only has a few genres, keywords, one actor and one director, so almost all values of a vector are zeros.
+    Only the non-zero values are kept, memory and scoring time grow with their count, not with the vocabulary size.
+
+    Variables:
+    ids: an array of movie ids, one for each row
+    indptr: an array where the values of row i are data[indptr[i]:indptr[i + 1]]
+    indices: an array of term indices (columns) of the non-zero values
+    data: an array of the non-zero values
+    norms: an array of precomputed magnitudes of the movie vectors
+    id_to_row: an array mapping a movie id to its row (-1 for unknown movie ids)
+    version: the number of times the rows were changed in place by set_rows or reweight_rows
+    """
+
+    def __init__(self, ids, indptr, indices, data, dimension, norms=None):
+        """
+        The constructor for the SparseVectorStore class.
+
+        Parameters:
+            ids (np.array): movie ids, one for each row
+            indptr (np.array): row pointers into indices and data
+            indices (np.array): term indices of the non-zero values
+            data (np.array): the non-zero values (float64 or float32), a memory-mapped array is used without copying
+            dimension (int): the dimension of the movie vectors
+            norms (np.array): precomputed magnitudes of the movie vectors, calculated if not given
+        """
+        self._dimension = int(dimension)
+        self.set_rows(ids, indptr, indices, data, norms)
+        self.version = 0
+
+    def set_rows(self, ids, indptr, indices, data, norms=None):
+        """
+        A function to replace all rows of the store in place, e.g. after movies were added or removed.
+        Everything that holds the store (an index, a session) sees the new rows,
+        the version tells the holders that what they computed from the old rows is stale.
+
+        Parameters:
+            ids (np.array): movie ids, one for each row
+            indptr (np.array): row pointers into indices and data
+            indices (np.array): term indices of the non-zero values
+            data (np.array): the non-zero values (float64 or float32)
+            norms (np.array): precomputed magnitudes of the movie vectors, calculated if not given
+
+        Returns:
+            None
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = _float_values(data)
+
+        # np.add.reduceat can not handle empty rows, so only the rows with values are summed up
+        self._filled_rows = np.flatnonzero(np.diff(self.indptr))
+        self._filled_starts = self.indptr[self._filled_rows]
+
+        if norms is None:
+            norms = np.sqrt(self._row_sums(np.square(self.data, dtype=float)))
+        self.norms = np.asarray(norms, dtype=float)
+
+        self._build_id_index()
+        self.version += 1
+
+        return None
+
+    def reweight_rows(self, rows, column_weights):
+        """
+        A function to give every non-zero value of some rows the weight of its column
+        and normalize those rows again, in place. The other rows are not touched.
+
+        Parameters:
+            rows (np.array): rows that are reweighted
+            column_weights (np.array): the weight of each column, e.g. the idf of its term
+
+        Returns:
+            None
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        output_rows, positions = self._positions(rows)
+        values = np.asarray(column_weights, dtype=float)[self.indices[positions]]
+
+        # zero vectors stay zero
+        magnitudes = np.sqrt(np.bincount(output_rows, np.square(values), minlength=len(rows)))
+        values = np.divide(values, magnitudes[output_rows], out=np.zeros(len(values)),
+                           where=magnitudes[output_rows] != 0)
+
+        self.data[positions] = values
+        self.norms[rows] = np.sqrt(np.bincount(output_rows, np.square(values), minlength=len(rows)))
+        self.version += 1
+
+        return None
+
+    @property
+    def dimension(self):
+        """
+        The dimension of the movie vectors.
+        """
+        return self._dimension
+
+    @property
+    def nnz(self):
+        """
+        The number of non-zero values in all movie vectors.
+        """
+        return len(self.data)
+
+    def _row_sums(self, values):
+        """
+        A function to sum up values aligned with the non-zero values of each row.
+        """
+        sums = np.zeros((len(self),) + values.shape[1:], dtype=float)
+        if len(self._filled_rows):
+            sums[self._filled_rows] = np.add.reduceat(
+                values, self._filled_starts)
+
+        return sums
+
+    def vector(self, movie_id):
+        """
+        A function to get the vector of one movie as a dense array.
+
+        Parameters:
+            movie_id (int): id of the movie
+
+        Returns:
+            vector (np.array): the movie vector, or a zero vector if the movie id is unknown
+        """
+        vector = np.zeros(self.dimension, dtype=float)
+        row = self.rows([movie_id])[0]
+
+        if row >= 0:
+            start, end = self.indptr[row], self.indptr[row + 1]
+            vector[self.indices[start:end]] = self.data[start:end]
+
+        return vector
+
+    def vectors(self, movie_ids):
+        """
+        A function to get the vectors of several movies at once as a dense array.
+
+        Parameters:
+            movie_ids (iterable): ids of the movies
+
+        Returns:
+            vectors (np.array): 2D array with one movie vector per row, zero rows for unknown movie ids
+        """
+        rows = self.rows(movie_ids)
+        vectors = np.zeros((len(rows), self.dimension), dtype=float)
+
+        output_rows, positions = self._positions(rows)
+        vectors[output_rows, self.indices[positions]] = self.data[positions]
+
+        return vectors
+
+    def _positions(self, rows):
+        """
+        A function to find the positions of the non-zero values of the given rows in indices and data.
+
+        Parameters:
+            rows (np.array): rows of the store, -1 for rows without values
+
+        Returns:
+            output_rows (np.array): for each position, the index of its row in rows
+            positions (np.array): positions of the non-zero values, row by row
+        """
+        rows = np.where(rows >= 0, rows, len(self))
+        indptr = np.append(self.indptr, self.indptr[-1])
+        starts, lengths = indptr[rows], indptr[rows + 1] - indptr[rows]
+
+        output_rows = np.repeat(np.arange(len(rows)), lengths)
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+        return output_rows, positions
+
+    def row_dot_products(self, rows, vectors):
+        """
+        A function to calculate the dot products of only some movie vectors with the given vector(s).
+        Only the non-zero values of the given rows are touched.
+
+        Parameters:
+            rows (np.array): rows of the movie vectors
+            vectors (np.array): one vector, or a 2D array with one vector per column
+
+        Returns:
+            dot_products (np.array): dot products for each of the rows (and each column of vectors)
+        """
+        vectors = np.asarray(vectors, dtype=self.data.dtype)
+        output_rows, positions = self._positions(np.asarray(rows))
+        values = (self.data[positions] * vectors[self.indices[positions]].T).T
+
+        dot_products = np.zeros((len(rows),) + vectors.shape[1:], dtype=float)
+        np.add.at(dot_products, output_rows, values)
+
+        return dot_products
+
+    def _row_values(self, rows, positions):
+        """
+        A function to get the non-zero values at some positions as float64, rows are the rows of the positions.
+        """
+        return self.data[positions].astype(float)
+
+    def dot_products_of_rows(self, rows):
+        """
+        A function to calculate the dot products of every movie vector with the vectors of some movies.
+        Both sides stay sparse: only the terms of the given movies are looked up, and only the pairs
+        of non-zero values with the same term are multiplied, so the memory used grows with those pairs
+        instead of with the non-zero values of the catalog times the number of movies.
+
+        Parameters:
+            rows (np.array): rows of the movies
+
+        Returns:
+            dot_products (np.array): 2D array with one row for each movie and one column for each of the rows
+        """
+        rows = np.asarray(rows)
+
+        # the non-zero values of the given movies, sorted by term
+        columns, positions = self._positions(rows)
+        order = np.argsort(self.indices[positions], kind="stable")
+        columns, positions = columns[order], positions[order]
+        terms = self.indices[positions]
+        values = self._row_values(rows[columns], positions)
+
+        # for each non-zero value of the catalog, the range of the given movies' values with its term
+        first = np.searchsorted(terms, self.indices, side="left")
+        counts = np.searchsorted(terms, self.indices, side="right") - first
+        matched = np.flatnonzero(counts)
+        counts = counts[matched]
+
+        # every pair of values with the same term, one catalog value against each of the given movies' values
+        pairs = np.repeat(matched, counts)
+        partners = np.repeat(first[matched] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        catalog_rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))[pairs]
+
+        dot_products = np.bincount(catalog_rows * len(rows) + columns[partners],
+                                   weights=self._row_values(catalog_rows, pairs) * values[partners],
+                                   minlength=len(self) * len(rows))
+
+        return dot_products.reshape(len(self), len(rows))
+
+    def dot_products(self, vectors):
+        """
+        A function to calculate the dot products of every movie vector with the given vector(s).
+        The sparse matrix is multiplied by the dense vectors, only the non-zero values are touched.
+
+        Parameters:
+            vectors (np.array): one vector, or a 2D array with one vector per column
+
+        Returns:
+            dot_products (np.array): dot products for each row (and each column of vectors)
+        """
+        vectors = np.asarray(vectors, dtype=self.data.dtype)
+        values = self.data * vectors[self.indices].T
+
+        return self._row_sums(values.T)
+
+
+class QuantizedVectorStore(VectorStore):
+    """
+    This class holds all movie vectors as one int8 matrix with a float32 scale for each row.
+    The value of a movie vector is matrix[row] * scales[row], which takes an eighth of the memory of float64.
+    Scoring converts blocks of rows to float32 and accumulates in float32.
+
+    Variables:
+    ids: an array of movie ids, one for each row of the matrix
+    matrix: a 2D int8 array of quantized movie vectors
+    scales: an array of the scale of each row
+    norms: an array of precomputed magnitudes of the quantized movie vectors
+    id_to_row: an array mapping a movie id to its row in the matrix (-1 for unknown movie ids)
+    """
+
+    def __init__(self, ids, matrix, scales, norms=None):
+        """
+        The constructor for the QuantizedVectorStore class.
+
+        Parameters:
+            ids (np.array): movie ids, one for each row of the matrix
+            matrix (np.array): 2D int8 array of quantized movie vectors
+            scales (np.array): scale of each row
+            norms (np.array): precomputed magnitudes of the movie vectors, calculated if not given
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.matrix = np.asarray(matrix, dtype=np.int8)
+        self.scales = np.asarray(scales, dtype=np.float32)
+
+        if norms is None:
+            norms = np.zeros(len(self.ids), dtype=float)
+            for start in range(0, len(self.ids), QUANTIZED_BLOCK_SIZE):
+                block = self.matrix[start:start + QUANTIZED_BLOCK_SIZE].astype(np.float32)
+                norms[start:start + QUANTIZED_BLOCK_SIZE] = np.linalg.norm(block, axis=1)
+            norms *= self.scales
+        self.norms = np.asarray(norms, dtype=float)
+
+        self._build_id_index()
+
+    def vector(self, movie_id):
+        """
+        A function to get the vector of one movie.
+
+        Parameters:
+            movie_id (int): id of the movie
+
+        Returns:
+            vector (np.array): the movie vector, or a zero vector if the movie id is unknown
+        """
+        return self.vectors([movie_id])[0]
+
+    def vectors(self, movie_ids):
+        """
+        A function to get the vectors of several movies at once.
+
+        Parameters:
+            movie_ids (iterable): ids of the movies
+
+        Returns:
+            vectors (np.array): 2D array with one movie vector per row, zero rows for unknown movie ids
+        """
+        rows = self.rows(movie_ids)
+        vectors = np.zeros((len(rows), self.dimension), dtype=float)
+
+        known = rows[rows >= 0]
+        vectors[rows >= 0] = self.matrix[known] * self.scales[known, np.newaxis]
+
+        return vectors
+
+    def row_dot_products(self, rows, vectors):
+        """
+        A function to calculate the dot products of only some movie vectors with the given vector(s).
+
+        Parameters:
+            rows (np.array): rows (or a slice of rows) of the movie vectors
+            vectors (np.array): one vector, or a 2D array with one vector per column
+
+        Returns:
+            dot_products (np.array): dot products for each of the rows (and each column of vectors)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dot_products = self.matrix[rows].astype(np.float32) @ vectors
+        scales = self.scales[rows]
+
+        if dot_products.ndim == 2:
+            scales = scales[:, np.newaxis]
+
+        return (dot_products * scales).astype(float)
+
+    def dot_products(self, vectors):
+        """
+        A function to calculate the dot products of every movie vector with the given vector(s).
+        The int8 rows are converted to float32 block by block, so the float32 copy stays small.
+
+        Parameters:
+            vectors (np.array): one vector, or a 2D array with one vector per column
+
+        Returns:
+            dot_products (np.array): dot products for each row of the matrix (and each column of vectors)
+        """
+        vectors = np.asarray(vectors)
+        dot_products = np.zeros((len(self),) + vectors.shape[1:], dtype=float)
+
+        for start in range(0, len(self), QUANTIZED_BLOCK_SIZE):
+            block = slice(start, start + QUANTIZED_BLOCK_SIZE)
+            dot_products[block] = self.row_dot_products(block, vectors)
+
+        return dot_products
+
+
+class QuantizedSparseVectorStore(SparseVectorStore):
+    """
+    This class holds all movie vectors in the CSR format with int8 values and a float32 scale for each row.
+    The value at a position of row i is data[position] * scales[i].
+
+    Variables:
+    ids: an array of movie ids, one for each row
+    indptr: an array where the values of row i are data[indptr[i]:indptr[i + 1]]
+    indices: an array of term indices (columns) of the non-zero values
+    data: an int8 array of the quantized non-zero values
+    scales: an array of the scale of each row
+    norms: an array of precomputed magnitudes of the quantized movie vectors
+    id_to_row: an array mapping a movie id to its row (-1 for unknown movie ids)
+    """
+
+    def __init__(self, ids, indptr, indices, data, dimension, scales, norms=None):
+        """
+        The constructor for the QuantizedSparseVectorStore class.
+
+        Parameters:
+            ids (np.array): movie ids, one for each row
+            indptr (np.array): row pointers into indices and data
+            indices (np.array): term indices of the non-zero values
+            data (np.array): the quantized non-zero values
+            dimension (int): the dimension of the movie vectors
+            scales (np.array): scale of each row
+            norms (np.array): precomputed magnitudes of the movie vectors, calculated if not given
+        """
+        # the csr structure is set up by SparseVectorStore, the int8 values replace the float values after
+        super().__init__(ids, indptr, indices, np.zeros(len(indices), dtype=np.float32), dimension,
+                         np.zeros(len(ids)))
+        self.data = np.asarray(data, dtype=np.int8)
+        self.scales = np.asarray(scales, dtype=np.float32)
+
+        if norms is None:
+            norms = np.sqrt(self._row_sums(np.square(self.data, dtype=np.float32))) * self.scales
+        self.norms = np.asarray(norms, dtype=float)
+
+    def vector(self, movie_id):
+        """
+        A function to get the vector of one movie as a dense array.
+
+        Parameters:
+            movie_id (int): id of the movie
+
+        Returns:
+            vector (np.array): the movie vector, or a zero vector if the movie id is unknown
+        """
+        return self.vectors([movie_id])[0]
+
+    def vectors(self, movie_ids):
+        """
+        A function to get the vectors of several movies at once as a dense array.
+
+        Parameters:
+            movie_ids (iterable): ids of the movies
+
+        Returns:
+            vectors (np.array): 2D array with one movie vector per row, zero rows for unknown movie ids
+        """
+        rows = self.rows(movie_ids)
+        vectors = np.zeros((len(rows), self.dimension), dtype=float)
+
+        output_rows, positions = self._positions(rows)
+        vectors[output_rows, self.indices[positions]] = (
+            self.data[positions] * self.scales[rows[output_rows]])
+
+        return vectors
+
+    def row_dot_products(self, rows, vectors):
+        """
+        A function to calculate the dot products of only some movie vectors with the given vector(s).
+
+        Parameters:
+            rows (np.array): rows of the movie vectors
+            vectors (np.array): one vector, or a 2D array with one vector per column
+
+        Returns:
+            dot_products (np.array): dot products for each of the rows (and each column of vectors)
+        """
+        rows = np.asarray(rows)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        output_rows, positions = self._positions(rows)
+        values = (self.data[positions].astype(np.float32)
+                  * vectors[self.indices[positions]].T).T
+
+        dot_products = np.zeros((len(rows),) + vectors.shape[1:], dtype=np.float32)
+        np.add.at(dot_products, output_rows, values)
+
+        return (dot_products.T * self.scales[rows]).T.astype(float)
+
+    def _row_values(self, rows, positions):
+        """
+        A function to get the values at some positions as float64, rows are the rows of the positions.
+        """
+        return self.data[positions] * self.scales[rows].astype(float)
+
+    def dot_products(self, vectors):
+        """
+        A function to calculate the dot products of every movie vector with the given vector(s).
+
+        Parameters:
+            vectors (np.array): one vector, or a 2D array with one vector per column
+
+        Returns:
+            dot_products (np.array): dot products for each row (and each column of vectors)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        values = self.data.astype(np.float32) * vectors[self.indices].T
+
+        return (self._row_sums(values.T).T * self.scales).T
+
+
+def _float_values(values):
+    """
+    A function to keep float32 and float64 values as they are and convert anything else to float64.
+    Memory-mapped values are never copied.
+    """
+    if isinstance(values, np.memmap):
+        return values
+
+    if np.asarray(values).dtype == np.float32:
+        return np.ascontiguousarray(values, dtype=np.float32)
+
+    return np.ascontiguousarray(values, dtype=float)
+
+
+def _quantize(values, row_maxima):
+    """
+    A function to quantize values to int8 with the scale of their row.
+
+    Parameters:
+        values (np.array): values, aligned with row_maxima
+        row_maxima (np.array): largest absolute value of the row of each value
+
+    Returns:
+        quantized (np.array): the int8 values
+    """
+    scales = row_maxima / 127
+    quantized = np.zeros(values.shape, dtype=np.int8)
+    np.rint(np.divide(values, scales, out=np.zeros(values.shape), where=scales != 0),
+            out=quantized, casting="unsafe")
+
+    return quantized
+
+
+def convert_precision(vector_store, precision):
+    """
+    A function to convert a vector store to another precision.
+
+    Parameters:
+        vector_store (VectorStore): movie vectors in float64 (or float32)
+        precision (str): "float64", "float32" or "int8" (with a float32 scale for each row)
+
+    Returns:
+        vector_store (VectorStore): the movie vectors in the given precision
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"unknown precision {precision!r}, use one of {PRECISIONS}")
+
+    sparse = isinstance(vector_store, SparseVectorStore)
+    values = vector_store.data if sparse else vector_store.matrix
+
+    if values.dtype == precision:
+        return vector_store
+
+    if precision != "int8":
+        if sparse:
+            return SparseVectorStore(vector_store.ids, vector_store.indptr, vector_store.indices,
+                                     values.astype(precision), vector_store.dimension)
+        return VectorStore(vector_store.ids, values.astype(precision))
+
+    if sparse:
+        row_maxima = np.zeros(len(vector_store), dtype=float)
+        if len(vector_store._filled_rows):
+            row_maxima[vector_store._filled_rows] = np.maximum.reduceat(
+                np.abs(values), vector_store._filled_starts)
+        row_of_value = np.repeat(np.arange(len(vector_store)), np.diff(vector_store.indptr))
+
+        return QuantizedSparseVectorStore(
+            vector_store.ids, vector_store.indptr, vector_store.indices,
+            _quantize(values, row_maxima[row_of_value]), vector_store.dimension, row_maxima / 127)
+
+    row_maxima = np.abs(values).max(axis=1) if values.size else np.zeros(len(vector_store))
+
+    return QuantizedVectorStore(vector_store.ids, _quantize(values, row_maxima[:, np.newaxis]),
+                                row_maxima / 127)
+
+
+def select_top_k(scores, k, available=None):
+    """
+    A function to pick the k best scores with a partial selection instead of sorting everything.
+    Ties are broken by the lower row, so the result is the same as taking the maximum k times.
+
+    Parameters:
+        scores (np.array): score for each row
+        k (int): number of rows to pick
+        available (np.array): boolean mask of the rows that can be picked, all rows if not given
+
+    Returns:
+        rows (np.array): the picked rows in ranked order
+        scores (np.array): scores of the picked rows
+    """
+    if available is None:
+        candidates = np.arange(len(scores))
+    else:
+        candidates = np.flatnonzero(available)
+
+    candidate_scores = scores[candidates]
+    k = max(0, min(k, len(candidates)))
+
+    if k == 0:
+        return candidates[:0], candidate_scores[:0]
+
+    # the k-th best score splits the candidates, ties at the split keep the lower rows
+    threshold = np.partition(candidate_scores, len(candidates) - k)[len(candidates) - k]
+    better = np.flatnonzero(candidate_scores > threshold)
+    tied = np.flatnonzero(candidate_scores == threshold)[:k - len(better)]
+    picked = np.concatenate((better, tied))
+
+    order = np.lexsort((picked, -candidate_scores[picked]))
+    picked = picked[order]
+
+    return candidates[picked], candidate_scores[picked]
+
+
+def load_vectors_csv(path, dimension=None):
+    """
+    A function to load the normalized movie vectors from a csv file.
+
+    Every line holds a movie id and its vector, separated by a semicolon.
+    Sparse vectors are written as comma-separated term index:weight pairs, which is what normalize.py writes,
+    and they are loaded into a SparseVectorStore.
+    Dense vectors are either a comma-separated string or one value per semicolon-separated column.
+
+    Parameters:
+        path (str): path to the csv file
+        dimension (int): dimension of sparse vectors, the highest term index + 1 is used if not given
+
+    Returns:
+        vector_store (VectorStore): the loaded movie vectors
+    """
+    ids = []
+    vectors = []
+    indptr = [0]
+    indices = []
+    data = []
+    sparse = None
+
+    with open(path, "r") as vectors_file:
+        # skip the header
+        next(vectors_file)
+
+        for line in vectors_file:
+            line = line.strip()
+            if not line:
+                continue
+
+            movie_id, values = line.split(";", 1)
+            ids.append(int(movie_id))
+
+            # the first row decides which format the file uses
+            if sparse is None:
+                sparse = ":" in values or not values
+
+            if sparse:
+                for pair in values.split(","):
+                    if pair:
+                        index, weight = pair.split(":")
+                        indices.append(int(index))
+                        data.append(float(weight))
+                indptr.append(len(indices))
+
+            else:
+                vectors.append(np.array(values.replace(";", ",").split(","),
+                                        dtype=float))
+
+    if sparse:
+        if dimension is None:
+            dimension = max(indices) + 1 if indices else 0
+        return SparseVectorStore(ids, indptr, indices, data, dimension)
+
+    if vectors:
+        matrix = np.vstack(vectors)
+    else:
+        matrix = np.zeros((0, 0), dtype=float)
+
+    return VectorStore(ids, matrix)
+
+
+def _align(offset):
+    """
+    A function to round a file offset up to the binary alignment.
+    """
+    return -(-offset // BINARY_ALIGNMENT) * BINARY_ALIGNMENT
+
+
+def _binary_offsets(count):
+    """
+    A function to calculate where the ids, the norms and the matrix start in a binary vector file.
+    In sparse files, the indptr array starts where the matrix would.
+    """
+    ids_offset = _align(BINARY_HEADER.size)
+    norms_offset = _align(ids_offset + count * 4)
+    matrix_offset = _align(norms_offset + count * 8)
+
+    return ids_offset, norms_offset, matrix_offset
+
+
+def vocabulary_fingerprint(terms):
+    """
+    A function to get the fingerprint of a vocabulary, a hash of its terms in the order of the columns.
+    The files derived from the movie vectors keep the fingerprint of the vocabulary they were built for,
+    a rebuild of vector_info.csv can reorder the columns without changing the dimension or the movie ids.
+
+    Parameters:
+        terms (list): the term of each column
+
+    Returns:
+        fingerprint (str): 16 hexadecimal digits
+    """
+    return hashlib.blake2b("\n".join(terms).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def load_vocabulary_fingerprint(path):
+    """
+    A function to get the fingerprint of the vocabulary in a file in the format of vector_info.csv.
+
+    Parameters:
+        path (str): path to the csv file
+
+    Returns:
+        fingerprint (str): 16 hexadecimal digits
+    """
+    with open(path, "r", encoding="utf-8") as vocabulary_file:
+        return vocabulary_fingerprint([row["term"] for row in csv.DictReader(vocabulary_file, delimiter=",")])
+
+
+def check_vocabulary(path, saved, vocabulary):
+    """
+    A function to make sure a file was built for the vocabulary it is used with, a ValueError is raised if not.
+    Nothing is checked if either fingerprint is unknown, e.g. for files saved before the fingerprints were kept.
+
+    Parameters:
+        path (str): path to the file, for the message
+        saved (str): the fingerprint saved in the file
+        vocabulary (str): the fingerprint of the vocabulary in use
+
+    Returns:
+        None
+    """
+    if saved and vocabulary and saved != vocabulary:
+        raise ValueError(f"{path} was built for another vocabulary than vector_info.csv, build it again")
+
+    return None
+
+
+def save_vectors_binary(path, vector_store, vocabulary=""):
+    """
+    A function to save movie vectors in the binary vector format.
+
+    The file starts with a header holding the dimension, the number of movies, the dtype of the values
+    and the fingerprint of the vocabulary, followed by the movie ids, the norms of the vectors and the raw matrix (or the csr arrays of a sparse store).
+    Every block starts at an aligned offset, so the values can be opened with np.memmap.
+
+    Parameters:
+        path (str): path to the binary file
+        vector_store (VectorStore): movie vectors that are to be saved
+        vocabulary (str): fingerprint of the vocabulary of the vectors, see vocabulary_fingerprint
+
+    Returns:
+        None
+    """
+    count, dimension = len(vector_store), vector_store.dimension
+    ids_offset, norms_offset, matrix_offset = _binary_offsets(count)
+
+    if isinstance(vector_store, SparseVectorStore):
+        magic = SPARSE_BINARY_MAGIC
+        values = np.ascontiguousarray(vector_store.data)
+        indices_offset = _align(matrix_offset + (count + 1) * 8)
+        data_offset = _align(indices_offset + len(values) * 4)
+    else:
+        magic = BINARY_MAGIC
+        values = np.ascontiguousarray(vector_store.matrix)
+
+    with open(path, "wb") as binary_file:
+        binary_file.write(BINARY_HEADER.pack(
+            magic, BINARY_VERSION, values.dtype.str.encode("ascii"), dimension, count, vocabulary.encode("ascii")))
+
+        binary_file.seek(ids_offset)
+        binary_file.write(vector_store.ids.astype("<i4").tobytes())
+
+        binary_file.seek(norms_offset)
+        binary_file.write(vector_store.norms.astype("<f8").tobytes())
+
+        binary_file.seek(matrix_offset)
+        if magic == SPARSE_BINARY_MAGIC:
+            binary_file.write(vector_store.indptr.astype("<i8").tobytes())
+            binary_file.seek(indices_offset)
+            binary_file.write(vector_store.indices.astype("<i4").tobytes())
+            binary_file.seek(data_offset)
+        binary_file.write(values.tobytes())
+
+    return None
+
+
+def load_vectors_binary(path, vocabulary=""):
+    """
+    A function to open movie vectors saved in the binary vector format.
+    The values are memory-mapped, so nothing is copied and the page cache is shared between processes.
+
+    Parameters:
+        path (str): path to the binary file
+        vocabulary (str): fingerprint of the vocabulary in use, a ValueError is raised if the file has another one
+
+    Returns:
+        vector_store (VectorStore): the memory-mapped movie vectors, a SparseVectorStore for sparse files
+    """
+    with open(path, "rb") as binary_file:
+        header = binary_file.read(BINARY_HEADER.size)
+
+    magic, version, dtype, dimension, count = BINARY_HEADER_V1.unpack(header[:BINARY_HEADER_V1.size])
+
+    if magic not in (BINARY_MAGIC, SPARSE_BINARY_MAGIC) or version not in (1, BINARY_VERSION):
+        raise ValueError(f"{path} is not a binary vector file")
+
+    if version == BINARY_VERSION:
+        check_vocabulary(path, BINARY_HEADER.unpack(header)[5].rstrip(b"\0").decode("ascii"), vocabulary)
+
+    dtype = np.dtype(dtype.rstrip(b"\0").decode("ascii"))
+    ids_offset, norms_offset, matrix_offset = _binary_offsets(count)
+
+    ids = np.fromfile(path, dtype="<i4", count=count, offset=ids_offset)
+    norms = np.fromfile(path, dtype="<f8", count=count, offset=norms_offset)
+
+    if magic == SPARSE_BINARY_MAGIC:
+        indptr = np.fromfile(path, dtype="<i8", count=count + 1,
+                             offset=matrix_offset)
+        nnz = int(indptr[-1])
+        indices_offset = _align(matrix_offset + (count + 1) * 8)
+        data_offset = _align(indices_offset + nnz * 4)
+
+        indices = np.memmap(path, dtype="<i4", mode="r", offset=indices_offset,
+                            shape=(nnz,))
+        data = np.memmap(path, dtype=dtype, mode="r", offset=data_offset,
+                         shape=(nnz,))
+
+        return SparseVectorStore(ids, indptr, indices, data, dimension, norms)
+
+    matrix = np.memmap(path, dtype=dtype, mode="r", offset=matrix_offset,
+                       shape=(count, dimension))
+
+    return VectorStore(ids, matrix, norms)
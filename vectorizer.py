@@ -0,0 +1,175 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+
+# number of movies vectorized by one task of a worker process
+VECTORIZER_CHUNK_SIZE = 10000
+
+# the vectorizer of a worker process, set once when the process starts
+_worker_vectorizer = None
+
+
+class Vectorizer:
+    """
+    This class turns the terms of a movie (genres, keywords, actor and director) into a tf-idf vector.
+
+    The term -> column dictionary is built once, so a movie is vectorized with one lookup per term,
+    no matter how many terms the vocabulary has.
+    A column is set if its term is any of the movie's terms, a name can have several columns,
+    e.g. a director who is also among the actors.
+
+    Variables:
+    terms: the term of each column
+    idf: an array of the idf of each column
+    term_columns: a dictionary of the columns of each term
+    """
+
+    def __init__(self, terms, idf):
+        """
+        The constructor for the Vectorizer class.
+
+        Parameters:
+            terms (list): the term of each column
+            idf (list): the idf of each column
+        """
+        self.terms = list(terms)
+        self.idf = np.asarray(idf, dtype=float)
+
+        self.term_columns = {}
+        for column, term in enumerate(self.terms):
+            self.term_columns.setdefault(term, []).append(column)
+
+    @property
+    def dimension(self):
+        """
+        The dimension of the vectors.
+        """
+        return len(self.terms)
+
+    def columns(self, movie_terms):
+        """
+        A function to find the columns of the terms of one movie.
+
+        Parameters:
+            movie_terms (iterable): the genres, keywords, actor and director of the movie
+
+        Returns:
+            columns (np.array): the columns of the terms, ascending and without repeats
+        """
+        columns = {column for term in movie_terms for column in self.term_columns.get(term, ())}
+
+        return np.array(sorted(columns), dtype=np.int32)
+
+    def transform(self, movies_terms, dense=False):
+        """
+        A function to vectorize several movies.
+
+        Parameters:
+            movies_terms (iterable): the terms of each movie
+            dense (bool): whether the vectors are returned as a dense matrix instead of csr arrays
+
+        Returns:
+            vectors (tuple or np.array): (indptr, indices, data) csr arrays, or a matrix with one vector per row
+        """
+        rows = [self.columns(movie_terms) for movie_terms in movies_terms]
+
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(columns) for columns in rows])
+        indices = np.concatenate(rows + [np.zeros(0, dtype=np.int32)])
+
+        return self._vectors(indptr, indices, dense)
+
+    def transform_parallel(self, movies_terms, workers=None, chunk_size=VECTORIZER_CHUNK_SIZE,
+                           dense=False):
+        """
+        A function to vectorize many movies in a pool of worker processes, chunk by chunk.
+        The result is the same as the result of transform, which is used instead if there is only one chunk
+        or one worker, a pool would only add the start of the processes.
+        The worker processes import the main module again under the spawn start method,
+        so a script calling this function must keep its work under an if __name__ == "__main__" guard.
+
+        Parameters:
+            movies_terms (list): the terms of each movie
+            workers (int): number of worker processes, the number of cores if not given
+            chunk_size (int): number of movies in a chunk
+            dense (bool): whether the vectors are returned as a dense matrix instead of csr arrays
+
+        Returns:
+            vectors (tuple or np.array): (indptr, indices, data) csr arrays, or a matrix with one vector per row
+        """
+        movies_terms = list(movies_terms)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(movies_terms) <= chunk_size:
+            return self.transform(movies_terms, dense)
+
+        chunks = [movies_terms[start:start + chunk_size]
+                  for start in range(0, len(movies_terms), chunk_size)]
+
+        with ProcessPoolExecutor(workers, initializer=_set_worker_vectorizer,
+                                 initargs=(self,)) as executor:
+            results = list(executor.map(_transform_chunk, chunks))
+
+        # join the csr arrays of the chunks, the row pointers of a chunk start where the last chunk ended
+        indptr = [np.zeros(1, dtype=np.int64)]
+        for chunk_indptr, _, _ in results:
+            indptr.append(chunk_indptr[1:] + indptr[-1][-1])
+        indptr = np.concatenate(indptr)
+        indices = np.concatenate([chunk[1] for chunk in results] + [np.zeros(0, dtype=np.int32)])
+
+        return self._vectors(indptr, indices, dense)
+
+    def _vectors(self, indptr, indices, dense):
+        """
+        A function to put the idf into the columns of the terms, as csr arrays or as a dense matrix.
+        """
+        data = self.idf[indices]
+
+        if not dense:
+            return indptr, indices, data
+
+        count = len(indptr) - 1
+        matrix = np.zeros((count, self.dimension), dtype=float)
+        matrix[np.repeat(np.arange(count), np.diff(indptr)), indices] = data
+
+        return matrix
+
+
+def _set_worker_vectorizer(vectorizer):
+    """
+    A function run once in every worker process, it keeps the vectorizer for the chunks.
+    """
+    global _worker_vectorizer
+
+    _worker_vectorizer = vectorizer
+
+    return None
+
+
+def _transform_chunk(movies_terms):
+    """
+    A function run in a worker process, it vectorizes one chunk of movies into csr arrays.
+    """
+    return _worker_vectorizer.transform(movies_terms)
+
+
+def load_vectorizer(path):
+    """
+    A function to load a vectorizer from the terms and idf in vector_info.csv.
+
+    Parameters:
+        path (str): path to the csv file
+
+    Returns:
+        vectorizer (Vectorizer): the vectorizer
+    """
+    terms = []
+    idf = []
+
+    with open(path, "r", encoding="utf-8") as vector_file:
+        for row in csv.DictReader(vector_file, delimiter=","):
+            terms.append(row["term"])
+            idf.append(float(row["idf"]))
+
+    return Vectorizer(terms, idf)